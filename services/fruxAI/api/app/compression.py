@@ -0,0 +1,233 @@
+"""
+Response compression with Accept-Encoding negotiation (zstd, br, gzip).
+
+Complete bodies below COMPRESSION_MIN_SIZE are sent as-is; larger ones are
+compressed in one go with an exact Content-Length. Streaming responses
+(more_body chunks: CSV/Arrow exports, NDJSON) are compressed chunk by chunk
+and flushed after each chunk so clients still receive data as it is
+produced. brotli and zstandard are optional; without them only gzip is
+offered.
+"""
+
+import os
+import zlib
+import logging
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional, only needed for br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for zstd
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Only these media types are compressed (PDFs, images and archives already are)
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/vnd.apache.arrow.stream",
+)
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> List[str]:
+    encodings = ['gzip']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the best encoding both sides support"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        encodings: Optional[List[str]] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+        zstd_level: Optional[int] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        preferred = encodings or os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+        supported = available_encodings()
+        # Server preference order, limited to installed codecs
+        self.encodings = [e.strip() for e in preferred if e.strip() in supported]
+        self.levels = {
+            'gzip': gzip_level if gzip_level is not None else int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+            'br': brotli_quality if brotli_quality is not None else int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+            'zstd': zstd_level if zstd_level is not None else int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3")),
+        }
+
+    def negotiate(self, header: str) -> Optional[str]:
+        accepted = parse_accept_encoding(header)
+        wildcard = accepted.get("*", 0.0)
+        candidates = [e for e in self.encodings if accepted.get(e, wildcard) > 0]
+        if not candidates:
+            return None
+        # Highest client q wins; ties go to the server's preference order
+        return max(candidates, key=lambda e: (accepted.get(e, wildcard), -self.encodings.index(e)))
+
+    def encoder(self, encoding: str):
+        if encoding == 'br':
+            return BrotliEncoder(self.levels['br'])
+        if encoding == 'zstd':
+            return ZstdEncoder(self.levels['zstd'])
+        return GzipEncoder(self.levels['gzip'])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = self.negotiate(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await CompressionResponder(self, encoding, send)(scope, receive, self.app)
+
+
+class CompressionResponder:
+    """Per-request state: holds back the response start until the first body chunk decides the path"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, app):
+        await app(scope, receive, self.send_wrapper)
+
+    def _headers(self) -> List[Tuple[bytes, bytes]]:
+        return list(self.start_message.get("headers", []))
+
+    def _compressible(self, headers) -> bool:
+        content_type = ""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _start(self, headers, body_length: Optional[int]):
+        headers = [(n, v) for n, v in headers if n not in (b"content-length",)]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b"Accept-Encoding"))
+        if body_length is not None:
+            headers.append((b"content-length", str(body_length).encode()))
+        return {**self.start_message, "headers": headers}
+
+    async def send_wrapper(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if self.encoder is None:
+            headers = self._headers()
+            # Small or incompressible complete responses go out untouched
+            if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.encoder = self.middleware.encoder(self.encoding)
+            if not more_body:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                await self.send(self._start(headers, len(compressed)))
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: length unknown up front, chunks are flushed as they arrive
+            await self.send(self._start(headers, None))
+
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
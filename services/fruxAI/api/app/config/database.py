@@ -1,13 +1,20 @@
 import asyncpg
 import os
+import json
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from app.config.migrations import migrate
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+def _env_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
 class DatabaseConfig:
     def __init__(self):
         self.host = os.getenv("SUPABASE_DB_HOST", "localhost")
@@ -16,181 +23,233 @@ class DatabaseConfig:
         self.user = os.getenv("SUPABASE_DB_USER", "postgres")
         self.password = os.getenv("SUPABASE_DB_PASSWORD", "")
 
+        # Pool sizing; acquire_timeout makes bursts fail fast (503) instead of queueing forever
+        self.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+        self.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+        self.acquire_timeout = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+        self.max_inactive_lifetime = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))
+        self.command_timeout = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+        # Server-side statement_timeout in ms (0 = server default)
+        self.statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "200"))
+        # PgBouncer in transaction mode: no cached prepared statements and no
+        # startup parameters (set statement_timeout on the role instead)
+        self.pgbouncer = _env_bool("DB_PGBOUNCER")
+        # Direct (non-pooled) server URL used to apply migrations in pgbouncer mode
+        self.direct_url = os.getenv("DB_DIRECT_URL")
+
+        # Optional read replica for reports and listings (see get_read_connection)
+        self.read_url = os.getenv("DB_READ_URL")
+        self.read_pool_max_size = int(os.getenv("DB_READ_POOL_MAX_SIZE", str(self.pool_max_size)))
+        # Replica is skipped while it lags more than this (seconds) or is unreachable
+        self.read_max_lag = float(os.getenv("DB_READ_MAX_LAG_SECONDS", "30"))
+        self.read_lag_check_interval = float(os.getenv("DB_READ_LAG_CHECK_INTERVAL", "5"))
+
     @property
     def connection_string(self) -> str:
         return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
 
+    def pool_options(self, read_only: bool = False) -> Dict[str, Any]:
+        max_size = self.read_pool_max_size if read_only else self.pool_max_size
+        options = {
+            'min_size': min(self.pool_min_size, max_size),
+            'max_size': max_size,
+            'command_timeout': self.command_timeout,
+            'max_inactive_connection_lifetime': self.max_inactive_lifetime,
+            'init': init_connection,
+        }
+        if self.pgbouncer:
+            options['statement_cache_size'] = 0
+        else:
+            options['statement_cache_size'] = max(self.statement_cache_size, len(statements) * 2)
+            options['server_settings'] = {'application_name': 'fruxai-api-read' if read_only else 'fruxai-api'}
+            if read_only:
+                options['server_settings']['default_transaction_read_only'] = 'on'
+            if self.statement_timeout:
+                options['server_settings']['statement_timeout'] = str(self.statement_timeout)
+        return options
+
+class PoolExhaustedError(Exception):
+    """No connection became free within DB_POOL_ACQUIRE_TIMEOUT"""
+
+class StatementRegistry:
+    """
+    Named SQL for hot queries. Each name maps to one fixed query text, so
+    asyncpg's per-connection statement cache prepares it once per connection;
+    per-request SQL strings would be re-parsed and evict each other. Queries
+    with optional filters register one statement per variant.
+    """
+
+    def __init__(self):
+        self._sql: Dict[str, str] = {}
+
+    def register(self, name: str, sql: str) -> str:
+        if self._sql.get(name, sql) != sql:
+            raise ValueError(f"Statement {name} is already registered with different SQL")
+        self._sql[name] = sql
+        return name
+
+    def __getitem__(self, name: str) -> str:
+        return self._sql[name]
+
+    def __len__(self) -> int:
+        return len(self._sql)
+
+    async def fetch(self, conn, name: str, *args):
+        return await conn.fetch(self._sql[name], *args)
+
+    async def fetchrow(self, conn, name: str, *args):
+        return await conn.fetchrow(self._sql[name], *args)
+
+    async def fetchval(self, conn, name: str, *args):
+        return await conn.fetchval(self._sql[name], *args)
+
+    async def execute(self, conn, name: str, *args):
+        return await conn.execute(self._sql[name], *args)
+
 # Global database config
 db_config = DatabaseConfig()
 
+# Hot statements, registered by the modules that use them
+statements = StatementRegistry()
+
 # Connection pool
 _pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+# Read replica pool and its last sampled lag (None = unreachable)
+_read_pool: Optional[asyncpg.Pool] = None
+_replica_lock = asyncio.Lock()
+_replica_lag: Optional[float] = None
+_replica_checked_at = float('-inf')
+
+# Seconds since the last replayed transaction; 0 when fully caught up (an idle
+# primary writes nothing, so the replay timestamp alone would look like lag)
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+def _json_dumps(value) -> str:
+    return json.dumps(value, default=str)
+
+async def init_connection(conn):
+    """Per-connection setup: JSON/JSONB values are passed and returned as Python objects"""
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=_json_dumps, decoder=json.loads, schema='pg_catalog')
 
 async def get_pool() -> asyncpg.Pool:
     """Get or create database connection pool"""
     global _pool
     if _pool is None:
-        _pool = await asyncpg.create_pool(
-            db_config.connection_string,
-            min_size=5,
-            max_size=20,
-            command_timeout=60,
-        )
-        logger.info("Database connection pool created")
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(db_config.connection_string, **db_config.pool_options())
+                logger.info(
+                    f"Database connection pool created ({db_config.pool_min_size}-{db_config.pool_max_size} "
+                    f"connections{', pgbouncer mode' if db_config.pgbouncer else ''})"
+                )
     return _pool
 
 @asynccontextmanager
 async def get_connection():
     """Get database connection from pool"""
     pool = await get_pool()
-    async with pool.acquire() as connection:
+    try:
+        connection = await pool.acquire(timeout=db_config.acquire_timeout)
+    except asyncio.TimeoutError:
+        raise PoolExhaustedError(
+            f"No database connection available within {db_config.acquire_timeout}s "
+            f"(pool size {db_config.pool_max_size})"
+        )
+    try:
+        yield connection
+    finally:
+        await pool.release(connection)
+
+async def replica_lag() -> Optional[float]:
+    """Replication lag of the read replica in seconds, or None when it is unreachable (sampled every DB_READ_LAG_CHECK_INTERVAL)"""
+    global _read_pool, _replica_lag, _replica_checked_at
+    if time.monotonic() - _replica_checked_at < db_config.read_lag_check_interval:
+        return _replica_lag
+
+    async with _replica_lock:
+        if time.monotonic() - _replica_checked_at < db_config.read_lag_check_interval:
+            return _replica_lag
+        try:
+            if _read_pool is None:
+                _read_pool = await asyncpg.create_pool(db_config.read_url, **db_config.pool_options(read_only=True))
+                logger.info(f"Read replica pool created (up to {db_config.read_pool_max_size} connections)")
+            async with _read_pool.acquire(timeout=db_config.acquire_timeout) as conn:
+                lag = float(await conn.fetchval(REPLICA_LAG_SQL))
+            was_lagging = _replica_lag is not None and _replica_lag > db_config.read_max_lag
+            if lag > db_config.read_max_lag and not was_lagging:
+                logger.warning(f"Read replica is {lag:.1f}s behind, reading from primary")
+            _replica_lag = lag
+        except Exception as e:
+            if _replica_lag is not None or _replica_checked_at == float('-inf'):
+                logger.warning(f"Read replica unavailable, reading from primary: {e}")
+            _replica_lag = None
+        _replica_checked_at = time.monotonic()
+    return _replica_lag
+
+@asynccontextmanager
+async def get_read_connection(max_lag: Optional[float] = None):
+    """
+    Connection for read-only queries: the read replica when DB_READ_URL is set
+    and it is reachable and within max_lag (default DB_READ_MAX_LAG_SECONDS),
+    otherwise the primary. Writes and job leasing always use get_connection.
+    """
+    lag = await replica_lag() if db_config.read_url else None
+    if lag is None or lag > (db_config.read_max_lag if max_lag is None else max_lag):
+        async with get_connection() as connection:
+            yield connection
+        return
+
+    try:
+        connection = await _read_pool.acquire(timeout=db_config.acquire_timeout)
+    except asyncio.TimeoutError:
+        raise PoolExhaustedError(
+            f"No read replica connection available within {db_config.acquire_timeout}s "
+            f"(pool size {db_config.read_pool_max_size})"
+        )
+    try:
+        yield connection
+    finally:
+        await _read_pool.release(connection)
+
+async def read_connection():
+    """FastAPI dependency for read-only endpoints (reports, analytics, listings)"""
+    async with get_read_connection() as connection:
         yield connection
 
 async def init_db():
-    """Initialize database and create tables if they don't exist"""
+    """Bring the schema up to date (one query when it already is, see migrations.py)"""
     try:
         pool = await get_pool()
+        connect = None
+        if db_config.pgbouncer:
+            if db_config.direct_url:
+                connect = lambda: asyncpg.connect(db_config.direct_url)
+            else:
+                logger.warning("DB_PGBOUNCER is set without DB_DIRECT_URL; migrations will run through the pooler")
         async with pool.acquire() as conn:
-            # Create crawl_jobs table
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS crawl_jobs (
-                    id SERIAL PRIMARY KEY,
-                    job_id VARCHAR(255) UNIQUE NOT NULL,
-                    url TEXT NOT NULL,
-                    status VARCHAR(50) DEFAULT 'pending',
-                    priority INTEGER DEFAULT 1,
-                    crawl_type VARCHAR(50) DEFAULT 'full',
-                    max_depth INTEGER DEFAULT 2,
-                    respect_robots BOOLEAN DEFAULT TRUE,
-                    rate_limit INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_at TIMESTAMP,
-                    error_message TEXT
-                )
-            """)
-
-            # Create metadata table
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS metadata (
-                    id SERIAL PRIMARY KEY,
-                    crawl_job_id INTEGER REFERENCES crawl_jobs(id),
-                    url TEXT NOT NULL,
-                    title TEXT,
-                    description TEXT,
-                    keywords TEXT,
-                    content_type VARCHAR(100),
-                    file_size INTEGER,
-                    crawl_depth INTEGER DEFAULT 0,
-                    response_time DECIMAL(5,2),
-                    status_code INTEGER,
-                    extracted_text TEXT,
-                    company_name TEXT,
-                    company_website TEXT,
-                    company_email TEXT,
-                    company_phone TEXT,
-                    company_address TEXT,
-                    metadata_json JSONB,
-                    local_file_path TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Create tender-related tables
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS tenders (
-                    id SERIAL PRIMARY KEY,
-                    state VARCHAR(2) NOT NULL,
-                    file_name VARCHAR(255) NOT NULL,
-                    contract_number VARCHAR(50),
-                    project_id VARCHAR(50),
-                    bid_opening_date DATE,
-                    title TEXT,
-                    location TEXT,
-                    winner_firm_id VARCHAR(100),
-                    winner_amount DECIMAL(15,2),
-                    currency VARCHAR(3) DEFAULT 'USD',
-                    extraction_info JSONB,
-                    status VARCHAR(20) DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(state, file_name),
-                    UNIQUE(state, contract_number),
-                    UNIQUE(state, project_id)
-                )
-            """)
-
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS firms (
-                    state VARCHAR(2) NOT NULL,
-                    firm_id VARCHAR(100) NOT NULL,
-                    name_official TEXT,
-                    cslb_number VARCHAR(50),
-                    address TEXT,
-                    city VARCHAR(100),
-                    state_code VARCHAR(2),
-                    zip VARCHAR(10),
-                    phone VARCHAR(20),
-                    fax VARCHAR(20),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (state, firm_id)
-                )
-            """)
-
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS bids (
-                    id SERIAL PRIMARY KEY,
-                    state VARCHAR(2) NOT NULL,
-                    tender_id INTEGER,
-                    firm_id VARCHAR(100) NOT NULL,
-                    bid_amount DECIMAL(15,2) NOT NULL,
-                    currency VARCHAR(3) DEFAULT 'USD',
-                    rank INTEGER,
-                    preference VARCHAR(10),
-                    cslb_number VARCHAR(50),
-                    name_official TEXT,
-                    UNIQUE(state, tender_id, firm_id)
-                )
-            """)
-
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS tender_winner_history (
-                    id SERIAL PRIMARY KEY,
-                    state VARCHAR(2) NOT NULL,
-                    tender_id INTEGER,
-                    firm_id VARCHAR(100),
-                    source VARCHAR(20),
-                    changed_by VARCHAR(100),
-                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    note TEXT
-                )
-            """)
-
-            # Create indexes for better performance
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_status ON crawl_jobs(status)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_created_at ON crawl_jobs(created_at)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_crawl_job_id ON metadata(crawl_job_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_url ON metadata(url)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_company_name ON metadata(company_name)")
-
-            # Tender-related indexes
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_state ON tenders(state)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_file_name ON tenders(file_name)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_contract_number ON tenders(contract_number)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_project_id ON tenders(project_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_bids_state ON bids(state)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_bids_tender_id ON bids(tender_id)")
-            await conn.execute("CREATE INDEX IF NOT EXISTS idx_firms_state ON firms(state)")
-
-            logger.info("Database initialized successfully")
+            version = await migrate(conn, connect)
+            logger.info(f"Database initialized successfully (schema version {version})")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         raise
 
 async def close_db():
-    """Close database connection pool"""
-    global _pool
+    """Close database connection pools"""
+    global _pool, _read_pool
+    if _read_pool:
+        await _read_pool.close()
+        _read_pool = None
+        logger.info("Read replica pool closed")
     if _pool:
         await _pool.close()
         _pool = None
@@ -0,0 +1,861 @@
+"""
+Versioned schema migrations.
+
+schema_migrations records applied versions. At startup migrate() reads the
+current version (and whether next month's partitions exist) in a single
+query and returns when nothing is pending, so restarting replicas never
+touch the catalog. Pending migrations run once, in order, under a session
+advisory lock; each runs in its own transaction unless it builds indexes
+with CREATE INDEX CONCURRENTLY (transactional=False, steps must then be
+idempotent).
+
+Schema changes are added as a new Migration at the end of MIGRATIONS;
+applied migrations are never edited. config/init-db.sql no longer carries a
+copy of the schema.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Awaitable, Callable, Optional
+import asyncpg
+from fruxai_shared.partitions import (
+    PARTITIONED_TABLES, PARTITION_LOCK_ID, convert_to_partitioned, ensure_upcoming_partitions,
+    partition_name, add_months, month_start
+)
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key serializing migrations across API replicas; shared with
+# partition creation, which takes it as a transaction lock on the fast path
+MIGRATION_LOCK_ID = PARTITION_LOCK_ID
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[..., Awaitable[None]]  # async fn(conn)
+    transactional: bool = True
+
+
+def statements(*sql: str) -> Callable[..., Awaitable[None]]:
+    """Migration step running plain SQL statements in order"""
+    async def apply(conn):
+        for statement in sql:
+            await conn.execute(statement)
+    return apply
+
+
+def concurrent_index(name: str, definition: str, unique: bool = False) -> Callable[..., Awaitable[None]]:
+    """
+    Migration step building an index without blocking writes (use with
+    transactional=False; not supported on partitioned tables). An invalid
+    index left by an interrupted build is dropped and rebuilt.
+    """
+    async def apply(conn):
+        invalid = await conn.fetchval(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)", name
+        )
+        if invalid:
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        await conn.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        )
+    return apply
+
+
+async def baseline(conn):
+    """Schema as previously created by init_db on every start (idempotent for existing databases)"""
+    # crawl_jobs, metadata and metadata_texts are partitioned by month
+    # on created_at (see fruxai_shared/partitions.py)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_jobs (
+            id SERIAL,
+            job_id VARCHAR(255) NOT NULL,
+            url TEXT NOT NULL,
+            status VARCHAR(50) DEFAULT 'pending',
+            priority INTEGER DEFAULT 1,
+            crawl_type VARCHAR(50) DEFAULT 'full',
+            max_depth INTEGER DEFAULT 2,
+            respect_robots BOOLEAN DEFAULT TRUE,
+            rate_limit INTEGER DEFAULT 1,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            error_message TEXT,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Create metadata table
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS metadata (
+            id SERIAL,
+            crawl_job_id INTEGER,
+            url TEXT NOT NULL,
+            title TEXT,
+            description TEXT,
+            keywords TEXT,
+            content_type VARCHAR(100),
+            file_size INTEGER,
+            crawl_depth INTEGER DEFAULT 0,
+            response_time DECIMAL(5,2),
+            status_code INTEGER,
+            extracted_text TEXT,
+            company_name TEXT,
+            company_website TEXT,
+            company_email TEXT,
+            company_phone TEXT,
+            company_address TEXT,
+            metadata_json JSONB,
+            local_file_path TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Extracted text lives outside the hot metadata row; Postgres
+    # compresses the TEXT column out of line (TOAST). created_at is the
+    # metadata row's, so text shares its partition month
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS metadata_texts (
+            metadata_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            text_length INTEGER NOT NULL,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (metadata_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Plain tables from earlier versions are converted in place once
+    for table in PARTITIONED_TABLES:
+        await convert_to_partitioned(conn, table)
+    await ensure_upcoming_partitions(conn)
+
+    # Move legacy inline text into metadata_texts
+    await conn.execute("""
+        WITH moved AS (
+            INSERT INTO metadata_texts (metadata_id, content, text_length, created_at)
+            SELECT id, extracted_text, char_length(extracted_text), created_at
+            FROM metadata
+            WHERE extracted_text IS NOT NULL
+            ON CONFLICT (metadata_id, created_at) DO NOTHING
+            RETURNING metadata_id
+        )
+        UPDATE metadata SET extracted_text = NULL
+        WHERE extracted_text IS NOT NULL
+    """)
+
+    # Create tender-related tables
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS tenders (
+            id SERIAL PRIMARY KEY,
+            state VARCHAR(2) NOT NULL,
+            file_name VARCHAR(255) NOT NULL,
+            contract_number VARCHAR(50),
+            project_id VARCHAR(50),
+            bid_opening_date DATE,
+            title TEXT,
+            location TEXT,
+            winner_firm_id VARCHAR(100),
+            winner_amount DECIMAL(15,2),
+            currency VARCHAR(3) DEFAULT 'USD',
+            extraction_info JSONB,
+            status VARCHAR(20) DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(state, file_name),
+            UNIQUE(state, contract_number),
+            UNIQUE(state, project_id)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS firms (
+            state VARCHAR(2) NOT NULL,
+            firm_id VARCHAR(100) NOT NULL,
+            name_official TEXT,
+            cslb_number VARCHAR(50),
+            address TEXT,
+            city VARCHAR(100),
+            state_code VARCHAR(2),
+            zip VARCHAR(10),
+            phone VARCHAR(20),
+            fax VARCHAR(20),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (state, firm_id)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS bids (
+            id SERIAL PRIMARY KEY,
+            state VARCHAR(2) NOT NULL,
+            tender_id INTEGER,
+            firm_id VARCHAR(100) NOT NULL,
+            bid_amount DECIMAL(15,2) NOT NULL,
+            currency VARCHAR(3) DEFAULT 'USD',
+            rank INTEGER,
+            preference VARCHAR(10),
+            cslb_number VARCHAR(50),
+            name_official TEXT,
+            UNIQUE(state, tender_id, firm_id)
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS tender_winner_history (
+            id SERIAL PRIMARY KEY,
+            state VARCHAR(2) NOT NULL,
+            tender_id INTEGER,
+            firm_id VARCHAR(100),
+            source VARCHAR(20),
+            changed_by VARCHAR(100),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            note TEXT
+        )
+    """)
+
+    # Content-addressed blob store used by the worker's StorageManager
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_blobs (
+            sha256 CHAR(64) PRIMARY KEY,
+            path TEXT NOT NULL,
+            content_type VARCHAR(100),
+            size_bytes BIGINT NOT NULL,
+            stored_bytes BIGINT NOT NULL,
+            compression VARCHAR(10),
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_refs (
+            id SERIAL PRIMARY KEY,
+            url TEXT NOT NULL,
+            crawl_date DATE NOT NULL,
+            sha256 CHAR(64) NOT NULL REFERENCES storage_blobs(sha256),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(url, crawl_date)
+        )
+    """)
+
+    # Storage manifest: one row per stored file, counters kept by trigger
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_files (
+            path TEXT PRIMARY KEY,
+            category VARCHAR(20) NOT NULL,
+            size_bytes BIGINT NOT NULL,
+            modified_at TIMESTAMP NOT NULL,
+            scan_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS storage_stats (
+            category VARCHAR(20) PRIMARY KEY,
+            file_count BIGINT NOT NULL DEFAULT 0,
+            total_bytes BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION storage_files_update_stats() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE storage_stats
+                SET file_count = file_count - 1, total_bytes = total_bytes - OLD.size_bytes
+                WHERE category = OLD.category;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO storage_stats (category, file_count, total_bytes)
+                VALUES (NEW.category, 1, NEW.size_bytes)
+                ON CONFLICT (category) DO UPDATE SET
+                    file_count = storage_stats.file_count + 1,
+                    total_bytes = storage_stats.total_bytes + EXCLUDED.total_bytes;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    await conn.execute("DROP TRIGGER IF EXISTS trg_storage_files_stats ON storage_files")
+    await conn.execute("""
+        CREATE TRIGGER trg_storage_files_stats
+        AFTER INSERT OR DELETE OR UPDATE OF category, size_bytes ON storage_files
+        FOR EACH ROW EXECUTE FUNCTION storage_files_update_stats()
+    """)
+
+    # Durable PDF ingestion queue consumed by ingest_worker.py
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_ingestions (
+            id SERIAL PRIMARY KEY,
+            ingestion_id VARCHAR(36) UNIQUE NOT NULL,
+            state VARCHAR(2) NOT NULL,
+            file_name VARCHAR(255) NOT NULL,
+            storage_key TEXT NOT NULL,
+            sha256 CHAR(64),
+            batch_id VARCHAR(36),
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            error_message TEXT,
+            tender_id INTEGER,
+            result JSONB,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            locked_by VARCHAR(100),
+            locked_until TIMESTAMP,
+            started_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS pdf_ingestion_batches (
+            id SERIAL PRIMARY KEY,
+            batch_id VARCHAR(36) UNIQUE NOT NULL,
+            state VARCHAR(2) NOT NULL,
+            file_count INTEGER NOT NULL DEFAULT 0,
+            duplicate_count INTEGER NOT NULL DEFAULT 0,
+            skipped_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Parser output cache keyed by document content and parser version
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            sha256 CHAR(64) NOT NULL,
+            parser VARCHAR(50) NOT NULL,
+            parser_version VARCHAR(20) NOT NULL,
+            result JSONB NOT NULL,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sha256, parser, parser_version)
+        )
+    """)
+
+    # Checkpoints of resumable re-extraction runs (worker core/backfill.py, api backfill.py)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_runs (
+            name VARCHAR(100) PRIMARY KEY,
+            target VARCHAR(20) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            last_id INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            updated INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            options JSONB,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+
+    # Caltrans bid rows pushed by the n8n workflows (bulk upserted)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS caltrans_bids (
+            id SERIAL PRIMARY KEY,
+            contract_number VARCHAR(50),
+            number_of_bidders INTEGER,
+            bid_rank INTEGER,
+            bid_amount DECIMAL(15,2),
+            bidder_id VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await conn.execute("ALTER TABLE caltrans_bids ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+
+    # Rows inserted one by one before the upsert key existed may repeat; keep the newest
+    await conn.execute("""
+        DELETE FROM caltrans_bids a
+        USING caltrans_bids b
+        WHERE a.contract_number = b.contract_number
+          AND a.bidder_id = b.bidder_id
+          AND a.id < b.id
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_indexes WHERE indexname = 'idx_caltrans_bids_contract_bidder'
+          )
+    """)
+
+    # Analytics summaries, refreshed per tender by services/analytics.py
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS tender_bid_stats (
+            tender_id INTEGER PRIMARY KEY,
+            state VARCHAR(2) NOT NULL,
+            month DATE NOT NULL,
+            bid_count INTEGER NOT NULL,
+            low_bid DECIMAL(15,2),
+            second_bid DECIMAL(15,2),
+            high_bid DECIMAL(15,2),
+            spread_amount DECIMAL(15,2),
+            spread_pct DOUBLE PRECISION,
+            winner_firm_id VARCHAR(100),
+            firm_ids TEXT[] NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS firm_monthly_stats (
+            state VARCHAR(2) NOT NULL,
+            firm_id VARCHAR(100) NOT NULL,
+            month DATE NOT NULL,
+            bid_count INTEGER NOT NULL DEFAULT 0,
+            win_count INTEGER NOT NULL DEFAULT 0,
+            total_bid_amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+            rank_sum INTEGER NOT NULL DEFAULT 0,
+            rank_count INTEGER NOT NULL DEFAULT 0,
+            pct_above_low_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (state, firm_id, month)
+        )
+    """)
+
+    # Create indexes for better performance
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_job_id ON crawl_jobs(job_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_status ON crawl_jobs(status)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_created_at ON crawl_jobs(created_at)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_pending_queue ON crawl_jobs(priority DESC, created_at) WHERE status = 'pending'")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_crawl_job_id ON metadata(crawl_job_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_url ON metadata(url)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_company_name ON metadata(company_name)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_url_created_at ON metadata(url, created_at DESC)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_metadata_local_file_path ON metadata(local_file_path)")
+
+    # Tender-related indexes
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_state ON tenders(state)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_file_name ON tenders(file_name)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_contract_number ON tenders(contract_number)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_project_id ON tenders(project_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_bids_state ON bids(state)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_bids_tender_id ON bids(tender_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_firms_state ON firms(state)")
+
+    # Storage indexes
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_storage_refs_sha256 ON storage_refs(sha256)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_storage_files_category_modified ON storage_files(category, modified_at)")
+
+    # Ingestion queue indexes (only runnable jobs are scanned when claiming)
+    await conn.execute("ALTER TABLE pdf_ingestions ADD COLUMN IF NOT EXISTS sha256 CHAR(64)")
+    await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pdf_ingestions_state_sha256 ON pdf_ingestions(state, sha256) WHERE status <> 'failed'")
+    await conn.execute("ALTER TABLE pdf_ingestions ADD COLUMN IF NOT EXISTS batch_id VARCHAR(36)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_ingestions_batch_id ON pdf_ingestions(batch_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_ingestions_runnable ON pdf_ingestions(created_at) WHERE status IN ('pending', 'processing')")
+
+    await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_caltrans_bids_contract_bidder ON caltrans_bids(contract_number, bidder_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_caltrans_bids_bidder_id ON caltrans_bids(bidder_id, id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_caltrans_bids_created_at ON caltrans_bids(created_at, id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_parser_version ON extraction_cache(parser, parser_version)")
+
+    # Analytics indexes (window scans per state, firm series)
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_tender_bid_stats_state_month ON tender_bid_stats(state, month)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_firm_monthly_stats_state_month ON firm_monthly_stats(state, month)")
+
+    # Formerly created only by config/init-db.sql
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS n8n_executions (
+            id SERIAL PRIMARY KEY,
+            execution_id VARCHAR(255) UNIQUE NOT NULL,
+            workflow_id VARCHAR(255),
+            status VARCHAR(50),
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            data JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            id SERIAL PRIMARY KEY,
+            metric_name VARCHAR(255) NOT NULL,
+            metric_value DECIMAL(10,2),
+            labels JSONB,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await conn.execute("""
+        CREATE OR REPLACE VIEW company_reports AS
+        SELECT
+            company_name,
+            COUNT(*) as total_pages,
+            AVG(response_time) as avg_response_time,
+            SUM(file_size) as total_file_size,
+            COUNT(DISTINCT crawl_job_id) as crawl_sessions,
+            MAX(created_at) as last_crawl,
+            ARRAY_AGG(DISTINCT company_website) FILTER (WHERE company_website IS NOT NULL) as websites,
+            ARRAY_AGG(DISTINCT company_email) FILTER (WHERE company_email IS NOT NULL) as emails,
+            ARRAY_AGG(DISTINCT company_phone) FILTER (WHERE company_phone IS NOT NULL) as phones
+        FROM metadata
+        WHERE company_name IS NOT NULL
+        GROUP BY company_name
+        ORDER BY total_pages DESC
+    """)
+
+
+async def change_feed(conn):
+    """change_log filled by row triggers on the tables served by GET /changes"""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq BIGSERIAL PRIMARY KEY,
+            xid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+            table_name VARCHAR(50) NOT NULL,
+            op CHAR(1) NOT NULL,
+            row_id BIGINT NOT NULL,
+            row_created_at TIMESTAMP,
+            changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Feed order; the cursor is (xid, seq), see routes/changes.py
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_cursor ON change_log(xid, seq)")
+
+    # Highest (xid, seq) removed by retention; older cursors must resync
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log_horizon (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            xid XID8 NOT NULL DEFAULT '0',
+            seq BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    await conn.execute("INSERT INTO change_log_horizon DEFAULT VALUES ON CONFLICT DO NOTHING")
+
+    # TG_ARGV[0] is the logical table name (TG_TABLE_NAME is the partition for metadata)
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$
+        DECLARE
+            r RECORD;
+            row_created TIMESTAMP;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+            IF TG_ARGV[0] = 'metadata' THEN row_created := r.created_at; END IF;
+            INSERT INTO change_log (table_name, op, row_id, row_created_at)
+            VALUES (TG_ARGV[0], left(TG_OP, 1), r.id, row_created);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Re-ingested rows are upserted unchanged apart from updated_at; those are not changes
+    changed_when = {
+        'tenders': "(to_jsonb(OLD) - 'updated_at') IS DISTINCT FROM (to_jsonb(NEW) - 'updated_at')",
+        'bids': "OLD.* IS DISTINCT FROM NEW.*",
+        'metadata': "(to_jsonb(OLD) - 'updated_at') IS DISTINCT FROM (to_jsonb(NEW) - 'updated_at')",
+    }
+    for table, changed in changed_when.items():
+        await conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_changes ON {table}")
+        await conn.execute(f"""
+            CREATE TRIGGER trg_{table}_changes
+            AFTER INSERT OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION record_change('{table}')
+        """)
+        await conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_updates ON {table}")
+        await conn.execute(f"""
+            CREATE TRIGGER trg_{table}_updates
+            AFTER UPDATE ON {table}
+            FOR EACH ROW WHEN ({changed})
+            EXECUTE FUNCTION record_change('{table}')
+        """)
+
+
+async def webhooks(conn):
+    """Webhook subscriptions and the outbox their events are queued in (see services/webhooks.py)"""
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_subscriptions (
+            id SERIAL PRIMARY KEY,
+            url TEXT NOT NULL,
+            events TEXT[] NOT NULL,
+            secret TEXT,
+            active BOOLEAN NOT NULL DEFAULT TRUE,
+            max_concurrency INTEGER NOT NULL DEFAULT 2,
+            batch_size INTEGER NOT NULL DEFAULT 100,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # One row per (subscription, event); written by the triggers below in the
+    # same transaction as the status change, so no event is lost
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            subscription_id INTEGER NOT NULL REFERENCES webhook_subscriptions(id) ON DELETE CASCADE,
+            event_type VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            batch_id VARCHAR(36),
+            locked_until TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            delivered_at TIMESTAMP
+        )
+    """)
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_webhook_outbox_due
+        ON webhook_outbox(subscription_id, next_attempt_at, id)
+        WHERE status IN ('pending', 'sending')
+    """)
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_webhook_outbox_batch ON webhook_outbox(batch_id)")
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_webhook_outbox_delivered
+        ON webhook_outbox(delivered_at) WHERE status = 'delivered'
+    """)
+
+    # TG_ARGV[0] selects the payload: 'crawl_job' or 'ingestion'
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION enqueue_webhook_event() RETURNS trigger AS $$
+        DECLARE
+            event TEXT;
+            payload JSONB;
+        BEGIN
+            event := TG_ARGV[0] || '.' || NEW.status;
+            IF TG_ARGV[0] = 'crawl_job' THEN
+                payload := jsonb_build_object(
+                    'job_id', NEW.job_id, 'url', NEW.url, 'status', NEW.status,
+                    'completed_at', NEW.completed_at, 'error_message', NEW.error_message
+                );
+            ELSE
+                payload := jsonb_build_object(
+                    'ingestion_id', NEW.ingestion_id, 'state', NEW.state,
+                    'file_name', NEW.file_name, 'batch_id', NEW.batch_id,
+                    'status', NEW.status, 'tender_id', NEW.tender_id,
+                    'attempts', NEW.attempts, 'error_message', NEW.error_message,
+                    'completed_at', NEW.completed_at
+                );
+            END IF;
+            INSERT INTO webhook_outbox (subscription_id, event_type, payload)
+            SELECT id, event, payload FROM webhook_subscriptions
+            WHERE active AND event = ANY(events);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table, source in (('crawl_jobs', 'crawl_job'), ('pdf_ingestions', 'ingestion')):
+        await conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_webhooks ON {table}")
+        await conn.execute(f"""
+            CREATE TRIGGER trg_{table}_webhooks
+            AFTER UPDATE OF status ON {table}
+            FOR EACH ROW
+            WHEN (NEW.status IN ('completed', 'failed') AND OLD.status IS DISTINCT FROM NEW.status)
+            EXECUTE FUNCTION enqueue_webhook_event('{source}')
+        """)
+
+
+async def crawl_job_ids(conn):
+    """
+    Unique job_id for the partitioned crawl_jobs table, whose primary key
+    (id, created_at) cannot carry a UNIQUE(job_id) constraint. The triggers
+    keep crawl_job_ids in step with crawl_jobs in the inserting/deleting
+    transaction; dropped partitions are cleared by the worker's retention.
+    """
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_job_ids (
+            job_id VARCHAR(255) PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION claim_crawl_job_id() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO crawl_job_ids (job_id, created_at) VALUES (NEW.job_id, NEW.created_at);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    await conn.execute("""
+        CREATE OR REPLACE FUNCTION release_crawl_job_id() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM crawl_job_ids WHERE job_id = OLD.job_id AND created_at = OLD.created_at;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Creating the triggers locks out concurrent inserts, so the backfill below sees every row
+    await conn.execute("DROP TRIGGER IF EXISTS trg_crawl_jobs_claim_id ON crawl_jobs")
+    await conn.execute("""
+        CREATE TRIGGER trg_crawl_jobs_claim_id
+        BEFORE INSERT ON crawl_jobs
+        FOR EACH ROW EXECUTE FUNCTION claim_crawl_job_id()
+    """)
+    await conn.execute("DROP TRIGGER IF EXISTS trg_crawl_jobs_release_id ON crawl_jobs")
+    await conn.execute("""
+        CREATE TRIGGER trg_crawl_jobs_release_id
+        AFTER DELETE ON crawl_jobs
+        FOR EACH ROW EXECUTE FUNCTION release_crawl_job_id()
+    """)
+
+    # Duplicates accepted since the table was partitioned: the oldest row keeps the job_id
+    duplicates = await conn.fetchval("""
+        SELECT COUNT(*) - COUNT(DISTINCT job_id) FROM crawl_jobs
+    """)
+    if duplicates:
+        logger.warning(f"{duplicates} crawl_jobs rows repeat an existing job_id; only the oldest stays addressable")
+    await conn.execute("""
+        INSERT INTO crawl_job_ids (job_id, created_at)
+        SELECT DISTINCT ON (job_id) job_id, created_at FROM crawl_jobs
+        ORDER BY job_id, created_at, id
+        ON CONFLICT (job_id) DO NOTHING
+    """)
+
+
+async def crawl_job_leases(conn):
+    """
+    Lease columns for POST /crawl-jobs/lease, the same owner + expiry scheme
+    pdf_ingestions uses: expired 'running' jobs go back to 'pending' (or to
+    'failed' once attempts reach max_attempts) instead of staying running.
+    """
+    await conn.execute("""
+        ALTER TABLE crawl_jobs
+            ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100),
+            ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3
+    """)
+    # Expired leases are looked up on every lease call
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_crawl_jobs_running_lease
+        ON crawl_jobs(locked_until) WHERE status = 'running'
+    """)
+    # Jobs leased before this migration: give their workers an hour to finish
+    await conn.execute("""
+        UPDATE crawl_jobs SET
+            attempts = 1,
+            locked_until = COALESCE(updated_at, created_at) + INTERVAL '1 hour'
+        WHERE status = 'running' AND locked_until IS NULL
+    """)
+
+
+MIGRATIONS = [
+    Migration(1, 'baseline', baseline),
+    # GET /state/{state}/tenders: newest first, optionally by bid opening date range
+    Migration(2, 'tenders_state_created_index',
+              concurrent_index('idx_tenders_state_created_at', 'tenders(state, created_at DESC, id DESC)'),
+              transactional=False),
+    Migration(3, 'tenders_state_bid_opening_index',
+              concurrent_index('idx_tenders_state_bid_opening', 'tenders(state, bid_opening_date)'),
+              transactional=False),
+    Migration(4, 'change_feed', change_feed),
+    Migration(5, 'webhooks', webhooks),
+    Migration(6, 'crawl_job_ids', crawl_job_ids),
+    Migration(7, 'crawl_job_leases', crawl_job_leases),
+    # Analytics summaries hold upper case state codes (tenders ingested as 'ca'
+    # are summed into 'CA'); firm-month rows are additive, so merging is exact
+    Migration(8, 'analytics_state_upper_case', statements(
+        "UPDATE tender_bid_stats SET state = upper(state) WHERE state <> upper(state)",
+        """
+        INSERT INTO firm_monthly_stats (
+            state, firm_id, month, bid_count, win_count, total_bid_amount,
+            rank_sum, rank_count, pct_above_low_sum
+        )
+        SELECT upper(state), firm_id, month, SUM(bid_count), SUM(win_count), SUM(total_bid_amount),
+               SUM(rank_sum), SUM(rank_count), SUM(pct_above_low_sum)
+        FROM firm_monthly_stats
+        WHERE state <> upper(state)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (state, firm_id, month) DO UPDATE SET
+            bid_count = firm_monthly_stats.bid_count + EXCLUDED.bid_count,
+            win_count = firm_monthly_stats.win_count + EXCLUDED.win_count,
+            total_bid_amount = firm_monthly_stats.total_bid_amount + EXCLUDED.total_bid_amount,
+            rank_sum = firm_monthly_stats.rank_sum + EXCLUDED.rank_sum,
+            rank_count = firm_monthly_stats.rank_count + EXCLUDED.rank_count,
+            pct_above_low_sum = firm_monthly_stats.pct_above_low_sum + EXCLUDED.pct_above_low_sum,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        "DELETE FROM firm_monthly_stats WHERE state <> upper(state)",
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def schema_status(conn):
+    """(applied version, next month's partitions exist) in one round trip"""
+    next_month = add_months(month_start(date.today()), 1)
+    try:
+        row = await conn.fetchrow("""
+            SELECT (SELECT MAX(version) FROM schema_migrations) AS version,
+                   to_regclass($1) IS NOT NULL AS partitions_ready
+        """, partition_name('metadata', next_month))
+    except asyncpg.UndefinedTableError:
+        return 0, False
+    return row['version'] or 0, row['partitions_ready']
+
+
+async def migrate(conn, connect: Optional[Callable[[], Awaitable[Any]]] = None) -> int:
+    """
+    Apply pending migrations; returns the schema version. connect opens a
+    direct server session for applying them when conn goes through a
+    transaction-pooling proxy (session advisory locks need a real session).
+    """
+    version, partitions_ready = await schema_status(conn)
+    if version >= LATEST_VERSION:
+        if not partitions_ready:
+            await ensure_upcoming_partitions(conn)
+        return version
+
+    if connect is None:
+        await apply_pending(conn)
+    else:
+        session = await connect()
+        try:
+            await apply_pending(session)
+        finally:
+            await session.close()
+    return LATEST_VERSION
+
+
+async def apply_pending(conn):
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+    # Migrations may legitimately run longer than DB_STATEMENT_TIMEOUT_MS
+    await conn.execute("SET statement_timeout = 0")
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Another replica may have migrated while we waited for the lock
+        applied = {row['version'] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            logger.info(f"Applying schema migration {migration.version}: {migration.name}")
+            if migration.transactional:
+                async with conn.transaction():
+                    await migration.apply(conn)
+                    await record(conn, migration)
+            else:
+                await migration.apply(conn)
+                await record(conn, migration)
+
+        await ensure_upcoming_partitions(conn)
+    finally:
+        await conn.execute("RESET statement_timeout")
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+
+
+async def record(conn, migration: Migration):
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+        migration.version, migration.name
+    )
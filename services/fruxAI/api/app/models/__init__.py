@@ -2,5 +2,7 @@
 from .crawl_job import CrawlJob
 from .metadata import Metadata
 from .tender import Tender, Bid, Firm, TenderWinnerHistory
+from .caltrans_bid import CaltransBid, CaltransBidCreate
+from .webhook import Webhook, WebhookCreate
 
-__all__ = ["CrawlJob", "Metadata", "Tender", "Bid", "Firm", "TenderWinnerHistory"]
+__all__ = ["CrawlJob", "Metadata", "Tender", "Bid", "Firm", "TenderWinnerHistory", "CaltransBid", "CaltransBidCreate", "Webhook", "WebhookCreate"]
@@ -0,0 +1,36 @@
+import re
+from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+from pydantic import BaseModel, Field, field_validator
+
+class CaltransBidBase(BaseModel):
+    contract_number: str = Field(..., min_length=1, max_length=50)
+    number_of_bidders: Optional[int] = Field(None, ge=0)
+    bid_rank: int = Field(..., ge=1)
+    bid_amount: Decimal = Field(..., ge=0, max_digits=15, decimal_places=2)
+    bidder_id: str = Field(..., min_length=1, max_length=50)
+
+    @field_validator('contract_number', 'bidder_id', mode='before')
+    @classmethod
+    def strip_text(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+    @field_validator('bid_amount', mode='before')
+    @classmethod
+    def parse_amount(cls, value):
+        # CSV exports carry "$2,053,700.00"
+        if isinstance(value, str):
+            return re.sub(r'[$,\s]', '', value)
+        return value
+
+class CaltransBidCreate(CaltransBidBase):
+    pass
+
+class CaltransBid(CaltransBidBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -18,6 +18,7 @@ class CrawlJobUpdate(BaseModel):
     status: Optional[str] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    worker_id: Optional[str] = None  # lease owner from POST /crawl-jobs/lease
 
 class CrawlJob(CrawlJobBase):
     id: int
@@ -26,6 +27,10 @@ class CrawlJob(CrawlJobBase):
     updated_at: datetime
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    attempts: int = 0
+    max_attempts: int = 3
 
     class Config:
         from_attributes = True
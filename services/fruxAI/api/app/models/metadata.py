@@ -13,7 +13,6 @@ class MetadataBase(BaseModel):
     crawl_depth: int = 0
     response_time: Optional[float] = None
     status_code: Optional[int] = None
-    extracted_text: Optional[str] = None
     company_name: Optional[str] = None
     company_website: Optional[str] = None
     company_email: Optional[str] = None
@@ -23,7 +22,8 @@ class MetadataBase(BaseModel):
     local_file_path: Optional[str] = None
 
 class MetadataCreate(MetadataBase):
-    pass
+    # Stored in metadata_texts, not in the metadata row
+    extracted_text: Optional[str] = None
 
 class MetadataUpdate(BaseModel):
     title: Optional[str] = None
@@ -40,12 +40,45 @@ class MetadataUpdate(BaseModel):
 
 class Metadata(MetadataBase):
     id: int
+    text_length: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class MetadataSummary(BaseModel):
+    """Projection of a metadata row; only the selected fields are set"""
+    id: Optional[int] = None
+    crawl_job_id: Optional[int] = None
+    url: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    keywords: Optional[str] = None
+    content_type: Optional[str] = None
+    file_size: Optional[int] = None
+    crawl_depth: Optional[int] = None
+    response_time: Optional[float] = None
+    status_code: Optional[int] = None
+    company_name: Optional[str] = None
+    company_website: Optional[str] = None
+    company_email: Optional[str] = None
+    company_phone: Optional[str] = None
+    company_address: Optional[str] = None
+    metadata_json: Optional[Dict[str, Any]] = None
+    local_file_path: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# Columns that can be requested through ?fields= on list endpoints
+METADATA_FIELDS = tuple(MetadataSummary.model_fields)
+
+# Default projection for list endpoints (header fields only)
+METADATA_LIST_FIELDS = (
+    "id", "crawl_job_id", "url", "title", "content_type", "file_size",
+    "status_code", "company_name", "local_file_path", "created_at",
+)
+
 class CompanyReport(BaseModel):
     company_name: str
     website: Optional[str] = None
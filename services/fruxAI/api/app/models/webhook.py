@@ -0,0 +1,43 @@
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+
+# Events fired by the triggers in migrations.webhooks
+WEBHOOK_EVENTS = (
+    "crawl_job.completed",
+    "crawl_job.failed",
+    "ingestion.completed",
+    "ingestion.failed",
+)
+
+class WebhookBase(BaseModel):
+    url: str = Field(..., pattern=r"^https?://")
+    events: List[str] = Field(..., min_length=1)
+    max_concurrency: int = Field(2, ge=1, le=20)  # batches in flight to this endpoint
+    batch_size: int = Field(100, ge=1, le=1000)  # events per POST
+    active: bool = True
+
+    @field_validator('events')
+    @classmethod
+    def known_events(cls, value):
+        unknown = [event for event in value if event not in WEBHOOK_EVENTS]
+        if unknown:
+            raise ValueError(f"Unknown events: {', '.join(unknown)}")
+        return sorted(set(value))
+
+class WebhookCreate(WebhookBase):
+    # Deliveries are signed with HMAC-SHA256 when set (X-Fruxai-Signature)
+    secret: Optional[str] = None
+
+class WebhookUpdate(BaseModel):
+    active: Optional[bool] = None
+    max_concurrency: Optional[int] = Field(None, ge=1, le=20)
+    batch_size: Optional[int] = Field(None, ge=1, le=1000)
+
+class Webhook(WebhookBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
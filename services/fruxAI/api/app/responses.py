@@ -0,0 +1,63 @@
+"""
+orjson based JSON responses.
+
+FastJSONResponse is the app's default response class. For large list pages,
+rows_response() hands asyncpg records straight to orjson: no dict() copies,
+no per-row response_model validation and no jsonable_encoder pass. Set
+API_VALIDATE_RESPONSES=true to route those pages back through the declared
+response_model (e.g. while changing a query or a model).
+"""
+
+import os
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Iterable, Optional
+
+import orjson
+from asyncpg import Record
+from fastapi.responses import JSONResponse
+
+VALIDATE_RESPONSES = os.getenv("API_VALIDATE_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Types orjson does not encode natively (same output as FastAPI's jsonable_encoder)"""
+    if isinstance(value, Record):
+        return dict(value)
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, uuid.UUID):
+        # asyncpg returns its own UUID subclass, which orjson does not accept
+        return str(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; accepts asyncpg records, Decimals and JSONB values as-is"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_response(rows: Iterable[Record], status_code: int = 200, headers: Optional[dict] = None):
+    """
+    Return query rows for an endpoint with a list response_model. Encodes the
+    records directly unless API_VALIDATE_RESPONSES is set, in which case plain
+    dicts are returned and FastAPI validates them against the response_model.
+    """
+    if VALIDATE_RESPONSES:
+        return [dict(row) for row in rows]
+    return FastJSONResponse(rows, status_code=status_code, headers=headers)
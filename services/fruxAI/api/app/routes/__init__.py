@@ -5,3 +5,6 @@ from .metadata import router as metadata
 from .reports import router as reports
 from .caltrans_bids import router as caltrans_bids
 from .tenders import router as tenders
+from .analytics import router as analytics
+from .changes import router as changes
+from .webhooks import router as webhooks
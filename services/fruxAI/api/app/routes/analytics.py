@@ -0,0 +1,185 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from datetime import date, datetime
+from app.config.database import read_connection
+
+router = APIRouter()
+
+# Served from tender_bid_stats / firm_monthly_stats (see services/analytics.py),
+# on the read replica when one is configured
+
+RANKING_ORDER = {
+    'win_rate': 'win_rate DESC, wins DESC',
+    'wins': 'wins DESC, win_rate DESC',
+    'bids': 'bids DESC, wins DESC',
+    'total_amount': 'total_bid_amount DESC',
+    'avg_pct_above_low': 'avg_pct_above_low ASC',
+}
+
+def month_window(months: int, date_from: Optional[date], date_to: Optional[date]):
+    """Resolve window options to an inclusive [first month, last month] range"""
+    end = (date_to or date.today()).replace(day=1)
+    if date_from:
+        start = date_from.replace(day=1)
+    else:
+        total = end.year * 12 + end.month - months
+        start = date(total // 12, total % 12 + 1, 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return start, end
+
+def window_info(start: date, end: date):
+    return {"from": start.isoformat(), "to": end.isoformat()}
+
+@router.get("/analytics/states")
+async def get_state_summary(
+    months: int = Query(12, ge=1, le=240),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    conn=Depends(read_connection)
+):
+    """Tender, bid and spread totals per state for the window"""
+    start, end = month_window(months, date_from, date_to)
+    rows = await conn.fetch("""
+        SELECT state,
+               COUNT(*) AS tenders,
+               SUM(bid_count) AS bids,
+               AVG(bid_count)::float8 AS avg_bidders,
+               SUM(low_bid) AS total_low_bid,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY spread_pct) AS median_spread_pct
+        FROM tender_bid_stats
+        WHERE month BETWEEN $1 AND $2
+        GROUP BY state
+        ORDER BY state
+    """, start, end)
+    return {"window": window_info(start, end), "states": [dict(row) for row in rows]}
+
+@router.get("/analytics/{state}/firms")
+async def get_firm_rankings(
+    state: str,
+    months: int = Query(12, ge=1, le=240),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: str = Query('win_rate', pattern='^(' + '|'.join(RANKING_ORDER) + ')$'),
+    min_bids: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=1000),
+    conn=Depends(read_connection)
+):
+    """Rank firms of a state by win rate, wins, bid volume or closeness to the low bid"""
+    start, end = month_window(months, date_from, date_to)
+    rows = await conn.fetch(f"""
+        SELECT s.firm_id, f.name_official, s.bids, s.wins,
+               s.wins::float8 / s.bids AS win_rate,
+               s.total_bid_amount,
+               s.rank_sum::float8 / NULLIF(s.rank_count, 0) AS avg_rank,
+               s.pct_above_low_sum / s.bids AS avg_pct_above_low
+        FROM (
+            SELECT firm_id,
+                   SUM(bid_count) AS bids,
+                   SUM(win_count) AS wins,
+                   SUM(total_bid_amount) AS total_bid_amount,
+                   SUM(rank_sum) AS rank_sum,
+                   SUM(rank_count) AS rank_count,
+                   SUM(pct_above_low_sum) AS pct_above_low_sum
+            FROM firm_monthly_stats
+            WHERE state = $1 AND month BETWEEN $2 AND $3
+            GROUP BY firm_id
+            HAVING SUM(bid_count) >= $4
+        ) s
+        LEFT JOIN firms f ON f.state = $1 AND f.firm_id = s.firm_id
+        ORDER BY {RANKING_ORDER[order_by]}, s.firm_id
+        LIMIT $5
+    """, state.upper(), start, end, min_bids, limit)
+    return {
+        "state": state.upper(),
+        "window": window_info(start, end),
+        "order_by": order_by,
+        "firms": [dict(row) for row in rows]
+    }
+
+@router.get("/analytics/{state}/firms/{firm_id}")
+async def get_firm_stats(
+    state: str,
+    firm_id: str,
+    months: int = Query(12, ge=1, le=240),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    conn=Depends(read_connection)
+):
+    """Monthly bid/win series of one firm"""
+    start, end = month_window(months, date_from, date_to)
+    rows = await conn.fetch("""
+        SELECT month, bid_count AS bids, win_count AS wins,
+               win_count::float8 / bid_count AS win_rate,
+               total_bid_amount,
+               pct_above_low_sum / bid_count AS avg_pct_above_low
+        FROM firm_monthly_stats
+        WHERE state = $1 AND firm_id = $2 AND month BETWEEN $3 AND $4
+        ORDER BY month
+    """, state.upper(), firm_id, start, end)
+
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No bids for firm {firm_id} in {state.upper()} for this window")
+
+    bids = sum(row['bids'] for row in rows)
+    wins = sum(row['wins'] for row in rows)
+    return {
+        "state": state.upper(),
+        "firm_id": firm_id,
+        "window": window_info(start, end),
+        "bids": bids,
+        "wins": wins,
+        "win_rate": wins / bids,
+        "months": [dict(row) for row in rows]
+    }
+
+@router.get("/analytics/{state}/spreads")
+async def get_bid_spreads(
+    state: str,
+    months: int = Query(12, ge=1, le=240),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    percentiles: List[float] = Query([0.25, 0.5, 0.75, 0.9]),
+    by_month: bool = False,
+    conn=Depends(read_connection)
+):
+    """Percentiles of the gap between the low and second bid (relative to the low bid)"""
+    if any(not 0 <= p <= 1 for p in percentiles):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 1")
+
+    start, end = month_window(months, date_from, date_to)
+    group = "month" if by_month else "NULL::date"
+    rows = await conn.fetch(f"""
+        SELECT {group} AS month,
+               COUNT(*) AS tenders,
+               AVG(bid_count)::float8 AS avg_bidders,
+               AVG(spread_pct) AS avg_spread_pct,
+               percentile_cont($4::float8[]) WITHIN GROUP (ORDER BY spread_pct) AS spread_pct,
+               percentile_cont($4::float8[]) WITHIN GROUP (ORDER BY spread_amount) AS spread_amount
+        FROM tender_bid_stats
+        WHERE state = $1 AND month BETWEEN $2 AND $3 AND spread_pct IS NOT NULL
+        GROUP BY 1
+        ORDER BY 1
+    """, state.upper(), start, end, percentiles)
+
+    def series(row):
+        return {
+            "month": row['month'],
+            "tenders": row['tenders'],
+            "avg_bidders": row['avg_bidders'],
+            "avg_spread_pct": row['avg_spread_pct'],
+            "spread_pct": dict(zip(map(str, percentiles), row['spread_pct'] or [])),
+            "spread_amount": dict(zip(map(str, percentiles), row['spread_amount'] or [])),
+        }
+
+    result = {
+        "state": state.upper(),
+        "window": window_info(start, end),
+        "generated_at": datetime.utcnow().isoformat()
+    }
+    if by_month:
+        result["months"] = [series(row) for row in rows]
+    else:
+        result.update(series(rows[0]) if rows else {"tenders": 0})
+        result.pop("month", None)
+    return result
@@ -1,58 +1,57 @@
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import text
-from app.config.database import get_connection
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from datetime import datetime
+from typing import Any, List, Optional
+from app.config.database import read_connection
+from app.responses import FastJSONResponse
+from app.services.caltrans_bids import CaltransBidImporter, iter_csv, iter_items, iter_ndjson
 import logging
 
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional, only needed for format=arrow
+    pa = None
+
 logger = logging.getLogger(__name__)
 
+BID_COLUMNS = ('id', 'contract_number', 'number_of_bidders', 'bid_rank', 'bid_amount', 'bidder_id', 'created_at')
+
+# Upper bound for one page (columnar/arrow clients page with large limits)
+MAX_PAGE_SIZE = 10000
+
 router = APIRouter()
 
+@router.post("/caltrans-bids/bulk")
 @router.post("/insert-caltrans-bids")
-async def insert_caltrans_bids(data: dict):
+async def insert_caltrans_bids(request: Request):
     """
-    Insert Caltrans bid data into database
+    Bulk upsert Caltrans bids.
+
+    Body is a JSON array (or {"bids": [...]}), CSV with a header row
+    (text/csv) or NDJSON (application/x-ndjson); CSV and NDJSON are
+    streamed. Rows are keyed by (contract_number, bidder_id).
     """
-    logger.info("Inserting Caltrans bids into database...")
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    logger.info(f"Inserting Caltrans bids into database ({content_type or 'unknown content type'})...")
 
-    try:
-        # Get database session
-        async with get_connection() as session:
-            # Insert bid data
-            bids = [
-                ('10-1L8604', 6, 1, 2053700.00, 'VC1200002736'),
-                ('10-1L8604', 6, 2, 2271255.20, 'VC1500004960'),
-                ('10-1L8604', 6, 3, 2287000.00, 'VC2000002246'),
-                ('10-1L8604', 6, 4, 2307077.55, 'VC1700000908'),
-                ('10-1L8604', 6, 5, 2324503.15, 'VC2200003483'),
-                ('10-1L8604', 6, 6, 2575075.00, 'VC1200003869')
-            ]
-
-            inserted_count = 0
-            for bid in bids:
-                await session.execute(
-                    text("""
-                        INSERT INTO caltrans_bids
-                        (contract_number, number_of_bidders, bid_rank, bid_amount, bidder_id)
-                        VALUES ($1, $2, $3, $4, $5)
-                    """),
-                    bid
-                )
-                inserted_count += 1
-
-            await session.commit()
-
-            logger.info(f"Successfully inserted {inserted_count} Caltrans bid records")
-
-            return {
-                "status": "success",
-                "message": f"Inserted {inserted_count} Caltrans bid records",
-                "data": {
-                    "contract_number": "10-1L8604",
-                    "total_bidders": 6,
-                    "inserted_records": inserted_count
-                }
-            }
+    if content_type in ('text/csv', 'application/csv'):
+        rows = iter_csv(request.stream())
+    elif content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        rows = iter_ndjson(request.stream())
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array, CSV or NDJSON")
+        if isinstance(payload, dict):
+            payload = payload.get('bids')
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of bids or {\"bids\": [...]}")
+        rows = iter_items(payload)
 
+    try:
+        summary = await CaltransBidImporter().run(rows)
     except Exception as e:
         logger.error(f"Error inserting Caltrans bids: {e}")
         raise HTTPException(
@@ -60,34 +59,53 @@ async def insert_caltrans_bids(data: dict):
             detail=f"Database error: {str(e)}"
         )
 
+    return {
+        "status": "success" if not summary['invalid'] else "partial",
+        "message": f"Upserted {summary['inserted'] + summary['updated']} Caltrans bid records",
+        "data": summary
+    }
+
 @router.get("/caltrans-bids")
-async def get_caltrans_bids():
+async def get_caltrans_bids(
+    contract_number: Optional[str] = None,
+    bidder_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    after_id: int = Query(0, ge=0, description="Keyset cursor: next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|columnar|arrow)$"),
+    conn=Depends(read_connection)
+):
     """
-    Get all Caltrans bids from database
+    Get Caltrans bids in id order, one keyset page at a time.
+
+    format=columnar returns {column: [values]}; format=arrow returns an
+    Arrow IPC stream (requires pyarrow).
     """
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=400, detail="format=arrow requires pyarrow on the API server")
+
+    conditions = ["id > $1"]
+    params: List[Any] = [after_id]
+    for column, op, value in (
+        ("contract_number", "=", contract_number),
+        ("bidder_id", "=", bidder_id),
+        ("created_at", ">=", created_from),
+        ("created_at", "<", created_to),
+    ):
+        if value is not None:
+            params.append(value)
+            conditions.append(f"{column} {op} ${len(params)}")
+    params.append(limit)
+
     try:
-        async with get_connection() as session:
-            result = await session.execute(
-                text("SELECT * FROM caltrans_bids ORDER BY bid_rank")
-            )
-            rows = result.fetchall()
-
-            return {
-                "status": "success",
-                "count": len(rows),
-                "data": [
-                    {
-                        "id": row[0],
-                        "contract_number": row[1],
-                        "number_of_bidders": row[2],
-                        "bid_rank": row[3],
-                        "bid_amount": row[4],
-                        "bidder_id": row[5],
-                        "created_at": row[6]
-                    }
-                    for row in rows
-                ]
-            }
+        rows = await conn.fetch(f"""
+            SELECT {', '.join(BID_COLUMNS)}
+            FROM caltrans_bids
+            WHERE {' AND '.join(conditions)}
+            ORDER BY id
+            LIMIT ${len(params)}
+        """, *params)
 
     except Exception as e:
         logger.error(f"Error fetching Caltrans bids: {e}")
@@ -95,3 +113,34 @@ async def get_caltrans_bids():
             status_code=500,
             detail=f"Database error: {str(e)}"
         )
+
+    next_cursor = rows[-1]['id'] if len(rows) == limit else None
+
+    if format == "json":
+        return FastJSONResponse({
+            "status": "success",
+            "count": len(rows),
+            "next_cursor": next_cursor,
+            "data": rows
+        })
+
+    columns = {column: [row[column] for row in rows] for column in BID_COLUMNS}
+
+    if format == "arrow":
+        sink = pa.BufferOutputStream()
+        table = pa.table(columns)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor else {}
+        return Response(
+            content=sink.getvalue().to_pybytes(),
+            media_type="application/vnd.apache.arrow.stream",
+            headers=headers
+        )
+
+    return {
+        "status": "success",
+        "count": len(rows),
+        "next_cursor": next_cursor,
+        "columns": columns
+    }
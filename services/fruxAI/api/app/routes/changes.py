@@ -0,0 +1,170 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, List, Optional, Tuple
+from app.config.database import get_connection
+from app.responses import FastJSONResponse, dumps
+
+router = APIRouter()
+
+# Change feed over change_log (filled by triggers, see migrations.change_feed).
+#
+# A token "<xid>-<seq>" means every change ordered at or before (xid, seq)
+# has been delivered. Only changes of transactions older than the snapshot
+# xmin are served: those have all finished, so nothing can still appear
+# behind a token once it is handed out, however long a writer stays open.
+# Changes are ordered by (xid, seq); each carries the row as it is now (or
+# null once deleted), so applying them by key converges even where two
+# transactions committed in a different order than their xids.
+#
+# Always read from the primary: a replica's snapshot can trail a token
+# issued by the primary.
+
+CHANGE_TABLES = ('tenders', 'bids', 'metadata')
+
+MAX_PAGE_SIZE = 10000
+MAX_STREAM_SIZE = 1000000
+
+START_TOKEN = "0-0"
+
+CURRENT_ROW = """
+    CASE c.table_name
+        WHEN 'tenders' THEN (SELECT to_jsonb(t) FROM tenders t WHERE t.id = c.row_id)
+        WHEN 'bids' THEN (SELECT to_jsonb(b) FROM bids b WHERE b.id = c.row_id)
+        WHEN 'metadata' THEN (
+            SELECT to_jsonb(m) FROM metadata m
+            WHERE m.id = c.row_id AND m.created_at = c.row_created_at
+        )
+    END
+"""
+
+OPS = {'I': 'insert', 'U': 'update', 'D': 'delete'}
+
+def parse_token(token: Optional[str]) -> Tuple[int, int]:
+    try:
+        xid, seq = (token or START_TOKEN).split("-")
+        return int(xid), int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid change token: {token}")
+
+def format_token(xid: int, seq: int) -> str:
+    return f"{xid}-{seq}"
+
+def parse_tables(tables: Optional[str]) -> List[str]:
+    if not tables:
+        return list(CHANGE_TABLES)
+    selected = [t.strip() for t in tables.split(",") if t.strip()]
+    unknown = [t for t in selected if t not in CHANGE_TABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}")
+    return selected
+
+def change_query(include_rows: bool) -> str:
+    # $1/$3 are bound as ints (asyncpg's xid8 codec); xid is read back as text
+    row = f", {CURRENT_ROW} AS row" if include_rows else ""
+    return f"""
+        SELECT c.seq, c.xid::text AS xid, c.table_name, c.op, c.row_id,
+               c.row_created_at, c.changed_at{row}
+        FROM change_log c
+        WHERE (c.xid, c.seq) > ($1::xid8, $2)
+          AND c.xid < $3::xid8
+          AND c.table_name = ANY($4::text[])
+        ORDER BY c.xid, c.seq
+        LIMIT $5
+    """
+
+def change_event(row) -> dict:
+    event = {
+        "token": format_token(int(row['xid']), row['seq']),
+        "table": row['table_name'],
+        "op": OPS[row['op']],
+        "id": row['row_id'],
+        "changed_at": row['changed_at'],
+    }
+    if row['row_created_at'] is not None:
+        event["created_at"] = row['row_created_at']
+    if 'row' in row.keys():
+        event["row"] = row['row']
+    return event
+
+async def feed_window(conn, since: Tuple[int, int]) -> int:
+    """Snapshot xmin capping this read; raises 410 when since predates retention"""
+    row = await conn.fetchrow("""
+        SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS xmin,
+               h.xid::text AS horizon_xid, h.seq AS horizon_seq
+        FROM change_log_horizon h
+    """)
+    if since < (int(row['horizon_xid']), row['horizon_seq']):
+        raise HTTPException(
+            status_code=410,
+            detail="Changes since this token were pruned; resync from GET /changes/head"
+        )
+    return int(row['xmin'])
+
+def next_token(since: Tuple[int, int], xmin: int, last: Optional[Tuple[int, int]], has_more: bool) -> str:
+    """Resume point: the last change of a full page, otherwise the read's xmin"""
+    if has_more:
+        return format_token(*last)
+    return format_token(*max(since, last or since, (xmin, 0)))
+
+@router.get("/changes/head")
+async def get_change_head():
+    """Token of the current end of the feed (take it before a full copy, then follow /changes)"""
+    async with get_connection() as conn:
+        xmin = await conn.fetchval("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")
+    return {"token": format_token(int(xmin), 0)}
+
+@router.get("/changes")
+async def get_changes(
+    since: Optional[str] = Query(None, description="Token from a previous response (start of the feed when omitted)"),
+    tables: Optional[str] = Query(None, description="Comma separated: tenders, bids, metadata"),
+    limit: int = Query(1000, ge=1, le=MAX_STREAM_SIZE),
+    include_rows: bool = Query(True, description="Attach each changed row's current content"),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Inserts, updates and deletes of tenders, bids and metadata since a token.
+
+    format=json returns one page (limit up to 10000) with next_token and
+    has_more. format=ndjson streams up to limit changes through a server-side
+    cursor, one JSON object per line, ending with a {"next_token", "has_more"}
+    line.
+    """
+    start = parse_token(since)
+    selected = parse_tables(tables)
+    query = change_query(include_rows)
+
+    if format == "json":
+        if limit > MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"limit for format=json is at most {MAX_PAGE_SIZE}")
+        async with get_connection() as conn:
+            xmin = await feed_window(conn, start)
+            rows = await conn.fetch(query, start[0], start[1], xmin, selected, limit)
+
+        changes = [change_event(row) for row in rows]
+        last = (int(rows[-1]['xid']), rows[-1]['seq']) if rows else None
+        has_more = len(rows) == limit
+        return FastJSONResponse({
+            "changes": changes,
+            "count": len(changes),
+            "next_token": next_token(start, xmin, last, has_more),
+            "has_more": has_more,
+        })
+
+    # Check the token before the response starts so a 410 is still possible
+    async with get_connection() as conn:
+        await feed_window(conn, start)
+
+    async def stream():
+        async with get_connection() as conn:
+            async with conn.transaction():
+                xmin = await feed_window(conn, start)
+                count = 0
+                last = None
+                async for row in conn.cursor(query, start[0], start[1], xmin, selected, limit):
+                    count += 1
+                    last = (int(row['xid']), row['seq'])
+                    yield dumps(change_event(row)) + b"\n"
+                has_more = count == limit
+                yield dumps({"next_token": next_token(start, xmin, last, has_more), "has_more": has_more}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
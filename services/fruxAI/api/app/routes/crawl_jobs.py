@@ -1,12 +1,113 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from app.models.crawl_job import CrawlJob, CrawlJobCreate, CrawlJobUpdate
-from app.config.database import get_connection
+from app.config.database import get_connection, statements
+from app.responses import rows_response
+import os
 import uuid
 from datetime import datetime
 
 router = APIRouter()
 
+# Dequeue order for pending jobs; matches idx_crawl_jobs_pending_queue
+# (partial index on status = 'pending') so no sort or status scan is needed
+PENDING_ORDER = "priority DESC, created_at"
+
+MAX_LEASE_BATCH = 100
+
+# A leased job not finished within this many seconds is requeued (or failed
+# once it used up max_attempts), so a crashed worker cannot hold it forever
+LEASE_SECONDS = int(os.getenv("CRAWL_JOB_LEASE_SECONDS", "3600"))
+
+FINAL_STATUSES = "('completed', 'failed', 'cancelled')"
+
+statements.register("crawl_jobs.create", """
+    INSERT INTO crawl_jobs (
+        job_id, url, priority, crawl_type, max_depth,
+        respect_robots, rate_limit
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    RETURNING *
+""")
+
+statements.register("crawl_jobs.list", """
+    SELECT * FROM crawl_jobs
+    ORDER BY created_at DESC
+    LIMIT $1 OFFSET $2
+""")
+
+statements.register("crawl_jobs.list_by_status", """
+    SELECT * FROM crawl_jobs
+    WHERE status = $1
+    ORDER BY created_at DESC
+    LIMIT $2 OFFSET $3
+""")
+
+statements.register("crawl_jobs.list_pending", f"""
+    SELECT * FROM crawl_jobs
+    WHERE status = 'pending'
+    ORDER BY {PENDING_ORDER}
+    LIMIT $1 OFFSET $2
+""")
+
+# Puts expired leases back into the pending queue (idx_crawl_jobs_running_lease)
+statements.register("crawl_jobs.reclaim", """
+    UPDATE crawl_jobs SET
+        status = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+        error_message = CASE
+            WHEN attempts < max_attempts THEN error_message
+            ELSE COALESCE(error_message, 'Lease expired on the final attempt')
+        END,
+        completed_at = CASE WHEN attempts < max_attempts THEN completed_at ELSE CURRENT_TIMESTAMP END,
+        locked_by = NULL,
+        locked_until = NULL,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'running' AND locked_until < CURRENT_TIMESTAMP
+""")
+
+statements.register("crawl_jobs.lease", f"""
+    UPDATE crawl_jobs SET
+        status = 'running',
+        attempts = attempts + 1,
+        locked_by = $2,
+        locked_until = CURRENT_TIMESTAMP + make_interval(secs => $3),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (id, created_at) IN (
+        SELECT id, created_at FROM crawl_jobs
+        WHERE status = 'pending'
+        ORDER BY {PENDING_ORDER}
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+""")
+
+# job_id is unique through crawl_job_ids (migrations.crawl_job_ids); its created_at
+# also narrows the lookup to one crawl_jobs partition
+JOB_ID_MATCH = "job_id = $1 AND created_at = (SELECT created_at FROM crawl_job_ids WHERE job_id = $1)"
+
+statements.register("crawl_jobs.get", f"SELECT * FROM crawl_jobs WHERE {JOB_ID_MATCH}")
+
+# Unset (NULL) fields keep their current value, so every update shares one statement;
+# completed_at defaults to now when a job reaches a final status (webhook payloads carry it).
+# With a worker_id ($5) only the current lease holder may update the job.
+statements.register("crawl_jobs.update", f"""
+    UPDATE crawl_jobs SET
+        status = COALESCE($2, status),
+        completed_at = COALESCE(
+            $3, completed_at,
+            CASE WHEN $2 IN {FINAL_STATUSES} THEN CURRENT_TIMESTAMP END
+        ),
+        error_message = COALESCE($4, error_message),
+        locked_by = CASE WHEN $2 IN {FINAL_STATUSES} THEN NULL ELSE locked_by END,
+        locked_until = CASE WHEN $2 IN {FINAL_STATUSES} THEN NULL ELSE locked_until END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE {JOB_ID_MATCH} AND ($5::varchar IS NULL OR locked_by = $5::varchar)
+    RETURNING *
+""")
+
+statements.register("crawl_jobs.delete", f"DELETE FROM crawl_jobs WHERE {JOB_ID_MATCH} RETURNING job_id")
+
 @router.post("/crawl-jobs", response_model=CrawlJob)
 async def create_crawl_job(job: CrawlJobCreate):
     """Create a new crawl job"""
@@ -14,14 +115,8 @@ async def create_crawl_job(job: CrawlJobCreate):
 
     async with get_connection() as conn:
         try:
-            result = await conn.fetchrow("""
-                INSERT INTO crawl_jobs (
-                    job_id, url, priority, crawl_type, max_depth,
-                    respect_robots, rate_limit
-                )
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                RETURNING *
-            """,
+            result = await statements.fetchrow(
+                conn, "crawl_jobs.create",
                 job_id, job.url, job.priority, job.crawl_type,
                 job.max_depth, job.respect_robots, job.rate_limit
             )
@@ -36,34 +131,40 @@ async def list_crawl_jobs(
     limit: int = 50,
     offset: int = 0
 ):
-    """List crawl jobs with optional filtering"""
+    """List crawl jobs with optional filtering (pending jobs come back in dequeue order)"""
     async with get_connection() as conn:
-        if status:
-            query = """
-                SELECT * FROM crawl_jobs
-                WHERE status = $1
-                ORDER BY created_at DESC
-                LIMIT $2 OFFSET $3
-            """
-            results = await conn.fetch(query, status, limit, offset)
+        if status == 'pending':
+            results = await statements.fetch(conn, "crawl_jobs.list_pending", limit, offset)
+        elif status:
+            results = await statements.fetch(conn, "crawl_jobs.list_by_status", status, limit, offset)
         else:
-            query = """
-                SELECT * FROM crawl_jobs
-                ORDER BY created_at DESC
-                LIMIT $1 OFFSET $2
-            """
-            results = await conn.fetch(query, limit, offset)
+            results = await statements.fetch(conn, "crawl_jobs.list", limit, offset)
+
+        return rows_response(results)
+
+@router.post("/crawl-jobs/lease", response_model=List[CrawlJob])
+async def lease_crawl_jobs(
+    limit: int = Query(1, ge=1, le=MAX_LEASE_BATCH),
+    worker_id: Optional[str] = Query(None, max_length=100, description="Lease owner; pass it back on updates")
+):
+    """
+    Atomically claim the highest-priority pending jobs and mark them running
+    for CRAWL_JOB_LEASE_SECONDS; expired leases are requeued first
+    """
+    async with get_connection() as conn:
+        await statements.execute(conn, "crawl_jobs.reclaim")
+        results = await statements.fetch(conn, "crawl_jobs.lease", limit, worker_id, LEASE_SECONDS)
 
-        return [dict(row) for row in results]
+        # UPDATE ... RETURNING does not preserve the subquery order
+        jobs = [dict(row) for row in results]
+        jobs.sort(key=lambda job: (-job['priority'], job['created_at']))
+        return jobs
 
 @router.get("/crawl-jobs/{job_id}", response_model=CrawlJob)
 async def get_crawl_job(job_id: str):
     """Get a specific crawl job by ID"""
     async with get_connection() as conn:
-        result = await conn.fetchrow(
-            "SELECT * FROM crawl_jobs WHERE job_id = $1",
-            job_id
-        )
+        result = await statements.fetchrow(conn, "crawl_jobs.get", job_id)
 
         if not result:
             raise HTTPException(status_code=404, detail="Crawl job not found")
@@ -74,42 +175,14 @@ async def get_crawl_job(job_id: str):
 async def update_crawl_job(job_id: str, update: CrawlJobUpdate):
     """Update a crawl job status"""
     async with get_connection() as conn:
-        # Build dynamic update query
-        update_fields = []
-        update_values = []
-        param_count = 1
-
-        if update.status is not None:
-            update_fields.append(f"status = ${param_count}")
-            update_values.append(update.status)
-            param_count += 1
-
-        if update.completed_at is not None:
-            update_fields.append(f"completed_at = ${param_count}")
-            update_values.append(update.completed_at)
-            param_count += 1
-
-        if update.error_message is not None:
-            update_fields.append(f"error_message = ${param_count}")
-            update_values.append(update.error_message)
-            param_count += 1
-
-        update_fields.append("updated_at = CURRENT_TIMESTAMP")
-
-        if not update_fields:
-            raise HTTPException(status_code=400, detail="No fields to update")
-
-        query = f"""
-            UPDATE crawl_jobs
-            SET {', '.join(update_fields)}
-            WHERE job_id = ${param_count}
-            RETURNING *
-        """
-        update_values.append(job_id)
-
-        result = await conn.fetchrow(query, *update_values)
+        result = await statements.fetchrow(
+            conn, "crawl_jobs.update",
+            job_id, update.status, update.completed_at, update.error_message, update.worker_id
+        )
 
         if not result:
+            if update.worker_id and await statements.fetchrow(conn, "crawl_jobs.get", job_id):
+                raise HTTPException(status_code=409, detail="Crawl job lease is held by another worker")
             raise HTTPException(status_code=404, detail="Crawl job not found")
 
         return dict(result)
@@ -118,10 +191,7 @@ async def update_crawl_job(job_id: str, update: CrawlJobUpdate):
 async def delete_crawl_job(job_id: str):
     """Delete a crawl job"""
     async with get_connection() as conn:
-        result = await conn.fetchrow(
-            "DELETE FROM crawl_jobs WHERE job_id = $1 RETURNING job_id",
-            job_id
-        )
+        result = await statements.fetchrow(conn, "crawl_jobs.delete", job_id)
 
         if not result:
             raise HTTPException(status_code=404, detail="Crawl job not found")
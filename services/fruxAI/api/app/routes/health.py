@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.config.database import get_pool
+from app.config.database import get_pool, db_config, replica_lag
 import psutil
 import time
 from datetime import datetime
@@ -36,6 +36,10 @@ async def detailed_health_check():
                 "connections": db_stats,
                 "status": "connected"
             },
+            "read_replica": {
+                "configured": bool(db_config.read_url),
+                "lag_seconds": await replica_lag() if db_config.read_url else None
+            },
             "system": {
                 "memory_used_percent": memory.percent,
                 "cpu_used_percent": cpu_percent,
@@ -1,170 +1,274 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-from app.models.metadata import Metadata, MetadataCreate, MetadataUpdate, CompanyReport
-from app.config.database import get_connection
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional, Sequence
+from datetime import datetime
+from app.models.metadata import (
+    Metadata, MetadataCreate, MetadataUpdate, MetadataSummary, CompanyReport,
+    METADATA_FIELDS, METADATA_LIST_FIELDS
+)
+from app.config.database import get_connection, read_connection, statements
+from app.responses import rows_response
 
 router = APIRouter()
 
+def parse_fields(fields: Optional[str], default: Sequence[str]) -> List[str]:
+    """Validate a comma separated ?fields= value against METADATA_FIELDS"""
+    if not fields:
+        return list(default)
+
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in METADATA_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    return selected
+
+def select_list(fields: Sequence[str], alias: str = "m") -> str:
+    """Build a column list for the selected metadata fields"""
+    return ", ".join(f"{alias}.{field}" for field in fields)
+
+async def save_extracted_text(conn, metadata_id: int, created_at: datetime, text: str):
+    """Upsert extracted text into the metadata_texts side table (same partition month as the row)"""
+    await conn.execute("""
+        INSERT INTO metadata_texts (metadata_id, created_at, content, text_length)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (metadata_id, created_at) DO UPDATE SET
+            content = EXCLUDED.content,
+            text_length = EXCLUDED.text_length,
+            updated_at = CURRENT_TIMESTAMP
+    """, metadata_id, created_at, text, len(text))
+
+# Full metadata row as returned by single-item endpoints (text excluded)
+METADATA_COLUMNS = select_list(METADATA_FIELDS)
+
+LIST_COLUMNS = select_list(METADATA_LIST_FIELDS)
+
+# One statement per filter combination of the default list projection
+LIST_FILTERS = {
+    (False, False): "",
+    (True, False): "WHERE m.crawl_job_id = $3",
+    (False, True): "WHERE m.company_name ILIKE $3",
+    (True, True): "WHERE m.crawl_job_id = $3 AND m.company_name ILIKE $4",
+}
+
+for (by_job, by_company), where_clause in LIST_FILTERS.items():
+    statements.register(f"metadata.list.{int(by_job)}{int(by_company)}", f"""
+        SELECT {LIST_COLUMNS} FROM metadata m
+        {where_clause}
+        ORDER BY m.created_at DESC
+        LIMIT $1 OFFSET $2
+    """)
+
+# Column list of MetadataUpdate stored on the metadata row (extracted_text lives in metadata_texts)
+UPDATE_FIELDS = tuple(field for field in MetadataUpdate.model_fields if field != "extracted_text")
+
+# NULL parameters keep the current value, so every partial update shares one statement
+statements.register("metadata.update", f"""
+    UPDATE metadata AS m SET
+        {", ".join(f"{field} = COALESCE(${i}, {field})" for i, field in enumerate(UPDATE_FIELDS, 2))},
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+    RETURNING {METADATA_COLUMNS}
+""")
+
 @router.post("/metadata", response_model=Metadata)
 async def create_metadata(metadata: MetadataCreate):
     """Create new metadata entry"""
     async with get_connection() as conn:
         try:
-            result = await conn.fetchrow("""
-                INSERT INTO metadata (
-                    crawl_job_id, url, title, description, keywords,
-                    content_type, file_size, crawl_depth, response_time,
-                    status_code, extracted_text, company_name, company_website,
-                    company_email, company_phone, company_address,
-                    metadata_json, local_file_path
+            async with conn.transaction():
+                # No foreign key on the partitioned tables: check (and hold) the job here
+                if metadata.crawl_job_id is not None and not await conn.fetchval(
+                    "SELECT id FROM crawl_jobs WHERE id = $1 FOR KEY SHARE", metadata.crawl_job_id
+                ):
+                    raise ValueError(f"crawl job {metadata.crawl_job_id} does not exist")
+
+                result = await conn.fetchrow(f"""
+                    INSERT INTO metadata AS m (
+                        crawl_job_id, url, title, description, keywords,
+                        content_type, file_size, crawl_depth, response_time,
+                        status_code, company_name, company_website,
+                        company_email, company_phone, company_address,
+                        metadata_json, local_file_path
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
+                    RETURNING {METADATA_COLUMNS}
+                """,
+                    metadata.crawl_job_id, metadata.url, metadata.title, metadata.description,
+                    metadata.keywords, metadata.content_type, metadata.file_size, metadata.crawl_depth,
+                    metadata.response_time, metadata.status_code,
+                    metadata.company_name, metadata.company_website, metadata.company_email,
+                    metadata.company_phone, metadata.company_address, metadata.metadata_json,
+                    metadata.local_file_path
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18)
-                RETURNING *
-            """,
-                metadata.crawl_job_id, metadata.url, metadata.title, metadata.description,
-                metadata.keywords, metadata.content_type, metadata.file_size, metadata.crawl_depth,
-                metadata.response_time, metadata.status_code, metadata.extracted_text,
-                metadata.company_name, metadata.company_website, metadata.company_email,
-                metadata.company_phone, metadata.company_address, metadata.metadata_json,
-                metadata.local_file_path
-            )
 
-            return dict(result)
+                text_length = None
+                if metadata.extracted_text:
+                    await save_extracted_text(conn, result['id'], result['created_at'], metadata.extracted_text)
+                    text_length = len(metadata.extracted_text)
+
+            return {**dict(result), "text_length": text_length}
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to create metadata: {e}")
 
-@router.get("/metadata", response_model=List[Metadata])
+@router.get("/metadata", response_model=List[MetadataSummary], response_model_exclude_unset=True)
 async def list_metadata(
     crawl_job_id: Optional[int] = None,
     company_name: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated columns to return"),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    conn=Depends(read_connection)
 ):
-    """List metadata entries with optional filtering"""
-    async with get_connection() as conn:
-        conditions = []
-        params = []
-        param_count = 1
-
+    """List metadata entries with optional filtering (slim projection by default)"""
+    if not fields:
+        params = [limit, offset]
         if crawl_job_id:
-            conditions.append(f"crawl_job_id = ${param_count}")
             params.append(crawl_job_id)
-            param_count += 1
-
         if company_name:
-            conditions.append(f"company_name ILIKE ${param_count}")
             params.append(f"%{company_name}%")
-            param_count += 1
+        name = f"metadata.list.{int(bool(crawl_job_id))}{int(bool(company_name))}"
+        results = await statements.fetch(conn, name, *params)
+        return rows_response(results)
+
+    # Custom projections are ad-hoc and not worth a cached statement each
+    columns = select_list(parse_fields(fields, METADATA_LIST_FIELDS))
+    conditions = []
+    params = []
+    param_count = 1
+
+    if crawl_job_id:
+        conditions.append(f"m.crawl_job_id = ${param_count}")
+        params.append(crawl_job_id)
+        param_count += 1
 
-        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    if company_name:
+        conditions.append(f"m.company_name ILIKE ${param_count}")
+        params.append(f"%{company_name}%")
+        param_count += 1
 
-        query = f"""
-            SELECT * FROM metadata
-            {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ${param_count} OFFSET ${param_count + 1}
-        """
-        params.extend([limit, offset])
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
-        results = await conn.fetch(query, *params)
-        return [dict(row) for row in results]
+    query = f"""
+        SELECT {columns} FROM metadata m
+        {where_clause}
+        ORDER BY m.created_at DESC
+        LIMIT ${param_count} OFFSET ${param_count + 1}
+    """
+    params.extend([limit, offset])
+
+    results = await conn.fetch(query, *params)
+    return rows_response(results)
 
 @router.get("/metadata/{metadata_id}", response_model=Metadata)
 async def get_metadata(metadata_id: int):
     """Get specific metadata entry"""
     async with get_connection() as conn:
-        result = await conn.fetchrow(
-            "SELECT * FROM metadata WHERE id = $1",
-            metadata_id
-        )
+        result = await conn.fetchrow(f"""
+            SELECT {METADATA_COLUMNS}, t.text_length
+            FROM metadata m
+            LEFT JOIN metadata_texts t ON t.metadata_id = m.id AND t.created_at = m.created_at
+            WHERE m.id = $1
+        """, metadata_id)
 
         if not result:
             raise HTTPException(status_code=404, detail="Metadata not found")
 
         return dict(result)
 
+@router.get("/metadata/{metadata_id}/text", response_class=PlainTextResponse)
+async def get_metadata_text(metadata_id: int):
+    """Get the extracted text of a metadata entry"""
+    async with get_connection() as conn:
+        # The parent's created_at pins the text to its partition month
+        created_at = await conn.fetchval(
+            "SELECT created_at FROM metadata WHERE id = $1",
+            metadata_id
+        )
+        content = None
+        if created_at is not None:
+            content = await conn.fetchval(
+                "SELECT content FROM metadata_texts WHERE metadata_id = $1 AND created_at = $2",
+                metadata_id, created_at
+            )
+
+        if content is None:
+            raise HTTPException(status_code=404, detail="Extracted text not found")
+
+        return PlainTextResponse(content)
+
 @router.put("/metadata/{metadata_id}", response_model=Metadata)
 async def update_metadata(metadata_id: int, update: MetadataUpdate):
     """Update metadata entry"""
     async with get_connection() as conn:
-        # Build dynamic update query
-        update_fields = []
-        update_values = []
-        param_count = 1
-
         update_dict = update.dict(exclude_unset=True)
-        for field, value in update_dict.items():
-            if value is not None:
-                update_fields.append(f"{field} = ${param_count}")
-                update_values.append(value)
-                param_count += 1
-
-        if not update_fields:
+        extracted_text = update_dict.pop("extracted_text", None)
+        if all(value is None for value in update_dict.values()) and extracted_text is None:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        update_fields.append("updated_at = CURRENT_TIMESTAMP")
+        async with conn.transaction():
+            result = await statements.fetchrow(
+                conn, "metadata.update", metadata_id,
+                *(update_dict.get(field) for field in UPDATE_FIELDS)
+            )
 
-        query = f"""
-            UPDATE metadata
-            SET {', '.join(update_fields)}
-            WHERE id = ${param_count}
-            RETURNING *
-        """
-        update_values.append(metadata_id)
+            if not result:
+                raise HTTPException(status_code=404, detail="Metadata not found")
 
-        result = await conn.fetchrow(query, *update_values)
+            if extracted_text is not None:
+                await save_extracted_text(conn, metadata_id, result['created_at'], extracted_text)
 
-        if not result:
-            raise HTTPException(status_code=404, detail="Metadata not found")
+            text_length = await conn.fetchval(
+                "SELECT text_length FROM metadata_texts WHERE metadata_id = $1 AND created_at = $2",
+                metadata_id, result['created_at']
+            )
 
-        return dict(result)
+        return {**dict(result), "text_length": text_length}
 
 @router.get("/companies", response_model=List[CompanyReport])
-async def get_company_reports():
+async def get_company_reports(conn=Depends(read_connection)):
     """Get aggregated reports by company"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                company_name,
-                company_website,
-                company_email,
-                company_phone,
-                company_address,
-                COUNT(*) as total_pages,
-                AVG(response_time) as avg_response_time,
-                SUM(file_size) as total_file_size,
-                ARRAY_AGG(DISTINCT url) as crawled_urls,
-                MAX(created_at) as last_crawl
-            FROM metadata
-            WHERE company_name IS NOT NULL
-            GROUP BY company_name, company_website, company_email, company_phone, company_address
-            ORDER BY total_pages DESC
-        """)
-
-        return [dict(row) for row in results]
+    results = await conn.fetch("""
+        SELECT
+            company_name,
+            company_website,
+            company_email,
+            company_phone,
+            company_address,
+            COUNT(*) as total_pages,
+            AVG(response_time) as avg_response_time,
+            SUM(file_size) as total_file_size,
+            ARRAY_AGG(DISTINCT url) as crawled_urls,
+            MAX(created_at) as last_crawl
+        FROM metadata
+        WHERE company_name IS NOT NULL
+        GROUP BY company_name, company_website, company_email, company_phone, company_address
+        ORDER BY total_pages DESC
+    """)
+
+    return [dict(row) for row in results]
 
 @router.get("/companies/{company_name}", response_model=CompanyReport)
-async def get_company_report(company_name: str):
+async def get_company_report(company_name: str, conn=Depends(read_connection)):
     """Get detailed report for a specific company"""
-    async with get_connection() as conn:
-        result = await conn.fetchrow("""
-            SELECT
-                company_name,
-                company_website,
-                company_email,
-                company_phone,
-                company_address,
-                COUNT(*) as total_pages,
-                AVG(response_time) as avg_response_time,
-                SUM(file_size) as total_file_size,
-                ARRAY_AGG(DISTINCT url) as crawled_urls,
-                MAX(created_at) as last_crawl
-            FROM metadata
-            WHERE company_name = $1
-            GROUP BY company_name, company_website, company_email, company_phone, company_address
-        """, company_name)
+    result = await conn.fetchrow("""
+        SELECT
+            company_name,
+            company_website,
+            company_email,
+            company_phone,
+            company_address,
+            COUNT(*) as total_pages,
+            AVG(response_time) as avg_response_time,
+            SUM(file_size) as total_file_size,
+            ARRAY_AGG(DISTINCT url) as crawled_urls,
+            MAX(created_at) as last_crawl
+        FROM metadata
+        WHERE company_name = $1
+        GROUP BY company_name, company_website, company_email, company_phone, company_address
+    """, company_name)
 
-        if not result:
-            raise HTTPException(status_code=404, detail="Company not found")
+    if not result:
+        raise HTTPException(status_code=404, detail="Company not found")
 
-        return dict(result)
+    return dict(result)
@@ -1,168 +1,176 @@
-from fastapi import APIRouter, Query
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, Query
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from app.config.database import get_connection
+from app.config.database import read_connection
 
 router = APIRouter()
 
+# crawl_jobs and metadata are partitioned by month on created_at; a created_at
+# lower bound ($1 below) lets Postgres skip every older partition. Reports are
+# read-only and run on the read replica when one is configured
+
+def since(days: Optional[int]) -> datetime:
+    """Lower created_at bound of an optional day window (all time when unset)"""
+    return datetime.utcnow() - timedelta(days=days) if days else datetime.min
+
 @router.get("/reports/crawl-stats")
-async def get_crawl_stats():
+async def get_crawl_stats(conn=Depends(read_connection)):
     """Get overall crawl statistics"""
-    async with get_connection() as conn:
-        # Job statistics
-        job_stats = await conn.fetchrow("""
-            SELECT
-                COUNT(*) as total_jobs,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_jobs,
-                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_jobs,
-                COUNT(CASE WHEN status = 'running' THEN 1 END) as running_jobs,
-                AVG(EXTRACT(EPOCH FROM (completed_at - created_at))) as avg_job_duration
-            FROM crawl_jobs
-        """)
-
-        # Metadata statistics
-        metadata_stats = await conn.fetchrow("""
-            SELECT
-                COUNT(*) as total_metadata,
-                COUNT(DISTINCT company_name) as unique_companies,
-                AVG(file_size) as avg_file_size,
-                SUM(file_size) as total_file_size,
-                AVG(response_time) as avg_response_time
-            FROM metadata
-        """)
-
-        # Recent activity (last 24 hours)
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_activity = await conn.fetchrow("""
-            SELECT
-                COUNT(*) as jobs_last_24h,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_last_24h
-            FROM crawl_jobs
-            WHERE created_at >= $1
-        """, yesterday)
-
-        return {
-            "job_statistics": dict(job_stats),
-            "metadata_statistics": dict(metadata_stats),
-            "recent_activity": dict(recent_activity),
-            "generated_at": datetime.utcnow().isoformat()
-        }
+    # Job statistics
+    job_stats = await conn.fetchrow("""
+        SELECT
+            COUNT(*) as total_jobs,
+            COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_jobs,
+            COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_jobs,
+            COUNT(CASE WHEN status = 'running' THEN 1 END) as running_jobs,
+            AVG(EXTRACT(EPOCH FROM (completed_at - created_at))) as avg_job_duration
+        FROM crawl_jobs
+    """)
+
+    # Metadata statistics
+    metadata_stats = await conn.fetchrow("""
+        SELECT
+            COUNT(*) as total_metadata,
+            COUNT(DISTINCT company_name) as unique_companies,
+            AVG(file_size) as avg_file_size,
+            SUM(file_size) as total_file_size,
+            AVG(response_time) as avg_response_time
+        FROM metadata
+    """)
+
+    # Recent activity (last 24 hours)
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    recent_activity = await conn.fetchrow("""
+        SELECT
+            COUNT(*) as jobs_last_24h,
+            COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_last_24h
+        FROM crawl_jobs
+        WHERE created_at >= $1
+    """, yesterday)
+
+    return {
+        "job_statistics": dict(job_stats),
+        "metadata_statistics": dict(metadata_stats),
+        "recent_activity": dict(recent_activity),
+        "generated_at": datetime.utcnow().isoformat()
+    }
 
 @router.get("/reports/daily-activity")
-async def get_daily_activity(days: int = Query(7, ge=1, le=90)):
+async def get_daily_activity(days: int = Query(7, ge=1, le=90), conn=Depends(read_connection)):
     """Get daily crawl activity for the specified number of days"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                DATE(created_at) as date,
-                COUNT(*) as total_jobs,
-                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_jobs,
-                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_jobs,
-                COUNT(DISTINCT m.company_name) as companies_crawled
-            FROM crawl_jobs cj
-            LEFT JOIN metadata m ON cj.id = m.crawl_job_id
-            WHERE created_at >= CURRENT_DATE - INTERVAL '%s days'
-            GROUP BY DATE(created_at)
-            ORDER BY date DESC
-        """, days)
-
-        return [dict(row) for row in results]
+    start = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+    # Metadata of a job is never older than the job, so the same bound prunes both tables
+    results = await conn.fetch("""
+        SELECT
+            DATE(cj.created_at) as date,
+            COUNT(DISTINCT cj.id) as total_jobs,
+            COUNT(DISTINCT cj.id) FILTER (WHERE cj.status = 'completed') as completed_jobs,
+            COUNT(DISTINCT cj.id) FILTER (WHERE cj.status = 'failed') as failed_jobs,
+            COUNT(DISTINCT m.company_name) as companies_crawled
+        FROM crawl_jobs cj
+        LEFT JOIN metadata m ON cj.id = m.crawl_job_id AND m.created_at >= $1
+        WHERE cj.created_at >= $1
+        GROUP BY DATE(cj.created_at)
+        ORDER BY date DESC
+    """, start)
+
+    return [dict(row) for row in results]
 
 @router.get("/reports/content-types")
-async def get_content_types():
-    """Get statistics by content type"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                content_type,
-                COUNT(*) as count,
-                AVG(file_size) as avg_size,
-                SUM(file_size) as total_size
-            FROM metadata
-            WHERE content_type IS NOT NULL
-            GROUP BY content_type
-            ORDER BY count DESC
-        """)
-
-        return [dict(row) for row in results]
+async def get_content_types(days: Optional[int] = Query(None, ge=1, le=3650), conn=Depends(read_connection)):
+    """Get statistics by content type (optionally for the last N days)"""
+    results = await conn.fetch("""
+        SELECT
+            content_type,
+            COUNT(*) as count,
+            AVG(file_size) as avg_size,
+            SUM(file_size) as total_size
+        FROM metadata
+        WHERE content_type IS NOT NULL AND created_at >= $1
+        GROUP BY content_type
+        ORDER BY count DESC
+    """, since(days))
+
+    return [dict(row) for row in results]
 
 @router.get("/reports/response-times")
-async def get_response_times():
-    """Get response time statistics"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                CASE
-                    WHEN response_time < 1 THEN '< 1s'
-                    WHEN response_time < 5 THEN '1-5s'
-                    WHEN response_time < 10 THEN '5-10s'
-                    WHEN response_time < 30 THEN '10-30s'
-                    ELSE '> 30s'
-                END as response_bucket,
-                COUNT(*) as count,
-                AVG(response_time) as avg_response_time
-            FROM metadata
-            WHERE response_time IS NOT NULL
-            GROUP BY
-                CASE
-                    WHEN response_time < 1 THEN '< 1s'
-                    WHEN response_time < 5 THEN '1-5s'
-                    WHEN response_time < 10 THEN '5-10s'
-                    WHEN response_time < 30 THEN '10-30s'
-                    ELSE '> 30s'
-                END
-            ORDER BY avg_response_time
-        """)
-
-        return [dict(row) for row in results]
+async def get_response_times(days: Optional[int] = Query(None, ge=1, le=3650), conn=Depends(read_connection)):
+    """Get response time statistics (optionally for the last N days)"""
+    results = await conn.fetch("""
+        SELECT
+            CASE
+                WHEN response_time < 1 THEN '< 1s'
+                WHEN response_time < 5 THEN '1-5s'
+                WHEN response_time < 10 THEN '5-10s'
+                WHEN response_time < 30 THEN '10-30s'
+                ELSE '> 30s'
+            END as response_bucket,
+            COUNT(*) as count,
+            AVG(response_time) as avg_response_time
+        FROM metadata
+        WHERE response_time IS NOT NULL AND created_at >= $1
+        GROUP BY
+            CASE
+                WHEN response_time < 1 THEN '< 1s'
+                WHEN response_time < 5 THEN '1-5s'
+                WHEN response_time < 10 THEN '5-10s'
+                WHEN response_time < 30 THEN '10-30s'
+                ELSE '> 30s'
+            END
+        ORDER BY avg_response_time
+    """, since(days))
+
+    return [dict(row) for row in results]
 
 @router.get("/reports/top-companies")
-async def get_top_companies(limit: int = Query(20, ge=1, le=100)):
-    """Get top companies by crawled pages"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                company_name,
-                COUNT(*) as pages_crawled,
-                AVG(response_time) as avg_response_time,
-                MAX(created_at) as last_crawl,
-                COUNT(DISTINCT crawl_job_id) as crawl_sessions
-            FROM metadata
-            WHERE company_name IS NOT NULL
-            GROUP BY company_name
-            ORDER BY pages_crawled DESC
-            LIMIT $1
-        """, limit)
-
-        return [dict(row) for row in results]
+async def get_top_companies(
+    limit: int = Query(20, ge=1, le=100),
+    days: Optional[int] = Query(None, ge=1, le=3650),
+    conn=Depends(read_connection)
+):
+    """Get top companies by crawled pages (optionally for the last N days)"""
+    results = await conn.fetch("""
+        SELECT
+            company_name,
+            COUNT(*) as pages_crawled,
+            AVG(response_time) as avg_response_time,
+            MAX(created_at) as last_crawl,
+            COUNT(DISTINCT crawl_job_id) as crawl_sessions
+        FROM metadata
+        WHERE company_name IS NOT NULL AND created_at >= $2
+        GROUP BY company_name
+        ORDER BY pages_crawled DESC
+        LIMIT $1
+    """, limit, since(days))
+
+    return [dict(row) for row in results]
 
 @router.get("/reports/crawl-errors")
-async def get_crawl_errors():
-    """Get crawl error statistics"""
-    async with get_connection() as conn:
-        results = await conn.fetch("""
-            SELECT
-                status_code,
-                COUNT(*) as count,
-                COUNT(DISTINCT crawl_job_id) as affected_jobs
-            FROM metadata
-            WHERE status_code >= 400
-            GROUP BY status_code
-            ORDER BY count DESC
-        """)
-
-        failed_jobs = await conn.fetch("""
-            SELECT
-                error_message,
-                COUNT(*) as count
-            FROM crawl_jobs
-            WHERE status = 'failed' AND error_message IS NOT NULL
-            GROUP BY error_message
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-
-        return {
-            "http_errors": [dict(row) for row in results],
-            "job_failures": [dict(row) for row in failed_jobs]
-        }
+async def get_crawl_errors(days: Optional[int] = Query(None, ge=1, le=3650), conn=Depends(read_connection)):
+    """Get crawl error statistics (optionally for the last N days)"""
+    results = await conn.fetch("""
+        SELECT
+            status_code,
+            COUNT(*) as count,
+            COUNT(DISTINCT crawl_job_id) as affected_jobs
+        FROM metadata
+        WHERE status_code >= 400 AND created_at >= $1
+        GROUP BY status_code
+        ORDER BY count DESC
+    """, since(days))
+
+    failed_jobs = await conn.fetch("""
+        SELECT
+            error_message,
+            COUNT(*) as count
+        FROM crawl_jobs
+        WHERE status = 'failed' AND error_message IS NOT NULL AND created_at >= $1
+        GROUP BY error_message
+        ORDER BY count DESC
+        LIMIT 10
+    """, since(days))
+
+    return {
+        "http_errors": [dict(row) for row in results],
+        "job_failures": [dict(row) for row in failed_jobs]
+    }
@@ -1,32 +1,40 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks
-from typing import Optional, List, Dict, Any
-from app.config.database import get_connection
-from app.services.pdf_processor import PdfProcessor
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File, Form
+from datetime import date
+from typing import Annotated, Any, Optional, List
+from app.config.database import read_connection
+from app.responses import FastJSONResponse
+from app.services.pdf_processor import tender_key
+from fruxai_shared.storage_backends import get_storage_backend
+from app.services.ingestion import (
+    FileNameConflictError, create_batch, finish_batch, get_batch_progress, get_ingestion,
+    ingest_stream, is_archive, iter_archive_pdfs, iter_chunks, normalize_state
+)
 import logging
 import os
-import json
-import csv
+import tarfile
+import zipfile
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize PDF processor
-pdf_processor = PdfProcessor()
+# Shared storage backend (PDFs are processed by ingest_worker.py)
+storage = get_storage_backend()
 
-# HEAD_ALIASES for PDF parsing
-HEAD_ALIASES = {
-    'contract_number': ['Contract Number', 'Contract No.', 'Contract #', 'Contract Num'],
-    'project_id': ['Project ID', 'Project No.', 'Proj ID', 'Project Num'],
-    'bid_amount': ['Bid Amount', 'Total Bid', 'Bid Total', 'Amount'],
-    'firm_name': ['Bidder Name', 'Company Name', 'Firm Name', 'Bidder'],
-    'rank': ['Rank', 'Bid Rank', 'Position', 'Rank Order']
-}
+# State codes and export names become storage key segments (see tender_key)
+STATE_PATTERN = r'^[A-Za-z]{2}$'
+StateForm = Annotated[str, Form(pattern=STATE_PATTERN, description="State code (e.g., CA, TX)")]
+StatePath = Annotated[str, Path(pattern=STATE_PATTERN, description="State code (e.g., CA, TX)")]
+
+def key_segment(value: str, name: str) -> str:
+    """Reject a path parameter that would leave its storage prefix"""
+    if not value or '/' in value or '\\' in value or '..' in value:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value!r}")
+    return value
 
 @router.post("/ingest")
 async def ingest_pdf(
-    background_tasks: BackgroundTasks,
-    state: str = Form(..., description="State code (e.g., CA, TX)"),
+    state: StateForm,
     file: UploadFile = File(..., description="PDF file to process")
 ):
     """
@@ -34,169 +42,293 @@ async def ingest_pdf(
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    state = normalize_state(state)
 
-    # Create state directory if not exists
-    state_dir = f"/app/storage/pdfs/{state}"
-    os.makedirs(f"{state_dir}/incoming", exist_ok=True)
-    os.makedirs(f"{state_dir}/processed", exist_ok=True)
-    os.makedirs(f"{state_dir}/exports", exist_ok=True)
-
-    # Save uploaded file
-    file_path = f"{state_dir}/incoming/{file.filename}"
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Copy the upload in fixed-size reads instead of buffering it whole
+    filename = os.path.basename(file.filename)
+    try:
+        ingestion = await ingest_stream(storage, state, filename, iter_chunks(file.file))
+    except FileNameConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    # Add background processing task
-    background_tasks.add_task(process_pdf_background, state, file.filename, file_path)
+    if ingestion['duplicate']:
+        return {
+            "status": "duplicate",
+            "ingestion_id": ingestion.get('ingestion_id'),
+            "message": f"PDF {file.filename} was already ingested for state {state}",
+            "file_path": ingestion.get('storage_key')
+        }
 
     return {
-        "status": "processing",
+        "status": "queued",
+        "ingestion_id": ingestion['ingestion_id'],
         "message": f"PDF {file.filename} queued for processing in state {state}",
-        "file_path": file_path
+        "file_path": ingestion['storage_key']
     }
 
+@router.post("/ingest/batch")
+async def ingest_pdf_batch(
+    state: StateForm,
+    files: List[UploadFile] = File(..., description="PDF files and/or ZIP/tar archives of PDFs")
+):
+    """
+    Ingest many PDFs at once; archives are extracted member by member
+    """
+    state = normalize_state(state)
+    batch = await create_batch(state)
+    batch_id = batch['batch_id']
+    items = []
+    skipped = []
+    conflicts = []
+
+    async def add(filename: str, chunks):
+        try:
+            ingestion = await ingest_stream(storage, state, filename, chunks, batch_id)
+        except FileNameConflictError as e:
+            conflicts.append({"file_name": filename, "error": str(e)})
+            return
+        items.append({
+            "file_name": filename,
+            "ingestion_id": ingestion.get('ingestion_id'),
+            "status": "duplicate" if ingestion['duplicate'] else "queued"
+        })
+
+    try:
+        for file in files:
+            filename = os.path.basename(file.filename or "")
+            if is_archive(filename):
+                async for member_name, chunks in iter_archive_pdfs(file.file, filename):
+                    await add(member_name, chunks)
+            elif filename.lower().endswith('.pdf'):
+                await add(filename, iter_chunks(file.file))
+            else:
+                skipped.append(filename)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+    finally:
+        duplicates = sum(1 for item in items if item['status'] == 'duplicate')
+        # Conflicting names are not queued; they count as skipped
+        await finish_batch(batch_id, len(items), duplicates, len(skipped) + len(conflicts))
+
+    return {
+        "status": "queued",
+        "batch_id": batch_id,
+        "message": f"{len(items) - duplicates} PDFs queued for processing in state {state}",
+        "file_count": len(items),
+        "duplicate_count": duplicates,
+        "skipped": skipped,
+        "conflicts": conflicts,
+        "items": items
+    }
+
+@router.get("/ingest/batch/{batch_id}")
+async def get_ingestion_batch(batch_id: str):
+    """
+    Get aggregate processing progress of a batch ingestion
+    """
+    progress = await get_batch_progress(batch_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return progress
+
+@router.get("/ingest/{ingestion_id}")
+async def get_ingestion_status(ingestion_id: str):
+    """
+    Get the processing status of an ingested PDF
+    """
+    ingestion = await get_ingestion(ingestion_id)
+    if not ingestion:
+        raise HTTPException(status_code=404, detail="Ingestion not found")
+
+    return ingestion
+
+TENDER_COLUMNS = """
+    t.id, t.state, t.file_name, t.contract_number, t.project_id,
+    t.bid_opening_date, t.title, t.location, t.winner_firm_id,
+    t.winner_amount, t.currency, t.extraction_info, t.status,
+    t.created_at, t.updated_at
+"""
+
+FIRM_OBJECT = """
+    json_build_object(
+        'firm_id', f.firm_id, 'name_official', f.name_official,
+        'cslb_number', f.cslb_number, 'address', f.address, 'city', f.city,
+        'state_code', f.state_code, 'zip', f.zip, 'phone', f.phone, 'fax', f.fax
+    )
+"""
+
+BID_COLUMNS = """
+    b.id, b.firm_id, b.bid_amount, b.currency, b.rank, b.preference,
+    b.cslb_number, COALESCE(b.name_official, f.name_official) AS name_official
+"""
+
+TENDER_INCLUDES = ('bids', 'firms')
+
+def parse_include(include: Optional[str]) -> set:
+    """Validate a comma separated ?include= value against TENDER_INCLUDES"""
+    selected = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = selected - set(TENDER_INCLUDES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+    return selected
+
+def embedded_bids(with_firms: bool) -> str:
+    """Correlated json_agg of a tender's bids (one array per tender row, no extra round trips)"""
+    firm = f", 'firm', CASE WHEN f.firm_id IS NOT NULL THEN {FIRM_OBJECT} END" if with_firms else ""
+    return f"""
+        (SELECT COALESCE(json_agg(json_build_object(
+                    'id', b.id, 'firm_id', b.firm_id, 'bid_amount', b.bid_amount,
+                    'currency', b.currency, 'rank', b.rank, 'preference', b.preference,
+                    'cslb_number', b.cslb_number,
+                    'name_official', COALESCE(b.name_official, f.name_official){firm}
+                ) ORDER BY b.rank, b.bid_amount), '[]'::json)
+         FROM bids b
+         LEFT JOIN firms f ON f.state = b.state AND f.firm_id = b.firm_id
+         WHERE b.state = t.state AND b.tender_id = t.id) AS bids
+    """
+
 @router.get("/state/{state}/tenders")
 async def get_tenders(
-    state: str,
+    state: StatePath,
     contract_number: Optional[str] = None,
     project_id: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    bid_opening_from: Optional[date] = None,
+    bid_opening_to: Optional[date] = None,
+    include: Optional[str] = Query(None, description="Comma separated: bids, firms"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; all matching tenders when omitted"),
+    offset: int = Query(0, ge=0),
+    conn=Depends(read_connection)
 ):
     """
-    Get tenders for a specific state with optional filters
+    Get tenders for a specific state with optional filters.
+
+    include=bids embeds each tender's bids; include=firms adds the winner's
+    firm record (and each bid's firm when bids are included). Everything
+    comes back from a single query. With limit the response is one page and
+    carries has_more/next_offset; without it every matching tender is returned.
+    """
+    includes = parse_include(include)
+
+    conditions = ["t.state = $1"]
+    params: List[Any] = [state]
+    for column, op, value in (
+        ("t.contract_number", "=", contract_number),
+        ("t.project_id", "=", project_id),
+        ("t.bid_opening_date", ">=", bid_opening_from),
+        ("t.bid_opening_date", "<=", bid_opening_to),
+    ):
+        if value is not None:
+            params.append(value)
+            conditions.append(f"{column} {op} ${len(params)}")
+
+    columns = [TENDER_COLUMNS]
+    joins = ""
+    if 'firms' in includes:
+        columns.append(f"CASE WHEN f.firm_id IS NOT NULL THEN {FIRM_OBJECT} END AS winner_firm")
+        joins = "LEFT JOIN firms f ON f.state = t.state AND f.firm_id = t.winner_firm_id"
+    if 'bids' in includes:
+        columns.append(embedded_bids('firms' in includes))
+
+    # One extra row tells whether another page follows
+    params.extend([limit + 1 if limit else None, offset])
+    query = f"""
+        SELECT {', '.join(columns)}
+        FROM tenders t
+        {joins}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ${len(params) - 1} OFFSET ${len(params)}
     """
-    try:
-        async with get_connection() as session:
-            # Simple query
-            query = """
-                SELECT id, state, file_name, contract_number, project_id,
-                       bid_opening_date, title, location, winner_firm_id,
-                       winner_amount, currency, extraction_info, status,
-                       created_at, updated_at
-                FROM tenders
-                WHERE state = $1
-                ORDER BY created_at DESC
-                LIMIT $2 OFFSET $3
-            """
-
-            rows = await session.fetch(query, state, limit, offset)
-
-            tenders = []
-            for row in rows:
-                tenders.append({
-                    'id': row['id'],
-                    'state': row['state'],
-                    'file_name': row['file_name'],
-                    'contract_number': row['contract_number'],
-                    'project_id': row['project_id'],
-                    'bid_opening_date': row['bid_opening_date'].isoformat() if row['bid_opening_date'] else None,
-                    'title': row['title'],
-                    'location': row['location'],
-                    'winner_firm_id': row['winner_firm_id'],
-                    'winner_amount': float(row['winner_amount']) if row['winner_amount'] else None,
-                    'currency': row['currency'],
-                    'extraction_info': row['extraction_info'],
-                    'status': row['status'],
-                    'created_at': row['created_at'].isoformat() if row['created_at'] else None,
-                    'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
-                })
-
-            return {
-                "status": "success",
-                "state": state,
-                "count": len(tenders),
-                "data": tenders
-            }
 
+    try:
+        rows = await conn.fetch(query, *params)
     except Exception as e:
         logger.error(f"Error fetching tenders: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    has_more = bool(limit) and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+
+    # Records go straight to orjson (dates as ISO strings, numeric as float)
+    return FastJSONResponse({
+        "status": "success",
+        "state": state,
+        "count": len(rows),
+        "has_more": has_more,
+        "next_offset": offset + len(rows) if has_more else None,
+        "data": rows
+    })
+
 @router.get("/state/{state}/tenders/{tender_id}/bids")
-async def get_tender_bids(state: str, tender_id: int):
+async def get_tender_bids(state: StatePath, tender_id: int, conn=Depends(read_connection)):
     """
     Get all bids for a specific tender
     """
     try:
-        async with get_connection() as session:
-            result = await session.execute(
-                text("""
-                    SELECT b.id, b.firm_id, b.bid_amount, b.currency, b.rank,
-                           b.preference, b.cslb_number, b.name_official,
-                           f.name_official as firm_name_official
-                    FROM bids b
-                    LEFT JOIN firms f ON b.state = f.state AND b.firm_id = f.firm_id
-                    WHERE b.state = $1 AND b.tender_id = $2
-                    ORDER BY b.rank, b.bid_amount
-                """),
-                [state, tender_id]
-            )
-            rows = result.fetchall()
-
-            bids = []
-            for row in rows:
-                bids.append({
-                    "id": row[0],
-                    "firm_id": row[1],
-                    "bid_amount": float(row[2]),
-                    "currency": row[3],
-                    "rank": row[4],
-                    "preference": row[5],
-                    "cslb_number": row[6],
-                    "name_official": row[7] or row[8]  # Use bid name or firm name
-                })
-
-            return {
-                "status": "success",
-                "state": state,
-                "tender_id": tender_id,
-                "count": len(bids),
-                "data": bids
-            }
-
+        rows = await conn.fetch(f"""
+            SELECT {BID_COLUMNS}
+            FROM bids b
+            LEFT JOIN firms f ON b.state = f.state AND b.firm_id = f.firm_id
+            WHERE b.state = $1 AND b.tender_id = $2
+            ORDER BY b.rank, b.bid_amount
+        """, state, tender_id)
     except Exception as e:
         logger.error(f"Error fetching tender bids: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    return FastJSONResponse({
+        "status": "success",
+        "state": state,
+        "tender_id": tender_id,
+        "count": len(rows),
+        "data": rows
+    })
+
 @router.get("/state/{state}/exports/{pdf_stem}/tables")
-async def list_markdown_tables(state: str, pdf_stem: str):
+async def list_markdown_tables(state: StatePath, pdf_stem: str):
     """
     List available Markdown tables for a processed PDF
     """
-    tables_dir = f"/app/storage/pdfs/{state}/exports/{pdf_stem}/tables"
-
-    if not os.path.exists(tables_dir):
-        raise HTTPException(status_code=404, detail="Export directory not found")
+    tables_prefix = tender_key(state, "exports", key_segment(pdf_stem, "pdf_stem"), "tables")
 
     try:
-        files = [f for f in os.listdir(tables_dir) if f.endswith('.md')]
+        files = []
+        async for batch in storage.list(tables_prefix):
+            files.extend(os.path.basename(key) for key, _, _ in batch if key.endswith('.md'))
         files.sort()
 
+        if not files:
+            raise HTTPException(status_code=404, detail="Export directory not found")
+
         return {
             "status": "success",
             "state": state,
             "pdf_stem": pdf_stem,
             "tables": files
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing markdown tables: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 @router.get("/state/{state}/exports/{pdf_stem}/tables/{table_name}.md")
-async def download_markdown_table(state: str, pdf_stem: str, table_name: str):
+async def download_markdown_table(state: StatePath, pdf_stem: str, table_name: str):
     """
     Download a specific Markdown table
     """
-    file_path = f"/app/storage/pdfs/{state}/exports/{pdf_stem}/tables/{table_name}.md"
+    file_path = tender_key(
+        state, "exports", key_segment(pdf_stem, "pdf_stem"), "tables",
+        f"{key_segment(table_name, 'table_name')}.md"
+    )
 
-    if not os.path.exists(file_path):
+    data = await storage.read(file_path)
+    if data is None:
         raise HTTPException(status_code=404, detail="Table file not found")
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = data.decode('utf-8')
 
         return {
             "status": "success",
@@ -208,195 +340,3 @@ async def download_markdown_table(state: str, pdf_stem: str, table_name: str):
     except Exception as e:
         logger.error(f"Error downloading markdown table: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
-
-async def process_pdf_background(state: str, filename: str, file_path: str):
-    """
-    Background task to process PDF with pdfplumber + markdownify and save results
-    """
-    logger.info(f"Processing PDF: {filename} for state {state}")
-
-    try:
-        # Process PDF with new processor
-        result = await pdf_processor.process_pdf(file_path, state)
-
-        if result['status'] != 'success':
-            logger.error(f"PDF processing failed: {result}")
-            return
-
-        # Create simplified tender data for database
-        tender_data = {
-            'state': state,
-            'file_name': filename,
-            'contract_number': result['metadata'].get('contract_number'),
-            'project_id': result['metadata'].get('project_id'),
-            'bid_opening_date': result['metadata'].get('bid_opening_date'),
-            'title': f"Contract {result['metadata'].get('contract_number', 'Unknown')}",
-            'winner_firm_id': None,
-            'winner_amount': None,
-            'currency': 'USD',
-            'extraction_info': result['extraction_info'],
-            'status': 'processed'
-        }
-
-        # Simplified database save (without bids/firms for now)
-        await save_to_database_simple(tender_data, result)
-
-        logger.info(f"PDF processing completed: {filename}")
-
-    except Exception as e:
-        logger.error(f"Error in background processing: {e}")
-        # Move to processed anyway to avoid re-processing
-        processed_path = f"/app/storage/pdfs/{state}/processed/{filename}"
-        if os.path.exists(file_path):
-            os.rename(file_path, processed_path)
-
-async def save_to_database_simple(tender_data: Dict[str, Any], result: Dict[str, Any]):
-    """Simplified database save for new processor results"""
-    try:
-        async with get_connection() as session:
-            # Insert tender
-            tender_result = await session.execute(
-                text("""
-                    INSERT INTO tenders (state, file_name, contract_number, project_id,
-                                       bid_opening_date, title, winner_firm_id, winner_amount,
-                                       currency, extraction_info, status)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (state, file_name) DO UPDATE SET
-                        contract_number = EXCLUDED.contract_number,
-                        project_id = EXCLUDED.project_id,
-                        bid_opening_date = EXCLUDED.bid_opening_date,
-                        title = EXCLUDED.title,
-                        extraction_info = EXCLUDED.extraction_info,
-                        updated_at = CURRENT_TIMESTAMP
-                    RETURNING id
-                """),
-                [
-                    tender_data['state'], tender_data['file_name'], tender_data.get('contract_number'),
-                    tender_data.get('project_id'), tender_data.get('bid_opening_date'), tender_data.get('title'),
-                    tender_data.get('winner_firm_id'), tender_data.get('winner_amount'), tender_data.get('currency'),
-                    json.dumps(tender_data.get('extraction_info'), default=str), tender_data.get('status')
-                ]
-            )
-
-            tender_row = tender_result.fetchone()
-            if tender_row:
-                tender_id = tender_row[0]
-                logger.info(f"Saved tender {tender_id} for file {tender_data['file_name']}")
-
-            await session.commit()
-
-    except Exception as e:
-        logger.error(f"Error saving to database: {e}")
-        raise
-
-async def save_to_database(result: Dict[str, Any]):
-    """Save processing results to database"""
-    try:
-        async with get_connection() as session:
-            # Insert tender
-            tender = result['tender']
-            tender_result = await session.execute(
-                text("""
-                    INSERT INTO tenders (state, file_name, contract_number, project_id,
-                                       bid_opening_date, title, winner_firm_id, winner_amount,
-                                       currency, extraction_info, status)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (state, file_name) DO UPDATE SET
-                        contract_number = EXCLUDED.contract_number,
-                        project_id = EXCLUDED.project_id,
-                        bid_opening_date = EXCLUDED.bid_opening_date,
-                        title = EXCLUDED.title,
-                        winner_firm_id = EXCLUDED.winner_firm_id,
-                        winner_amount = EXCLUDED.winner_amount,
-                        extraction_info = EXCLUDED.extraction_info,
-                        updated_at = CURRENT_TIMESTAMP
-                    RETURNING id
-                """),
-                [
-                    tender['state'], tender['file_name'], tender.get('contract_number'),
-                    tender.get('project_id'), tender.get('bid_opening_date'), tender.get('title'),
-                    tender.get('winner_firm_id'), tender.get('winner_amount'), tender.get('currency'),
-                    json.dumps(tender.get('extraction_info')), tender.get('status')
-                ]
-            )
-
-            tender_id = tender_result.fetchone()[0]
-
-            # Insert firms
-            for firm in result.get('firms', []):
-                await session.execute(
-                    text("""
-                        INSERT INTO firms (state, firm_id, name_official, cslb_number)
-                        VALUES ($1, $2, $3, $4)
-                        ON CONFLICT (state, firm_id) DO NOTHING
-                    """),
-                    [firm['state'], firm['firm_id'], firm.get('name_official'), firm.get('cslb_number')]
-                )
-
-            # Insert bids
-            for bid in result.get('bids', []):
-                await session.execute(
-                    text("""
-                        INSERT INTO bids (state, tender_id, firm_id, bid_amount, currency,
-                                        rank, preference, cslb_number, name_official)
-                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                        ON CONFLICT (state, tender_id, firm_id) DO NOTHING
-                    """),
-                    [
-                        bid['state'], tender_id, bid['firm_id'], bid['bid_amount'],
-                        bid.get('currency'), bid.get('rank'), bid.get('preference'),
-                        bid.get('cslb_number'), bid.get('name_official')
-                    ]
-                )
-
-            await session.commit()
-            logger.info(f"Saved tender {tender_id} with {len(result.get('bids', []))} bids")
-
-    except Exception as e:
-        logger.error(f"Error saving to database: {e}")
-        raise
-
-async def create_exports(state: str, pdf_stem: str, result: Dict[str, Any]):
-    """Create JSON, CSV, and Markdown exports"""
-    try:
-        exports_dir = f"/app/storage/pdfs/{state}/exports/{pdf_stem}"
-        os.makedirs(f"{exports_dir}/tables", exist_ok=True)
-
-        # Create summary.json
-        summary = {
-            'pdf_stem': pdf_stem,
-            'state': state,
-            'tender': result['tender'],
-            'bid_count': len(result.get('bids', [])),
-            'firm_count': len(result.get('firms', [])),
-            'table_count': len(result.get('tables', [])),
-            'processing_timestamp': str(result['tender'].get('extraction_info', {}).get('processed_at'))
-        }
-
-        with open(f"{exports_dir}/summary.json", 'w') as f:
-            json.dump(summary, f, indent=2, default=str)
-
-        # Create bids.csv
-        if result.get('bids'):
-            with open(f"{exports_dir}/bids.csv", 'w', newline='') as f:
-                if result['bids']:
-                    writer = csv.DictWriter(f, fieldnames=result['bids'][0].keys())
-                    writer.writeheader()
-                    writer.writerows(result['bids'])
-
-        # Create table Markdown files
-        for i, table in enumerate(result.get('tables', [])):
-            table_md = f"# Table {i+1}\n\n"
-            table_md += "| " + " | ".join(table.get('columns', [])) + " |\n"
-            table_md += "|" + "|".join(["---"] * len(table.get('columns', []))) + "|\n"
-
-            for row in table.get('rows', []):
-                table_md += "| " + " | ".join(row) + " |\n"
-
-            with open(f"{exports_dir}/tables/table-{i+1:03d}.md", 'w') as f:
-                f.write(table_md)
-
-        logger.info(f"Created exports for {pdf_stem}")
-
-    except Exception as e:
-        logger.error(f"Error creating exports: {e}")
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException
+from typing import List
+from app.models.webhook import Webhook, WebhookCreate, WebhookUpdate
+from app.config.database import get_connection
+
+router = APIRouter()
+
+# Subscriptions are read by the triggers that fill webhook_outbox and by
+# WebhookDispatcher (services/webhooks.py); the secret is never returned
+
+WEBHOOK_COLUMNS = "id, url, events, max_concurrency, batch_size, active, created_at, updated_at"
+
+@router.post("/webhooks", response_model=Webhook)
+async def create_webhook(webhook: WebhookCreate):
+    """Subscribe a URL to job/ingestion completion events"""
+    async with get_connection() as conn:
+        result = await conn.fetchrow(f"""
+            INSERT INTO webhook_subscriptions (url, events, secret, max_concurrency, batch_size, active)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            RETURNING {WEBHOOK_COLUMNS}
+        """, webhook.url, webhook.events, webhook.secret, webhook.max_concurrency,
+            webhook.batch_size, webhook.active)
+
+        return dict(result)
+
+@router.get("/webhooks", response_model=List[Webhook])
+async def list_webhooks():
+    """List webhook subscriptions"""
+    async with get_connection() as conn:
+        results = await conn.fetch(f"SELECT {WEBHOOK_COLUMNS} FROM webhook_subscriptions ORDER BY id")
+        return [dict(row) for row in results]
+
+@router.get("/webhooks/{webhook_id}")
+async def get_webhook(webhook_id: int):
+    """Subscription with its outbox counts per delivery status"""
+    async with get_connection() as conn:
+        result = await conn.fetchrow(
+            f"SELECT {WEBHOOK_COLUMNS} FROM webhook_subscriptions WHERE id = $1", webhook_id
+        )
+        if not result:
+            raise HTTPException(status_code=404, detail="Webhook not found")
+
+        counts = await conn.fetch("""
+            SELECT status, COUNT(*) AS count FROM webhook_outbox
+            WHERE subscription_id = $1
+            GROUP BY status
+        """, webhook_id)
+        last_error = await conn.fetchval("""
+            SELECT last_error FROM webhook_outbox
+            WHERE subscription_id = $1 AND last_error IS NOT NULL
+            ORDER BY id DESC LIMIT 1
+        """, webhook_id)
+
+        return {
+            **Webhook.model_validate(dict(result)).model_dump(),
+            "outbox": {row['status']: row['count'] for row in counts},
+            "last_error": last_error
+        }
+
+@router.put("/webhooks/{webhook_id}", response_model=Webhook)
+async def update_webhook(webhook_id: int, update: WebhookUpdate):
+    """Pause/resume a subscription or change its delivery limits"""
+    async with get_connection() as conn:
+        result = await conn.fetchrow(f"""
+            UPDATE webhook_subscriptions SET
+                active = COALESCE($2, active),
+                max_concurrency = COALESCE($3, max_concurrency),
+                batch_size = COALESCE($4, batch_size),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+            RETURNING {WEBHOOK_COLUMNS}
+        """, webhook_id, update.active, update.max_concurrency, update.batch_size)
+
+        if not result:
+            raise HTTPException(status_code=404, detail="Webhook not found")
+
+        return dict(result)
+
+@router.post("/webhooks/{webhook_id}/retry")
+async def retry_webhook(webhook_id: int):
+    """Requeue events that exhausted WEBHOOK_MAX_ATTEMPTS"""
+    async with get_connection() as conn:
+        result = await conn.execute("""
+            UPDATE webhook_outbox SET
+                status = 'pending',
+                attempts = 0,
+                next_attempt_at = CURRENT_TIMESTAMP
+            WHERE subscription_id = $1 AND status = 'failed'
+        """, webhook_id)
+
+        return {"requeued": int(result.split()[-1])}
+
+@router.delete("/webhooks/{webhook_id}")
+async def delete_webhook(webhook_id: int):
+    """Delete a subscription and its queued events"""
+    async with get_connection() as conn:
+        result = await conn.fetchrow(
+            "DELETE FROM webhook_subscriptions WHERE id = $1 RETURNING id", webhook_id
+        )
+
+        if not result:
+            raise HTTPException(status_code=404, detail="Webhook not found")
+
+        return {"message": "Webhook deleted successfully"}
@@ -0,0 +1,159 @@
+"""
+Tender/bid analytics summary tables.
+
+tender_bid_stats holds one row per tender (low/second/high bid, spread,
+bidder list) and firm_monthly_stats one row per (state, firm, month) with
+bid/win counts and sums; state is stored upper case, whatever case the
+tender was ingested with. Both are refreshed incrementally by
+refresh_tender_analytics() inside the transaction that writes a tender's
+bids, touching only the firms and months that tender affects; rebuild()
+recomputes everything (python -m app.services.analytics).
+"""
+
+import asyncio
+import logging
+from app.config.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Month bucket of a tender: bid opening date, or ingestion date when unknown
+TENDER_MONTH = "date_trunc('month', COALESCE(t.bid_opening_date, t.created_at::date))::date"
+
+TENDER_STATS_SELECT = f"""
+    WITH ranked AS (
+        SELECT tender_id, firm_id, bid_amount,
+               ROW_NUMBER() OVER (PARTITION BY tender_id ORDER BY bid_amount, firm_id) AS position
+        FROM bids
+        WHERE {{where}}
+    ), agg AS (
+        SELECT tender_id,
+               COUNT(*) AS bid_count,
+               MIN(bid_amount) AS low_bid,
+               MAX(bid_amount) FILTER (WHERE position = 2) AS second_bid,
+               MAX(bid_amount) AS high_bid,
+               ARRAY_AGG(firm_id ORDER BY position) AS firm_ids
+        FROM ranked
+        GROUP BY tender_id
+    )
+    SELECT t.id, upper(t.state), {TENDER_MONTH}, a.bid_count, a.low_bid, a.second_bid, a.high_bid,
+           a.second_bid - a.low_bid,
+           ((a.second_bid - a.low_bid) / NULLIF(a.low_bid, 0))::float8,
+           t.winner_firm_id, a.firm_ids
+    FROM agg a
+    JOIN tenders t ON t.id = a.tender_id
+"""
+
+TENDER_STATS_COLUMNS = """
+    tender_id, state, month, bid_count, low_bid, second_bid, high_bid,
+    spread_amount, spread_pct, winner_firm_id, firm_ids
+"""
+
+# Aggregate firm activity for the tenders selected by {join}
+FIRM_STATS_SELECT = """
+    SELECT s.state, b.firm_id, s.month,
+           COUNT(*) AS bid_count,
+           COUNT(*) FILTER (WHERE b.firm_id = s.winner_firm_id) AS win_count,
+           SUM(b.bid_amount) AS total_bid_amount,
+           COALESCE(SUM(b.rank), 0) AS rank_sum,
+           COUNT(b.rank) AS rank_count,
+           COALESCE(SUM(((b.bid_amount - s.low_bid) / NULLIF(s.low_bid, 0))::float8), 0) AS pct_above_low_sum
+    FROM tender_bid_stats s
+    JOIN bids b ON b.tender_id = s.tender_id
+    {join}
+    GROUP BY s.state, b.firm_id, s.month
+"""
+
+
+async def refresh_tender_analytics(conn, tender_id: int):
+    """Recompute one tender's stats and the firm/month rows it contributes to (call inside a transaction)"""
+    old = await conn.fetchrow(
+        "DELETE FROM tender_bid_stats WHERE tender_id = $1 RETURNING state, month, firm_ids",
+        tender_id
+    )
+    new = await conn.fetchrow(f"""
+        INSERT INTO tender_bid_stats ({TENDER_STATS_COLUMNS})
+        {TENDER_STATS_SELECT.format(where='tender_id = $1')}
+        RETURNING state, month, firm_ids
+    """, tender_id)
+
+    keys = set()
+    for row in (old, new):
+        if row:
+            keys.update((row['state'], firm_id, row['month']) for firm_id in row['firm_ids'])
+    if not keys:
+        return
+
+    # Serialize refreshes of the same (state, month): each recompute must see
+    # the bids committed by concurrent writers of that month
+    for state, month in sorted({(state, month) for state, _, month in keys}):
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", f"analytics:{state}:{month}")
+
+    states, firm_ids, months = (list(column) for column in zip(*keys))
+    await conn.execute(f"""
+        WITH keys AS (
+            SELECT * FROM unnest($1::text[], $2::text[], $3::date[]) AS k(state, firm_id, month)
+        ), agg AS (
+            {FIRM_STATS_SELECT.format(join="JOIN keys k ON k.state = s.state AND k.month = s.month AND k.firm_id = b.firm_id")}
+        ), removed AS (
+            DELETE FROM firm_monthly_stats f
+            USING keys k
+            WHERE f.state = k.state AND f.firm_id = k.firm_id AND f.month = k.month
+              AND NOT EXISTS (
+                  SELECT 1 FROM agg a
+                  WHERE a.state = k.state AND a.firm_id = k.firm_id AND a.month = k.month
+              )
+        )
+        INSERT INTO firm_monthly_stats (
+            state, firm_id, month, bid_count, win_count, total_bid_amount,
+            rank_sum, rank_count, pct_above_low_sum
+        )
+        SELECT * FROM agg
+        ON CONFLICT (state, firm_id, month) DO UPDATE SET
+            bid_count = EXCLUDED.bid_count,
+            win_count = EXCLUDED.win_count,
+            total_bid_amount = EXCLUDED.total_bid_amount,
+            rank_sum = EXCLUDED.rank_sum,
+            rank_count = EXCLUDED.rank_count,
+            pct_above_low_sum = EXCLUDED.pct_above_low_sum,
+            updated_at = CURRENT_TIMESTAMP
+    """, states, firm_ids, months)
+
+
+async def rebuild():
+    """Recompute both summary tables from tenders/bids"""
+    async with get_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("LOCK TABLE tender_bid_stats, firm_monthly_stats IN EXCLUSIVE MODE")
+            await conn.execute("DELETE FROM firm_monthly_stats")
+            await conn.execute("DELETE FROM tender_bid_stats")
+            await conn.execute(f"""
+                INSERT INTO tender_bid_stats ({TENDER_STATS_COLUMNS})
+                {TENDER_STATS_SELECT.format(where='tender_id IS NOT NULL')}
+            """)
+            await conn.execute(f"""
+                INSERT INTO firm_monthly_stats (
+                    state, firm_id, month, bid_count, win_count, total_bid_amount,
+                    rank_sum, rank_count, pct_above_low_sum
+                )
+                {FIRM_STATS_SELECT.format(join='')}
+            """)
+            counts = await conn.fetchrow("""
+                SELECT (SELECT COUNT(*) FROM tender_bid_stats) AS tenders,
+                       (SELECT COUNT(*) FROM firm_monthly_stats) AS firm_months
+            """)
+    logger.info(f"Analytics rebuilt: {counts['tenders']} tenders, {counts['firm_months']} firm-months")
+    return dict(counts)
+
+
+async def main():
+    """One-shot rebuild: python -m app.services.analytics"""
+    from app.config.database import close_db
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        await rebuild()
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
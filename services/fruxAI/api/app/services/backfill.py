@@ -0,0 +1,146 @@
+"""
+Incremental re-extraction of stored tender PDFs.
+
+Walks tenders in id order, re-runs PdfProcessor.extract_structured on the
+PDF under {prefix}/{state}/processed/ in a process pool, rewrites its
+Markdown export and upserts the tender, firms and bids again. Progress is checkpointed per batch in
+backfill_runs (shared with the worker's metadata backfill), so a rerun
+with the same name resumes after the last completed batch. Entry point:
+backfill.py.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from app.config.database import get_connection
+from app.services.ingestion import save_tender_result
+from app.services.pdf_processor import PdfProcessor, file_sha256, processed_key, tender_key
+from fruxai_shared.backfill_runs import start_run, finish_run
+
+logger = logging.getLogger(__name__)
+
+# Niceness of pool processes so backfills yield CPU to live ingestion
+BACKFILL_NICE = int(os.getenv("BACKFILL_NICE", "10"))
+
+_processor: Optional[PdfProcessor] = None
+
+
+def _init_process():
+    try:
+        os.nice(BACKFILL_NICE)
+    except OSError:
+        pass
+
+
+def extract_structured_file(pdf_path: str, state: str) -> Dict[str, Any]:
+    """Run the current table extraction on a local PDF (executes in a pool process)"""
+    global _processor
+    if _processor is None:
+        _processor = PdfProcessor()
+    return _processor.extract_structured(pdf_path, state)
+
+
+class TenderBackfill:
+    """Re-extracts tenders, firms and bids from processed PDFs in resumable batches"""
+
+    def __init__(self, name: str, pdf_processor: Optional[PdfProcessor] = None,
+                 state: Optional[str] = None, batch_size: int = 20, workers: int = 2,
+                 rate: float = 0):
+        self.name = name
+        self.pdf_processor = pdf_processor or PdfProcessor()
+        self.storage = self.pdf_processor.storage
+        self.state = state
+        self.batch_size = batch_size
+        self.workers = workers
+        self.rate = rate  # documents per second, 0 = unthrottled
+
+    async def run(self, reset: bool = False) -> Dict[str, Any]:
+        run = await start_run(get_connection, self.name, 'tenders', {
+            'state': self.state,
+            'batch_size': self.batch_size,
+            'parser_version': PdfProcessor.PARSER_VERSION,
+        }, reset)
+        last_id = run['last_id']
+        if last_id:
+            logger.info(f"Resuming backfill {self.name} after tender id {last_id}")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process) as pool:
+            while True:
+                started = time.monotonic()
+                async with get_connection() as conn:
+                    rows = await conn.fetch("""
+                        SELECT id, state, file_name, extraction_info->>'sha256' AS sha256
+                        FROM tenders
+                        WHERE id > $1 AND ($2::text IS NULL OR state = $2)
+                        ORDER BY id
+                        LIMIT $3
+                    """, last_id, self.state, self.batch_size)
+                if not rows:
+                    break
+
+                results = await asyncio.gather(*(self._reprocess(pool, row) for row in rows))
+                updated = sum(1 for ok in results if ok)
+                last_id = rows[-1]['id']
+
+                async with get_connection() as conn:
+                    await conn.execute("""
+                        UPDATE backfill_runs SET
+                            last_id = $2,
+                            processed = processed + $3,
+                            updated = updated + $4,
+                            failed = failed + $3 - $4,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE name = $1
+                    """, self.name, last_id, len(rows), updated)
+                logger.info(f"Backfill {self.name}: {updated}/{len(rows)} tenders updated up to id {last_id}")
+
+                if self.rate:
+                    await asyncio.sleep(max(0.0, len(rows) / self.rate - (time.monotonic() - started)))
+
+        return await finish_run(get_connection, self.name)
+
+    async def _reprocess(self, pool: ProcessPoolExecutor, row) -> bool:
+        state, file_name = row['state'], row['file_name']
+        # Processed PDFs are keyed by content; tenders ingested before that
+        # still live under their upload name
+        pdf_key = processed_key(state, row['sha256']) if row['sha256'] else None
+        if pdf_key is None or not await self.storage.exists(pdf_key):
+            pdf_key = tender_key(state, "processed", file_name)
+        if not await self.storage.exists(pdf_key):
+            logger.warning(f"Processed PDF missing for tender {row['id']}: {pdf_key}")
+            return False
+
+        cache = self.pdf_processor.cache
+        loop = asyncio.get_running_loop()
+        markdown_key = tender_key(state, "exports", f"{os.path.splitext(file_name)[0]}.md")
+        try:
+            async with self.storage.local_path(pdf_key) as local_pdf:
+                sha256 = await asyncio.to_thread(file_sha256, local_pdf)
+                cached = await cache.get(sha256)
+                if cached:
+                    structured = self.pdf_processor.structured_from_cache(cached, state)
+                    markdown_length = await self.pdf_processor.reuse_markdown(cached, markdown_key, local_pdf)
+                else:
+                    structured = await loop.run_in_executor(pool, extract_structured_file, local_pdf, state)
+                    # The export still holds the previous parser's Markdown
+                    markdown_length = await self.storage.write_stream(
+                        markdown_key, self.pdf_processor.stream_markdown(local_pdf)
+                    )
+                    await cache.put(sha256, {
+                        **structured,
+                        'markdown_path': markdown_key,
+                        'content_length': markdown_length,
+                    })
+
+            result = self.pdf_processor.build_result(
+                structured, state, file_name, markdown_key, markdown_length,
+                sha256=sha256, cache_hit=bool(cached)
+            )
+            await save_tender_result(result)
+            return True
+        except Exception as e:
+            logger.error(f"Backfill failed for tender {row['id']} ({pdf_key}): {e}")
+            return False
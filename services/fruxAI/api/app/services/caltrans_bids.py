@@ -0,0 +1,182 @@
+"""
+Bulk Caltrans bid ingestion.
+
+Rows arrive as a JSON array, CSV or NDJSON stream, are validated with
+CaltransBidCreate and upserted in chunks: each chunk is COPYed into a
+per-transaction staging table and merged into caltrans_bids with a single
+INSERT ... ON CONFLICT (contract_number, bidder_id).
+"""
+
+import os
+import csv
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from pydantic import ValidationError
+from app.config.database import get_connection
+from app.models.caltrans_bid import CaltransBidCreate
+
+logger = logging.getLogger(__name__)
+
+# Rows per COPY/merge round
+CALTRANS_BULK_CHUNK_SIZE = int(os.getenv("CALTRANS_BULK_CHUNK_SIZE", "5000"))
+
+# Validation errors echoed back to the caller
+MAX_REPORTED_ERRORS = 100
+
+COLUMNS = ('contract_number', 'number_of_bidders', 'bid_rank', 'bid_amount', 'bidder_id')
+
+
+def normalize_header(name: str) -> str:
+    """'Bid Amount' / 'bid-amount' -> 'bid_amount'"""
+    return '_'.join(name.strip().lower().replace('-', ' ').split())
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without buffering the whole body"""
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8-sig').rstrip('\r')
+    if pending:
+        yield pending.decode('utf-8-sig').rstrip('\r')
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    async for line in iter_lines(chunks):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON line: {e}")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Join physical lines into CSV records: a line break inside a quoted field
+    (bidder names, addresses) leaves an odd number of quotes open, so lines
+    are collected until the quotes balance ("" escapes count twice).
+    """
+    pending: List[str] = []
+    open_quotes = 0
+    async for line in iter_lines(chunks):
+        pending.append(line)
+        open_quotes += line.count('"')
+        if open_quotes % 2:
+            continue
+        yield '\n'.join(pending)
+        pending, open_quotes = [], 0
+    if pending:
+        yield ValueError("Unterminated quoted field at end of CSV")
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    header = None
+    async for record in iter_csv_records(chunks):
+        if isinstance(record, Exception):
+            yield record
+            continue
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [normalize_header(value) for value in values]
+            continue
+        yield {key: (value if value != '' else None) for key, value in zip(header, values)}
+
+
+async def iter_items(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+class CaltransBidImporter:
+    """Validates incoming rows and upserts them chunk by chunk in one transaction"""
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or CALTRANS_BULK_CHUNK_SIZE
+        self.received = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.invalid = 0
+
+    def _validate(self, row_number: int, item: Any) -> Optional[tuple]:
+        try:
+            if isinstance(item, Exception):
+                raise item
+            bid = CaltransBidCreate.model_validate(item)
+        except (ValidationError, ValueError, TypeError) as e:
+            self.invalid += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                detail = e.errors(include_url=False) if isinstance(e, ValidationError) else str(e)
+                self.errors.append({'row': row_number, 'error': detail})
+            return None
+        return (row_number, *(getattr(bid, column) for column in COLUMNS))
+
+    async def run(self, rows: AsyncIterator[Any]) -> Dict[str, Any]:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE caltrans_bids_staging (
+                        seq BIGINT,
+                        contract_number VARCHAR(50),
+                        number_of_bidders INTEGER,
+                        bid_rank INTEGER,
+                        bid_amount DECIMAL(15,2),
+                        bidder_id VARCHAR(50)
+                    ) ON COMMIT DROP
+                """)
+
+                chunk = []
+                async for item in rows:
+                    self.received += 1
+                    record = self._validate(self.received, item)
+                    if record:
+                        chunk.append(record)
+                    if len(chunk) >= self.chunk_size:
+                        await self._merge(conn, chunk)
+                        chunk = []
+                if chunk:
+                    await self._merge(conn, chunk)
+
+        logger.info(
+            f"Caltrans bulk import: {self.received} received, {self.inserted} inserted, "
+            f"{self.updated} updated, {self.invalid} invalid"
+        )
+        return {
+            'received': self.received,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'invalid': self.invalid,
+            'errors': self.errors,
+        }
+
+    async def _merge(self, conn, records: List[tuple]):
+        await conn.copy_records_to_table(
+            'caltrans_bids_staging', records=records, columns=('seq',) + COLUMNS
+        )
+        # Last occurrence wins when the same (contract, bidder) repeats in a chunk
+        counts = await conn.fetchrow("""
+            WITH upserted AS (
+                INSERT INTO caltrans_bids (contract_number, number_of_bidders, bid_rank, bid_amount, bidder_id)
+                SELECT DISTINCT ON (contract_number, bidder_id)
+                       contract_number, number_of_bidders, bid_rank, bid_amount, bidder_id
+                FROM caltrans_bids_staging
+                ORDER BY contract_number, bidder_id, seq DESC
+                ON CONFLICT (contract_number, bidder_id) DO UPDATE SET
+                    number_of_bidders = EXCLUDED.number_of_bidders,
+                    bid_rank = EXCLUDED.bid_rank,
+                    bid_amount = EXCLUDED.bid_amount,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING (xmax = 0) AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+                   COUNT(*) FILTER (WHERE NOT inserted) AS updated
+            FROM upserted
+        """)
+        await conn.execute("TRUNCATE caltrans_bids_staging")
+        self.inserted += counts['inserted']
+        self.updated += counts['updated']
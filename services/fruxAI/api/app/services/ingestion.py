@@ -0,0 +1,560 @@
+"""
+Durable PDF ingestion queue.
+
+/ingest stores the upload and inserts a pdf_ingestions row; IngestionWorker
+processes (see ingest_worker.py) claim rows with FOR UPDATE SKIP LOCKED,
+run PdfProcessor and record the outcome. Claimed rows carry a lease, so
+jobs held by a crashed worker are picked up again once it expires.
+"""
+
+import io
+import os
+import csv
+import json
+import uuid
+import socket
+import hashlib
+import asyncio
+import logging
+import tarfile
+import zipfile
+from datetime import date, datetime
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+from app.config.database import get_connection
+from app.services.analytics import refresh_tender_analytics
+from app.services.pdf_processor import PdfProcessor, incoming_key, processed_key, tender_key
+from fruxai_shared.storage_backends import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Read size when streaming uploads into storage
+UPLOAD_CHUNK_SIZE = int(os.getenv("INGEST_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Uploads accepted by the batch endpoint besides plain PDFs
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+# Bid opening date formats seen in Caltrans bid summaries
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%B %d, %Y", "%b %d, %Y")
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Parse an extracted date string, None if it is not recognised"""
+    if value is None or isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_state(state: str) -> str:
+    """State codes are stored upper case ('ca' -> 'CA'), as analytics looks them up"""
+    return state.strip().upper()
+
+
+class FileNameConflictError(Exception):
+    """A different PDF was already ingested under this file name for the state"""
+
+
+async def enqueue_ingestion(state: str, file_name: str, storage_key: str,
+                            sha256: Optional[str] = None,
+                            batch_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Persist a new ingestion job, None if the same content is already queued or ingested.
+
+    Tenders and their exports are keyed by (state, file_name), so a different
+    PDF under a name already in use raises FileNameConflictError instead of
+    replacing the earlier tender.
+    """
+    async with get_connection() as conn:
+        async with conn.transaction():
+            # Serialises uploads of one name so two new PDFs cannot both pass the check
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1 || '/' || $2))", state, file_name)
+            taken = await conn.fetchval("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pdf_ingestions
+                    WHERE state = $1 AND file_name = $2 AND status <> 'failed'
+                      AND sha256 IS DISTINCT FROM $3
+                ) OR EXISTS (
+                    SELECT 1 FROM tenders
+                    WHERE state = $1 AND file_name = $2
+                      AND extraction_info->>'sha256' IS DISTINCT FROM $3
+                )
+            """, state, file_name, sha256)
+            if taken:
+                raise FileNameConflictError(
+                    f"A different PDF named {file_name} was already ingested for state {state}"
+                )
+
+            row = await conn.fetchrow("""
+                INSERT INTO pdf_ingestions (ingestion_id, state, file_name, storage_key, sha256, batch_id)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (state, sha256) WHERE status <> 'failed' DO NOTHING
+                RETURNING *
+            """, str(uuid.uuid4()), state, file_name, storage_key, sha256, batch_id)
+            return dict(row) if row else None
+
+
+async def find_ingestion_by_hash(state: str, sha256: str) -> Optional[Dict[str, Any]]:
+    """Live (not failed) ingestion of the same content for a state"""
+    async with get_connection() as conn:
+        row = await conn.fetchrow("""
+            SELECT * FROM pdf_ingestions
+            WHERE state = $1 AND sha256 = $2 AND status <> 'failed'
+        """, state, sha256)
+        return dict(row) if row else None
+
+
+async def iter_chunks(fileobj: BinaryIO) -> AsyncIterator[bytes]:
+    """Read a blocking file object in UPLOAD_CHUNK_SIZE pieces off the event loop"""
+    while chunk := await asyncio.to_thread(fileobj.read, UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _is_pdf_member(name: str) -> bool:
+    basename = os.path.basename(name)
+    # Skip macOS resource forks (__MACOSX/, ._x.pdf) and other hidden entries
+    return basename.lower().endswith('.pdf') and not basename.startswith('.') and '__MACOSX/' not in name
+
+
+async def iter_archive_pdfs(fileobj: BinaryIO, filename: str) -> AsyncIterator[Tuple[str, AsyncIterator[bytes]]]:
+    """
+    Yield (member file name, chunk iterator) for every PDF in a ZIP or tar
+    archive. Members are read sequentially from the file object, so each
+    chunk iterator must be consumed before advancing to the next member.
+    """
+    if filename.lower().endswith('.zip'):
+        archive = await asyncio.to_thread(zipfile.ZipFile, fileobj)
+        try:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_pdf_member(info.filename):
+                    continue
+                member = archive.open(info)
+                try:
+                    yield os.path.basename(info.filename), iter_chunks(member)
+                finally:
+                    member.close()
+        finally:
+            archive.close()
+        return
+
+    # Stream mode: no seeking, compression (gz/bz2/xz) detected automatically
+    archive = await asyncio.to_thread(tarfile.open, fileobj=fileobj, mode='r|*')
+    try:
+        members = iter(archive)
+        while (info := await asyncio.to_thread(next, members, None)) is not None:
+            if not info.isfile() or not _is_pdf_member(info.name):
+                continue
+            member = archive.extractfile(info)
+            try:
+                yield os.path.basename(info.name), iter_chunks(member)
+            finally:
+                member.close()
+    finally:
+        archive.close()
+
+
+async def create_batch(state: str) -> Dict[str, Any]:
+    async with get_connection() as conn:
+        row = await conn.fetchrow("""
+            INSERT INTO pdf_ingestion_batches (batch_id, state)
+            VALUES ($1, $2)
+            RETURNING *
+        """, str(uuid.uuid4()), state)
+        return dict(row)
+
+
+async def finish_batch(batch_id: str, file_count: int, duplicate_count: int, skipped_count: int):
+    async with get_connection() as conn:
+        await conn.execute("""
+            UPDATE pdf_ingestion_batches SET
+                file_count = $2,
+                duplicate_count = $3,
+                skipped_count = $4,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE batch_id = $1
+        """, batch_id, file_count, duplicate_count, skipped_count)
+
+
+async def get_batch_progress(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Batch row plus per-status counts of its queued ingestions"""
+    async with get_connection() as conn:
+        batch = await conn.fetchrow(
+            "SELECT * FROM pdf_ingestion_batches WHERE batch_id = $1",
+            batch_id
+        )
+        if not batch:
+            return None
+
+        rows = await conn.fetch("""
+            SELECT status, COUNT(*) AS count
+            FROM pdf_ingestions
+            WHERE batch_id = $1
+            GROUP BY status
+        """, batch_id)
+
+    counts = {status: 0 for status in ('pending', 'processing', 'completed', 'failed')}
+    counts.update({row['status']: row['count'] for row in rows})
+    queued = sum(counts.values())
+    done = counts['completed'] + counts['failed']
+
+    return {
+        **dict(batch),
+        'queued_count': queued,
+        'status_counts': counts,
+        'progress': round(done / queued, 4) if queued else 1.0,
+        'done': done == queued,
+    }
+
+
+async def ingest_stream(storage: StorageBackend, state: str, filename: str,
+                        chunks: AsyncIterator[bytes], batch_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Stream a PDF into storage while hashing it, then enqueue it unless the
+    same content was already ingested for the state. Returns the ingestion
+    row plus a 'duplicate' flag; raises FileNameConflictError when another
+    PDF already holds the file name.
+    """
+    digest = hashlib.sha256()
+
+    async def hashed():
+        async for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    # Land in a private staging key first; only new content is renamed into incoming/
+    staging_key = tender_key(state, "uploads", f"{uuid.uuid4().hex}.pdf")
+    size = await storage.write_stream(staging_key, hashed())
+    sha256 = digest.hexdigest()
+
+    existing = await find_ingestion_by_hash(state, sha256)
+    if existing:
+        await storage.delete(staging_key)
+        logger.info(f"Skipping duplicate upload {filename} ({sha256}) for state {state}")
+        return {**existing, 'duplicate': True}
+
+    # The client filename is only recorded on the row (and later the tender)
+    storage_key = incoming_key(state, sha256)
+    await storage.move(staging_key, storage_key)
+
+    try:
+        ingestion = await enqueue_ingestion(state, filename, storage_key, sha256, batch_id)
+    except FileNameConflictError:
+        # Unless a concurrent upload of the same bytes under another name took the key
+        if not await find_ingestion_by_hash(state, sha256):
+            await storage.delete(storage_key)
+        raise
+
+    if ingestion is None:
+        # Lost a race against a concurrent upload of the same bytes, which
+        # landed on the same key; the winner's worker moves it on
+        existing = await find_ingestion_by_hash(state, sha256)
+        return {**(existing or {}), 'duplicate': True}
+
+    logger.info(f"Queued {filename} ({size} bytes, {sha256}) for state {state}")
+    return {**ingestion, 'size_bytes': size, 'duplicate': False}
+
+
+async def get_ingestion(ingestion_id: str) -> Optional[Dict[str, Any]]:
+    async with get_connection() as conn:
+        row = await conn.fetchrow(
+            "SELECT * FROM pdf_ingestions WHERE ingestion_id = $1",
+            ingestion_id
+        )
+        return dict(row) if row else None
+
+
+async def save_tender_result(result: Dict[str, Any]) -> int:
+    """
+    Upsert a processed tender with its firms and bids in one transaction,
+    one statement per table (rows are passed as arrays and unnested)
+    """
+    tender = result['tender']
+    state = tender['state']
+    bids = result.get('bids', [])
+    firms = result.get('firms', [])
+
+    async with get_connection() as conn:
+        async with conn.transaction():
+            tender_id = await conn.fetchval("""
+                INSERT INTO tenders (state, file_name, contract_number, project_id,
+                                   bid_opening_date, title, winner_firm_id, winner_amount,
+                                   currency, extraction_info, status)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+                ON CONFLICT (state, file_name) DO UPDATE SET
+                    contract_number = EXCLUDED.contract_number,
+                    project_id = EXCLUDED.project_id,
+                    bid_opening_date = EXCLUDED.bid_opening_date,
+                    title = EXCLUDED.title,
+                    winner_firm_id = EXCLUDED.winner_firm_id,
+                    winner_amount = EXCLUDED.winner_amount,
+                    extraction_info = EXCLUDED.extraction_info,
+                    status = EXCLUDED.status,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING id
+            """,
+                state, tender['file_name'], tender.get('contract_number'),
+                tender.get('project_id'), parse_date(tender.get('bid_opening_date')),
+                tender.get('title'), tender.get('winner_firm_id'), tender.get('winner_amount'),
+                tender.get('currency'), tender.get('extraction_info'),
+                tender.get('status')
+            )
+
+            if firms:
+                await conn.execute("""
+                    INSERT INTO firms (state, firm_id, name_official, cslb_number)
+                    SELECT $1, * FROM unnest($2::text[], $3::text[], $4::text[])
+                    ON CONFLICT (state, firm_id) DO UPDATE SET
+                        name_official = COALESCE(EXCLUDED.name_official, firms.name_official),
+                        cslb_number = COALESCE(EXCLUDED.cslb_number, firms.cslb_number)
+                """, state,
+                    [firm['firm_id'] for firm in firms],
+                    [firm.get('name_official') for firm in firms],
+                    [firm.get('cslb_number') for firm in firms])
+
+            # Re-processing replaces the tender's bid list
+            await conn.execute("""
+                DELETE FROM bids
+                WHERE state = $1 AND tender_id = $2 AND NOT (firm_id = ANY($3::text[]))
+            """, state, tender_id, [bid['firm_id'] for bid in bids])
+
+            if bids:
+                await conn.execute("""
+                    INSERT INTO bids (state, tender_id, firm_id, bid_amount, currency,
+                                      rank, preference, cslb_number, name_official)
+                    SELECT $1, $2, * FROM unnest($3::text[], $4::numeric[], $5::text[],
+                                                 $6::int[], $7::text[], $8::text[], $9::text[])
+                    ON CONFLICT (state, tender_id, firm_id) DO UPDATE SET
+                        bid_amount = EXCLUDED.bid_amount,
+                        currency = EXCLUDED.currency,
+                        rank = EXCLUDED.rank,
+                        preference = EXCLUDED.preference,
+                        cslb_number = EXCLUDED.cslb_number,
+                        name_official = EXCLUDED.name_official
+                """, state, tender_id,
+                    [bid['firm_id'] for bid in bids],
+                    [bid['bid_amount'] for bid in bids],
+                    [bid.get('currency') for bid in bids],
+                    [bid.get('rank') for bid in bids],
+                    [bid.get('preference') for bid in bids],
+                    [bid.get('cslb_number') for bid in bids],
+                    [bid.get('name_official') for bid in bids])
+
+            await refresh_tender_analytics(conn, tender_id)
+
+        logger.info(f"Saved tender {tender_id} for file {tender['file_name']} with {len(bids)} bids")
+        return tender_id
+
+
+async def create_exports(storage: StorageBackend, state: str, pdf_stem: str, result: Dict[str, Any]):
+    """Create JSON, CSV, and Markdown exports"""
+    exports_dir = tender_key(state, "exports", pdf_stem)
+
+    # Create summary.json
+    summary = {
+        'pdf_stem': pdf_stem,
+        'state': state,
+        'tender': result['tender'],
+        'bid_count': len(result.get('bids', [])),
+        'firm_count': len(result.get('firms', [])),
+        'table_count': len(result.get('tables', [])),
+        'processing_timestamp': str(result['tender'].get('extraction_info', {}).get('timestamp'))
+    }
+
+    await storage.write(
+        f"{exports_dir}/summary.json",
+        json.dumps(summary, indent=2, default=str).encode('utf-8')
+    )
+
+    # Create bids.csv
+    if result.get('bids'):
+        buffer = io.StringIO(newline='')
+        writer = csv.DictWriter(buffer, fieldnames=result['bids'][0].keys())
+        writer.writeheader()
+        writer.writerows(result['bids'])
+        await storage.write(f"{exports_dir}/bids.csv", buffer.getvalue().encode('utf-8'))
+
+    # Create table Markdown files
+    for i, table in enumerate(result.get('tables', [])):
+        table_md = f"# Table {i+1}\n\n"
+        table_md += "| " + " | ".join(table.get('columns', [])) + " |\n"
+        table_md += "|" + "|".join(["---"] * len(table.get('columns', []))) + "|\n"
+
+        for row in table.get('rows', []):
+            table_md += "| " + " | ".join(row) + " |\n"
+
+        await storage.write(f"{exports_dir}/tables/table-{i+1:03d}.md", table_md.encode('utf-8'))
+
+    logger.info(f"Created exports for {pdf_stem}")
+
+
+class IngestionWorker:
+    """Claims pdf_ingestions rows and processes them with bounded concurrency"""
+
+    def __init__(self, pdf_processor: Optional[PdfProcessor] = None, concurrency: Optional[int] = None):
+        self.pdf_processor = pdf_processor or PdfProcessor()
+        self.storage = self.pdf_processor.storage
+        self.concurrency = concurrency or int(os.getenv("INGEST_CONCURRENCY", "2"))
+        self.lease_seconds = int(os.getenv("INGEST_LEASE_SECONDS", "600"))
+        self.retry_delay_seconds = int(os.getenv("INGEST_RETRY_DELAY_SECONDS", "30"))
+        self.poll_interval = float(os.getenv("INGEST_POLL_INTERVAL", "2"))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = False
+
+    async def run(self):
+        """Run `concurrency` consumer loops until stopped"""
+        self.running = True
+        logger.info(f"Ingestion worker {self.worker_id} started with concurrency {self.concurrency}")
+        try:
+            await self.pdf_processor.cache.purge_stale()
+        except Exception as e:
+            logger.warning(f"Failed to purge stale extraction cache entries: {e}")
+        await asyncio.gather(*(self._consume() for _ in range(self.concurrency)))
+
+    def stop(self):
+        self.running = False
+
+    async def _consume(self):
+        while self.running:
+            try:
+                job = await self.claim()
+                if not job:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self.process(job)
+            except Exception as e:
+                logger.error(f"Ingestion consumer error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job (pending, or processing with an expired lease)"""
+        async with get_connection() as conn:
+            # A job whose worker died on every attempt (e.g. a PDF that crashes
+            # or hangs it) never reaches fail(); give up on it here instead
+            await conn.execute("""
+                UPDATE pdf_ingestions SET
+                    status = 'failed',
+                    error_message = COALESCE(error_message, 'Lease expired on the final attempt'),
+                    locked_by = NULL,
+                    locked_until = NULL,
+                    completed_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'processing'
+                  AND locked_until < CURRENT_TIMESTAMP
+                  AND attempts >= max_attempts
+            """)
+
+            row = await conn.fetchrow("""
+                UPDATE pdf_ingestions SET
+                    status = 'processing',
+                    attempts = attempts + 1,
+                    locked_by = $1,
+                    locked_until = CURRENT_TIMESTAMP + make_interval(secs => $2),
+                    started_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM pdf_ingestions
+                    WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                       OR (status = 'processing' AND locked_until < CURRENT_TIMESTAMP
+                           AND attempts < max_attempts)
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            """, self.worker_id, self.lease_seconds)
+            return dict(row) if row else None
+
+    def processed_key(self, job: Dict[str, Any]) -> str:
+        # Rows queued before uploads were keyed by content have no sha256
+        if job.get('sha256'):
+            return processed_key(job['state'], job['sha256'])
+        return tender_key(job['state'], "processed", job['file_name'])
+
+    async def process(self, job: Dict[str, Any]):
+        state = job['state']
+        filename = job['file_name']
+        source_key = job['storage_key']
+        stored_key = self.processed_key(job)
+        logger.info(f"Processing ingestion {job['ingestion_id']}: {filename} for state {state}")
+
+        try:
+            # A previous attempt may have moved the file before failing
+            if not await self.storage.exists(source_key) and await self.storage.exists(stored_key):
+                source_key = stored_key
+
+            result = await self.pdf_processor.process_pdf(source_key, state, job.get('sha256'), filename)
+            if result['status'] != 'success':
+                raise RuntimeError(f"PDF processing failed: {result}")
+
+            tender_id = await save_tender_result(result)
+
+            try:
+                await create_exports(self.storage, state, os.path.splitext(filename)[0], result)
+            except Exception as e:
+                logger.error(f"Error creating exports: {e}")
+
+            await self.complete(job, tender_id, result)
+            logger.info(f"PDF processing completed: {filename}")
+
+        except Exception as e:
+            logger.error(f"Error processing ingestion {job['ingestion_id']}: {e}")
+            await self.fail(job, str(e))
+
+    async def complete(self, job: Dict[str, Any], tender_id: int, result: Dict[str, Any]):
+        async with get_connection() as conn:
+            status = await conn.execute("""
+                UPDATE pdf_ingestions SET
+                    status = 'completed',
+                    tender_id = $2,
+                    result = $3,
+                    error_message = NULL,
+                    locked_by = NULL,
+                    locked_until = NULL,
+                    completed_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = $1 AND locked_by = $4
+            """, job['id'], tender_id, {
+                'markdown_path': result.get('markdown_path'),
+                'metadata': result.get('metadata'),
+                'content_length': result.get('content_length'),
+                'bid_count': len(result.get('bids', [])),
+                'table_count': len(result.get('tables', [])),
+            }, self.worker_id)
+        self.check_lease(job, status)
+
+    def check_lease(self, job: Dict[str, Any], status: str) -> bool:
+        """False (and a warning) when the job was reclaimed after our lease expired"""
+        if int(status.split()[-1]):
+            return True
+        logger.warning(f"Lease on ingestion {job['ingestion_id']} expired and was reclaimed; not updating it")
+        return False
+
+    async def fail(self, job: Dict[str, Any], error_message: str):
+        """Retry with linear backoff, or give up after max_attempts"""
+        final = job['attempts'] >= job['max_attempts']
+        async with get_connection() as conn:
+            status = await conn.execute("""
+                UPDATE pdf_ingestions SET
+                    status = CASE WHEN $5 THEN 'failed' ELSE 'pending' END,
+                    error_message = $2,
+                    next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $3),
+                    locked_by = NULL,
+                    locked_until = NULL,
+                    completed_at = CASE WHEN $5 THEN CURRENT_TIMESTAMP END,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = $1 AND locked_by = $4
+            """, job['id'], error_message, self.retry_delay_seconds * job['attempts'],
+                self.worker_id, final)
+
+        if self.check_lease(job, status) and final:
+            # Move to processed anyway to avoid re-processing
+            source_key = job['storage_key']
+            if await self.storage.exists(source_key):
+                await self.storage.move(source_key, self.processed_key(job))
@@ -1,29 +1,103 @@
 """
-PDF Processor using pdfplumber + markdownify
-PDF dosyalarını işler ve Markdown formatına çevirir.
+PDF Processor using pdfplumber
+PDF dosyalarını işler ve Markdown formatına çevirir (sayfa sayfa, doğrudan;
+markdownify üzerinden HTML ara adımı isteğe bağlıdır).
 FastAPI ile entegrasyon için PdfProcessor interface sağlar.
 """
 
 import os
+import re
 import json
+import hashlib
+import asyncio
 import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Any, Optional
 import pdfplumber
-from markdownify import markdownify as md
-from bs4 import BeautifulSoup
+from fruxai_shared.storage_backends import StorageBackend, get_storage_backend
+from fruxai_shared.extraction_cache import ExtractionCache
+from app.config.database import get_connection
+
+try:
+    from markdownify import markdownify as md
+except ImportError:  # optional, only needed for PDF_MARKDOWN_RENDERER=markdownify
+    md = None
 
 logger = logging.getLogger(__name__)
 
+# "direct" (sayfa sayfa Markdown) veya "markdownify" (HTML ara adımı)
+PDF_MARKDOWN_RENDERER = os.getenv("PDF_MARKDOWN_RENDERER", "direct")
+
+# Key prefix for tender documents: {prefix}/{state}/{incoming,processed,exports}/...
+TENDER_STORAGE_PREFIX = os.getenv("TENDER_STORAGE_PREFIX", "pdfs").strip("/")
+
+
+def tender_key(state: str, stage: str, *parts: str) -> str:
+    """Storage key for a tender document, e.g. pdfs/CA/incoming/x.pdf"""
+    return "/".join((TENDER_STORAGE_PREFIX, state, stage) + parts)
+
+
+def incoming_key(state: str, sha256: str) -> str:
+    """Queued upload; keyed by content so same-named PDFs never overwrite each other"""
+    return tender_key(state, "incoming", f"{sha256}.pdf")
+
+
+def processed_key(state: str, sha256: str) -> str:
+    """Processed PDF, keyed by content like incoming_key (the filename lives on the tender)"""
+    return tender_key(state, "processed", f"{sha256}.pdf")
+
+
+def parse_amount(value: Optional[str]) -> Optional[Decimal]:
+    """'$1,234,567.89' -> Decimal('1234567.89'), None if not a number"""
+    if not value:
+        return None
+    cleaned = re.sub(r'[^0-9.\-]', '', value)
+    try:
+        return Decimal(cleaned) if cleaned else None
+    except InvalidOperation:
+        return None
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a local file, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def escape_markdown(text: str) -> str:
+    """markdownify ile aynı kaçışlar: * ve _"""
+    return text.replace('*', r'\*').replace('_', r'\_')
+
+
+def firm_key(name: str) -> str:
+    """Stable firm id from the official name when no CSLB number is given"""
+    return re.sub(r'[^A-Z0-9]+', '-', name.upper()).strip('-')[:100]
+
 
 class PdfProcessor:
     """
     PDF processing class that replaces DoclingProcessor
-    Uses pdfplumber + markdownify for faster, more reliable PDF processing
+    Uses pdfplumber for faster, more reliable PDF processing
     """
 
-    def __init__(self):
-        logger.info("Initializing PdfProcessor with pdfplumber + markdownify")
+    # Bump PARSER_VERSION whenever extraction output changes (head_aliases,
+    # table mapping, metadata rules); cached results of older versions are ignored
+    PARSER_NAME = "pdfplumber_tables"
+    PARSER_VERSION = "1"
+
+    def __init__(self, storage: Optional[StorageBackend] = None, renderer: Optional[str] = None):
+        self.renderer = renderer or PDF_MARKDOWN_RENDERER
+        if self.renderer == "markdownify" and md is None:
+            logger.warning("markdownify is not installed, falling back to the direct Markdown renderer")
+            self.renderer = "direct"
+        logger.info(f"Initializing PdfProcessor with pdfplumber ({self.renderer} Markdown)")
+        self.storage = storage or get_storage_backend()
+        self.cache = ExtractionCache(f"{self.PARSER_NAME}:{self.renderer}", self.PARSER_VERSION, get_connection)
         self.head_aliases = {
             'contract_number': ['Contract Number', 'Contract No.', 'Contract #', 'Contract Num'],
             'project_id': ['Project ID', 'Project No.', 'Proj ID', 'Project Num'],
@@ -76,7 +150,64 @@ class PdfProcessor:
 
         return '\n'.join(html_content)
 
-    def convert_pdf_to_markdown(self, pdf_path: str, output_path: Optional[str] = None) -> str:
+    def iter_markdown(self, pdf_path: str) -> Iterator[str]:
+        """
+        PDF'yi sayfa sayfa Markdown parçaları olarak üretir (HTML ara adımı yok).
+        Çıktı markdownify yolunun ürettiği yapıyla aynıdır: sayfa başlığı,
+        paragraflar, tablo benzeri bloklar için kod blokları ve sayfa ayracı.
+        """
+        logger.info(f"Processing PDF: {pdf_path}")
+
+        if self.renderer == "markdownify":
+            yield self.render_markdown(pdf_path)
+            return
+
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages):
+                parts = [f"## Sayfa {page_num + 1}"]
+                text = page.extract_text()
+
+                if text:
+                    for para in text.split('\n\n'):
+                        if not para.strip():
+                            continue
+                        # Tablo benzeri yapıları tespit et
+                        if '\t' in para or '  ' in para.replace('\n', ''):
+                            parts.append(f"```\n{para.replace(chr(9), '    ')}\n```")
+                        else:
+                            parts.append('  \n'.join(escape_markdown(line) for line in para.split('\n')))
+                else:
+                    parts.append("*Bu sayfada metin bulunamadı*")
+
+                parts.append("---")
+                # Sayfa nesnelerini bırak; 500 sayfalık belgelerde bellek büyümesin
+                page.flush_cache()
+                yield '\n\n'.join(parts) + '\n\n'
+
+    async def stream_markdown(self, pdf_path: str) -> AsyncIterator[bytes]:
+        """iter_markdown'ı event loop'u bloklamadan UTF-8 parçalar olarak akıtır"""
+        pages = self.iter_markdown(pdf_path)
+        while (chunk := await asyncio.to_thread(next, pages, None)) is not None:
+            yield chunk.encode('utf-8')
+
+    def render_markdown(self, pdf_path: str) -> str:
+        """
+        PDF dosyasını Markdown metnine çevirir (dosyaya yazmadan)
+        """
+        if self.renderer != "markdownify":
+            return ''.join(self.iter_markdown(pdf_path)).strip()
+
+        # PDF'den HTML çıkar
+        html_content = self.extract_text_with_layout(pdf_path)
+        logger.info(f"Extracted HTML content: {len(html_content)} characters")
+
+        # HTML'den Markdown'a çevir
+        markdown_content = md(html_content, heading_style="ATX")
+
+        # Gereksiz boşlukları temizle
+        return markdown_content.strip()
+
+    def convert_pdf_to_markdown(self, pdf_path: str, output_path: Optional[str] = None) -> int:
         """
         PDF dosyasını Markdown'a çevirir
 
@@ -85,7 +216,7 @@ class PdfProcessor:
             output_path: Çıktı Markdown dosyasının yolu (None ise otomatik belirlenir)
 
         Returns:
-            str: Markdown içeriği
+            int: Yazılan karakter sayısı
         """
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF dosyası bulunamadı: {pdf_path}")
@@ -95,71 +226,249 @@ class PdfProcessor:
             pdf_name = Path(pdf_path).stem
             output_path = f"{pdf_name}.md"
 
-        logger.info(f"Processing PDF: {pdf_path}")
+        # Sayfa sayfa dosyaya yaz
+        length = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for chunk in self.iter_markdown(pdf_path):
+                f.write(chunk)
+                length += len(chunk)
 
-        # PDF'den HTML çıkar
-        html_content = self.extract_text_with_layout(pdf_path)
-        logger.info(f"Extracted HTML content: {len(html_content)} characters")
+        logger.info(f"Markdown created: {output_path} ({length} characters)")
 
-        # HTML'den Markdown'a çevir
-        markdown_content = md(html_content, heading_style="ATX")
+        return length
 
-        # Gereksiz boşlukları temizle
-        markdown_content = markdown_content.strip()
+    def _map_columns(self, header: List[str]) -> Dict[str, int]:
+        """Tablo başlıklarını head_aliases ile alan adlarına eşler: {field: column index}"""
+        mapping = {}
+        for index, cell in enumerate(header):
+            normalized = ' '.join(cell.split()).lower()
+            if not normalized:
+                continue
+            for field, aliases in self.head_aliases.items():
+                if field in mapping:
+                    continue
+                if any(normalized == alias.lower() for alias in aliases):
+                    mapping[field] = index
+                    break
+        return mapping
+
+    def _bid_from_row(self, row: List[str], mapping: Dict[str, int], state: str) -> Optional[Dict[str, Any]]:
+        def cell(field: str) -> Optional[str]:
+            index = mapping.get(field)
+            return (row[index] or None) if index is not None and index < len(row) else None
+
+        name = cell('firm_name')
+        amount = parse_amount(cell('bid_amount'))
+        if not name or amount is None:
+            return None
+
+        name = ' '.join(name.split())
+        cslb_number = cell('cslb_number')
+        rank = re.sub(r'\D', '', cell('rank') or '')
+        return {
+            'state': state,
+            'firm_id': cslb_number or firm_key(name),
+            'bid_amount': amount,
+            'currency': 'USD',
+            'rank': int(rank) if rank else None,
+            'preference': (cell('preference') or '')[:10] or None,
+            'cslb_number': cslb_number,
+            'name_official': name,
+        }
 
-        # Dosyaya yaz
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+    def extract_structured(self, pdf_path: str, state: str) -> Dict[str, Any]:
+        """
+        pdfplumber tablo bulucusu ile teklif tablolarını doğrudan kayıtlara çevirir.
 
-        logger.info(f"Markdown created: {output_path} ({len(markdown_content)} characters)")
+        Başlığı head_aliases ile eşleşen (firma adı + teklif tutarı) tablolar
+        bid satırı üretir; başlıksız devam tabloları (sayfa taşması) önceki
+        eşlemeyi kullanır. Sözleşme alanları ilk sayfaların metninden okunur.
+        """
+        tables = []
+        bids: Dict[str, Dict[str, Any]] = {}
+        header_text = []
+        mapping: Dict[str, int] = {}
+        mapping_width = 0
 
-        return markdown_content
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages):
+                if page_num < 2:
+                    header_text.append(page.extract_text() or '')
+
+                for raw_table in page.extract_tables():
+                    rows = [[(cell or '').strip() for cell in row] for row in raw_table if row and any(row)]
+                    if not rows:
+                        continue
+
+                    columns = self._map_columns(rows[0])
+                    if 'firm_name' in columns and 'bid_amount' in columns:
+                        mapping, mapping_width = columns, len(rows[0])
+                        header, body = rows[0], rows[1:]
+                    elif mapping and len(rows[0]) == mapping_width:
+                        # Önceki sayfadaki tablonun devamı
+                        header, body = tables[-1]['columns'], rows
+                    else:
+                        mapping, mapping_width = {}, 0
+                        header, body = rows[0], rows[1:]
+
+                    tables.append({'page': page_num + 1, 'columns': header, 'rows': body})
+
+                    for row in body if mapping else []:
+                        bid = self._bid_from_row(row, mapping, state)
+                        if bid:
+                            bids.setdefault(bid['firm_id'], bid)
+
+                page.flush_cache()
+
+        bid_list = list(bids.values())
+        firms = [
+            {'state': state, 'firm_id': bid['firm_id'], 'name_official': bid['name_official'],
+             'cslb_number': bid['cslb_number']}
+            for bid in bid_list
+        ]
+
+        return {
+            'metadata': self.extract_basic_metadata('\n'.join(header_text)),
+            'tables': tables,
+            'bids': bid_list,
+            'firms': firms,
+        }
+
+    def structured_from_cache(self, cached: Dict[str, Any], state: str) -> Dict[str, Any]:
+        """Önbellekteki sonucu bu state için kayıtlara geri çevirir"""
+        return {
+            'metadata': cached['metadata'],
+            'tables': cached['tables'],
+            'bids': [
+                {**bid, 'state': state, 'bid_amount': Decimal(str(bid['bid_amount']))}
+                for bid in cached['bids']
+            ],
+            'firms': [{**firm, 'state': state} for firm in cached['firms']],
+        }
+
+    async def reuse_markdown(self, cached: Dict[str, Any], markdown_key: str, local_pdf: str) -> int:
+        """Önbellekteki Markdown export'unu yeniden kullanır, yoksa yeniden üretir"""
+        cached_key = cached.get('markdown_path')
+        if cached_key == markdown_key and await self.storage.exists(markdown_key):
+            return cached['content_length']
+
+        content = await self.storage.read(cached_key) if cached_key else None
+        if content is not None:
+            return await self.storage.write(markdown_key, content)
+
+        return await self.storage.write_stream(markdown_key, self.stream_markdown(local_pdf))
+
+    def build_result(self, structured: Dict[str, Any], state: str, file_name: str,
+                     markdown_key: Optional[str], markdown_length: Optional[int],
+                     sha256: Optional[str] = None, cache_hit: bool = False) -> Dict[str, Any]:
+        """extract_structured çıktısından tender/bid/firm kayıtlarını oluşturur"""
+        metadata = structured['metadata']
+        bids = structured['bids']
+
+        # Kazanan: en düşük sıra, sıra yoksa en düşük teklif
+        winner = min(
+            bids,
+            key=lambda bid: (bid['rank'] is None, bid['rank'] or 0, bid['bid_amount']),
+            default=None
+        )
+
+        extraction_info = {
+            'processor': self.PARSER_NAME,
+            'parser_version': self.PARSER_VERSION,
+            'sha256': sha256,
+            'cache_hit': cache_hit,
+            'timestamp': str(datetime.now().timestamp()),
+            'table_count': len(structured['tables']),
+            'bid_count': len(bids)
+        }
+
+        return {
+            'status': 'success',
+            'state': state,
+            'file_name': file_name,
+            'markdown_path': markdown_key,
+            'metadata': metadata,
+            'content_length': markdown_length,
+            'extraction_info': extraction_info,
+            'tender': {
+                'state': state,
+                'file_name': file_name,
+                'contract_number': metadata.get('contract_number'),
+                'project_id': metadata.get('project_id'),
+                'bid_opening_date': metadata.get('bid_opening_date'),
+                'title': f"Contract {metadata.get('contract_number', 'Unknown')}",
+                'winner_firm_id': winner['firm_id'] if winner else None,
+                'winner_amount': winner['bid_amount'] if winner else None,
+                'currency': 'USD',
+                'extraction_info': extraction_info,
+                'status': 'processed'
+            },
+            'bids': bids,
+            'firms': structured['firms'],
+            'tables': structured['tables']
+        }
 
-    async def process_pdf(self, pdf_path: str, state: str) -> Dict[str, Any]:
+    async def process_pdf(self, pdf_key: str, state: str, sha256: Optional[str] = None,
+                          file_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Process PDF and extract tender/bid information
         Compatible interface with DoclingProcessor
+
+        pdf_key is a storage key (see tender_key), the PDF may live on local
+        disk or in an object store. Results are cached by content SHA-256
+        (computed here when not given) and parser version. file_name is the
+        uploaded name recorded on the tender (defaults to the key's name);
+        the processed copy is stored under its SHA-256 (see processed_key).
         """
         try:
-            logger.info(f"Processing PDF: {pdf_path} for state {state}")
-
-            # PDF'yi Markdown'a çevir
-            pdf_name = Path(pdf_path).stem
-            markdown_path = f"/app/storage/pdfs/{state}/exports/{pdf_name}.md"
-            markdown_content = self.convert_pdf_to_markdown(pdf_path, markdown_path)
-
-            # Temel metadata çıkar (Contract Number, vb.)
-            metadata = self.extract_basic_metadata(markdown_content)
-
-            # İşlenmiş dosyayı taşı
-            processed_path = f"/app/storage/pdfs/{state}/processed/{Path(pdf_path).name}"
-            os.rename(pdf_path, processed_path)
-
-            result = {
-                'status': 'success',
-                'state': state,
-                'file_name': Path(pdf_path).name,
-                'markdown_path': markdown_path,
-                'metadata': metadata,
-                'content_length': len(markdown_content),
-                'extraction_info': {
-                    'processor': 'pdfplumber_markdownify',
-                    'timestamp': str(os.path.getmtime(markdown_path))
-                }
-            }
-
-            logger.info(f"Successfully processed PDF: {pdf_path}")
+            logger.info(f"Processing PDF: {pdf_key} for state {state}")
+
+            file_name = file_name or Path(pdf_key).name
+            markdown_key = tender_key(state, "exports", f"{Path(file_name).stem}.md")
+            async with self.storage.local_path(pdf_key) as local_pdf:
+                if sha256 is None:
+                    sha256 = await asyncio.to_thread(file_sha256, local_pdf)
+
+                cached = await self.cache.get(sha256)
+                if cached:
+                    logger.info(f"Extraction cache hit for {pdf_key} ({sha256})")
+                    structured = self.structured_from_cache(cached, state)
+                    markdown_length = await self.reuse_markdown(cached, markdown_key, local_pdf)
+                else:
+                    # pdfplumber bloklayıcı, thread'de çalıştır
+                    structured = await asyncio.to_thread(self.extract_structured, local_pdf, state)
+                    # Markdown sayfa sayfa doğrudan export dosyasına akar
+                    markdown_length = await self.storage.write_stream(
+                        markdown_key, self.stream_markdown(local_pdf)
+                    )
+                    await self.cache.put(sha256, {
+                        **structured,
+                        'markdown_path': markdown_key,
+                        'content_length': markdown_length,
+                    })
+
+            # İşlenmiş dosyayı taşı (yeniden denemede zaten processed/ altında olabilir)
+            stored_key = processed_key(state, sha256)
+            if pdf_key != stored_key:
+                await self.storage.move(pdf_key, stored_key)
+
+            result = self.build_result(
+                structured, state, file_name, markdown_key, markdown_length,
+                sha256=sha256, cache_hit=bool(cached)
+            )
+
+            logger.info(f"Successfully processed PDF: {pdf_key} ({len(result['bids'])} bids)")
             return result
 
         except Exception as e:
-            logger.error(f"Error processing PDF {pdf_path}: {e}")
+            logger.error(f"Error processing PDF {pdf_key}: {e}")
             raise
 
-    def extract_basic_metadata(self, markdown_content: str) -> Dict[str, Any]:
+    def extract_basic_metadata(self, text: str) -> Dict[str, Any]:
         """
-        Markdown içeriğinden temel metadata çıkarır
+        Sayfa metninden (veya Markdown içeriğinden) temel metadata çıkarır
         """
-        lines = markdown_content.split('\n')
+        lines = text.split('\n')
         metadata = {}
 
         for line in lines[:50]:  # İlk 50 satırda ara
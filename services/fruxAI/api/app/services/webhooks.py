@@ -0,0 +1,205 @@
+"""
+Outbound webhook delivery.
+
+Triggers on crawl_jobs and pdf_ingestions queue one webhook_outbox row per
+matching subscription when a job or ingestion completes or fails (see
+migrations.webhooks), in the same transaction as the status change.
+WebhookDispatcher (run by ingest_worker.py) claims due rows per subscription
+in batches of up to batch_size events, POSTs them as one JSON document and
+retries failed batches with exponential backoff. At most max_concurrency
+batches per subscription are in flight across all dispatchers; claims carry
+a lease so batches held by a crashed dispatcher are sent again.
+
+Delivery is at-least-once: receivers should de-duplicate on event id.
+"""
+
+import os
+import hmac
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from app.config.database import get_connection
+from app.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock(key, subscription_id) serializing batch claims per subscription
+WEBHOOK_LOCK_ID = 8_142_002
+
+SIGNATURE_HEADER = "X-Fruxai-Signature"
+DELIVERY_HEADER = "X-Fruxai-Delivery"
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookDispatcher:
+    """Delivers webhook_outbox batches with per-subscription concurrency limits"""
+
+    def __init__(self):
+        self.poll_interval = float(os.getenv("WEBHOOK_POLL_INTERVAL", "2"))
+        self.timeout = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+        self.lease_seconds = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+        self.max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+        self.retry_base_seconds = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "10"))
+        self.retry_max_seconds = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))
+        self.retention_days = int(os.getenv("WEBHOOK_DELIVERED_RETENTION_DAYS", "7"))
+        self.inflight: Dict[int, int] = {}
+        self.tasks = set()
+        self.client: Optional[httpx.AsyncClient] = None
+        self.running = False
+        self._purged_at = 0.0
+
+    async def run(self):
+        """Poll for due batches until stopped"""
+        self.running = True
+        self.client = httpx.AsyncClient(timeout=self.timeout)
+        logger.info("Webhook dispatcher started")
+        try:
+            while self.running:
+                try:
+                    await self.dispatch()
+                    if time.monotonic() - self._purged_at > 3600:
+                        await self.purge_delivered()
+                        self._purged_at = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Webhook dispatcher error: {e}")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            await self.client.aclose()
+
+    def stop(self):
+        self.running = False
+
+    async def dispatch(self):
+        """Start a delivery for every subscription with due events and free capacity"""
+        async with get_connection() as conn:
+            subscriptions = await conn.fetch("""
+                SELECT s.id, s.url, s.secret, s.max_concurrency, s.batch_size
+                FROM webhook_subscriptions s
+                WHERE s.active AND EXISTS (
+                    SELECT 1 FROM webhook_outbox o
+                    WHERE o.subscription_id = s.id
+                      AND ((o.status = 'pending' AND o.next_attempt_at <= CURRENT_TIMESTAMP)
+                        OR (o.status = 'sending' AND o.locked_until < CURRENT_TIMESTAMP))
+                )
+            """)
+
+        for subscription in subscriptions:
+            while self.inflight.get(subscription['id'], 0) < subscription['max_concurrency']:
+                claimed = await self.claim(subscription)
+                if not claimed:
+                    break
+                self.inflight[subscription['id']] = self.inflight.get(subscription['id'], 0) + 1
+                task = asyncio.create_task(self.deliver(subscription, *claimed))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def claim(self, subscription) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Lease the next batch of due events, unless max_concurrency batches are already in flight"""
+        batch_id = str(uuid.uuid4())
+        async with get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1, $2)", WEBHOOK_LOCK_ID, subscription['id'])
+                inflight = await conn.fetchval("""
+                    SELECT COUNT(DISTINCT batch_id) FROM webhook_outbox
+                    WHERE subscription_id = $1 AND status = 'sending' AND locked_until >= CURRENT_TIMESTAMP
+                """, subscription['id'])
+                if inflight >= subscription['max_concurrency']:
+                    return None
+
+                rows = await conn.fetch("""
+                    UPDATE webhook_outbox SET
+                        status = 'sending',
+                        attempts = attempts + 1,
+                        batch_id = $2,
+                        locked_until = CURRENT_TIMESTAMP + make_interval(secs => $3)
+                    WHERE id IN (
+                        SELECT id FROM webhook_outbox
+                        WHERE subscription_id = $1
+                          AND ((status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                            OR (status = 'sending' AND locked_until < CURRENT_TIMESTAMP))
+                        ORDER BY id
+                        LIMIT $4
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, event_type, payload, attempts, created_at
+                """, subscription['id'], batch_id, self.lease_seconds, subscription['batch_size'])
+
+        if not rows:
+            return None
+        return batch_id, sorted((dict(row) for row in rows), key=lambda row: row['id'])
+
+    async def deliver(self, subscription, batch_id: str, batch: List[Dict[str, Any]]):
+        try:
+            body = dumps({
+                "delivery_id": batch_id,
+                "events": [
+                    {"id": row['id'], "type": row['event_type'], "created_at": row['created_at'], "data": row['payload']}
+                    for row in batch
+                ],
+            })
+            headers = {"Content-Type": "application/json", DELIVERY_HEADER: batch_id}
+            if subscription['secret']:
+                headers[SIGNATURE_HEADER] = sign(subscription['secret'], body)
+
+            try:
+                response = await self.client.post(subscription['url'], content=body, headers=headers)
+            except httpx.HTTPError as e:
+                await self.failed(batch_id, f"{type(e).__name__}: {e}", None)
+                return
+
+            if response.is_success:
+                await self.delivered(batch_id)
+                logger.info(f"Delivered {len(batch)} webhook events to subscription {subscription['id']}")
+            else:
+                await self.failed(batch_id, f"HTTP {response.status_code}", response.headers.get("Retry-After"))
+        except Exception as e:
+            logger.error(f"Webhook delivery to subscription {subscription['id']} failed: {e}")
+            await self.failed(batch_id, str(e), None)
+        finally:
+            self.inflight[subscription['id']] -= 1
+
+    async def delivered(self, batch_id: str):
+        async with get_connection() as conn:
+            await conn.execute("""
+                UPDATE webhook_outbox SET
+                    status = 'delivered',
+                    delivered_at = CURRENT_TIMESTAMP,
+                    locked_until = NULL,
+                    last_error = NULL
+                WHERE batch_id = $1 AND status = 'sending'
+            """, batch_id)
+
+    async def failed(self, batch_id: str, error: str, retry_after: Optional[str]):
+        """Back off exponentially (with jitter), or give up after WEBHOOK_MAX_ATTEMPTS"""
+        minimum = float(retry_after) if retry_after and retry_after.isdigit() else 0
+        async with get_connection() as conn:
+            await conn.execute("""
+                UPDATE webhook_outbox SET
+                    status = CASE WHEN attempts >= $2 THEN 'failed' ELSE 'pending' END,
+                    next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => GREATEST(
+                        $5, LEAST($3 * power(2, attempts - 1), $4) * (0.5 + random() / 2)
+                    )),
+                    locked_until = NULL,
+                    last_error = $6
+                WHERE batch_id = $1 AND status = 'sending'
+            """, batch_id, self.max_attempts, self.retry_base_seconds, self.retry_max_seconds, minimum, error)
+        logger.warning(f"Webhook batch {batch_id} failed: {error}")
+
+    async def purge_delivered(self) -> int:
+        """Drop delivered events past WEBHOOK_DELIVERED_RETENTION_DAYS"""
+        async with get_connection() as conn:
+            result = await conn.execute("""
+                DELETE FROM webhook_outbox
+                WHERE status = 'delivered'
+                  AND delivered_at < CURRENT_TIMESTAMP - make_interval(days => $1)
+            """, self.retention_days)
+        return int(result.split()[-1])
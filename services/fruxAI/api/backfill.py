@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+fruxAI Tender Backfill
+Re-extracts tenders/bids/firms from processed PDFs after parser changes.
+
+    python backfill.py --name tables-v2 --state CA --workers 2 --rate 5
+"""
+
+import asyncio
+import logging
+import argparse
+from app.config.database import close_db
+from app.services.backfill import TenderBackfill
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-extract stored tender PDFs")
+    parser.add_argument("--name", required=True, help="Checkpoint name; rerun with the same name to resume")
+    parser.add_argument("--state", help="Only tenders of this state")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2, help="Extraction processes")
+    parser.add_argument("--rate", type=float, default=0, help="Max documents per second (0 = unthrottled)")
+    parser.add_argument("--reset", action="store_true", help="Discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    backfill = TenderBackfill(
+        args.name,
+        state=args.state,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        rate=args.rate,
+    )
+    try:
+        summary = await backfill.run(reset=args.reset)
+        logger.info(f"Backfill finished: {summary}")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+fruxAI PDF Ingestion Worker
+Consumes the pdf_ingestions queue filled by POST /ingest and delivers
+queued webhook events (WEBHOOKS_ENABLED=false to run webhooks elsewhere).
+"""
+
+import os
+import asyncio
+import logging
+from app.config.database import close_db
+from app.services.ingestion import IngestionWorker
+from app.services.webhooks import WebhookDispatcher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main():
+    """Main ingestion worker function"""
+    logger.info("Starting fruxAI PDF Ingestion Worker...")
+    worker = IngestionWorker()
+    dispatcher = WebhookDispatcher() if os.getenv("WEBHOOKS_ENABLED", "true").lower() == "true" else None
+
+    try:
+        if dispatcher:
+            await asyncio.gather(worker.run(), dispatcher.run())
+        else:
+            await worker.run()
+    except KeyboardInterrupt:
+        logger.info("Received shutdown signal")
+    finally:
+        worker.stop()
+        if dispatcher:
+            dispatcher.stop()
+        await close_db()
+        logger.info("PDF Ingestion Worker stopped")
+
+if __name__ == "__main__":
+    asyncio.run(main())
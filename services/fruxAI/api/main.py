@@ -1,8 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.config.database import init_db
-from app.routes import health, crawl_jobs, metadata, reports, caltrans_bids, tenders
+from app.config.database import init_db, close_db, PoolExhaustedError
+from app.responses import FastJSONResponse
+from app.compression import CompressionMiddleware
+from app.routes import health, crawl_jobs, metadata, reports, caltrans_bids, tenders, analytics, changes, webhooks
 import logging
 
 # Configure logging
@@ -16,11 +18,13 @@ async def lifespan(app: FastAPI):
     await init_db()
     yield
     logger.info("Shutting down fruxAI API...")
+    await close_db()
 
 app = FastAPI(
     title="fruxAI API",
     version="1.0.0",
     description="Crawler orchestration and metadata management API for fruxAI.",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
@@ -33,6 +37,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# zstd/br/gzip by Accept-Encoding (COMPRESSION_* env vars, see app/compression.py)
+app.add_middleware(CompressionMiddleware)
+
+@app.exception_handler(PoolExhaustedError)
+async def pool_exhausted_handler(request: Request, exc: PoolExhaustedError):
+    """Shed load with a retryable 503 instead of letting requests pile up on the pool"""
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 # Include routers
 app.include_router(health, prefix="/fruxAI/api/v1")
 app.include_router(crawl_jobs, prefix="/fruxAI/api/v1")
@@ -40,6 +57,9 @@ app.include_router(metadata, prefix="/fruxAI/api/v1")
 app.include_router(reports, prefix="/fruxAI/api/v1")
 app.include_router(caltrans_bids, prefix="/fruxAI/api/v1")
 app.include_router(tenders, prefix="/fruxAI/api/v1")
+app.include_router(analytics, prefix="/fruxAI/api/v1")
+app.include_router(changes, prefix="/fruxAI/api/v1")
+app.include_router(webhooks, prefix="/fruxAI/api/v1")
 
 @app.get("/fruxAI/api/v1/health")
 async def health_check():
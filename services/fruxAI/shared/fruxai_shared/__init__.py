@@ -0,0 +1,7 @@
+"""
+Modules shared by the API and the worker.
+
+Both images copy this package next to their own code (see
+docker/Dockerfile.api and docker/Dockerfile.worker), so it is imported as
+fruxai_shared from either service.
+"""
@@ -0,0 +1,46 @@
+"""
+backfill_runs checkpoints.
+
+Shared by the worker's metadata backfill (core/backfill.py) and the API's
+tender backfill (app/services/backfill.py). A run is identified by its
+name; each service advances last_id and the counters with its own batch
+update and passes its connection factory (get_connection) here.
+"""
+
+from typing import Any, AsyncContextManager, Callable, Dict
+
+
+async def start_run(connect: Callable[[], AsyncContextManager], name: str, target: str,
+                    options: Dict[str, Any], reset: bool = False) -> Dict[str, Any]:
+    """Create or resume a backfill_runs checkpoint"""
+    async with connect() as conn:
+        if reset:
+            await conn.execute("DELETE FROM backfill_runs WHERE name = $1", name)
+
+        row = await conn.fetchrow("""
+            INSERT INTO backfill_runs (name, target, options)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (name) DO UPDATE SET
+                status = 'running',
+                finished_at = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            RETURNING *
+        """, name, target, options)
+
+    if row['target'] != target:
+        raise ValueError(f"Backfill run {name} belongs to target {row['target']}, not {target}")
+    return dict(row)
+
+
+async def finish_run(connect: Callable[[], AsyncContextManager], name: str) -> Dict[str, Any]:
+    """Mark a run completed; returns its final checkpoint row"""
+    async with connect() as conn:
+        row = await conn.fetchrow("""
+            UPDATE backfill_runs SET
+                status = 'completed',
+                finished_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE name = $1
+            RETURNING *
+        """, name)
+        return dict(row)
@@ -0,0 +1,77 @@
+"""
+Extraction result cache.
+
+Maps (content SHA-256, parser name, parser version) to a parser's JSON
+output so unchanged documents are never parsed twice. Bumping a parser's
+version makes its old entries unreachable; purge_stale() drops them.
+Used by both the API and the worker, each passing its own connection
+factory (get_connection).
+"""
+
+import os
+import logging
+from typing import Any, AsyncContextManager, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class ExtractionCache:
+    """Persistent cache of one parser's output, backed by extraction_cache"""
+
+    def __init__(self, parser: str, version: str, connect: Callable[[], AsyncContextManager],
+                 enabled: Optional[bool] = None):
+        self.parser = parser
+        self.version = version
+        self.connect = connect
+        self.enabled = EXTRACTION_CACHE_ENABLED if enabled is None else enabled
+
+    async def get(self, sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Cached result for a document, None on miss (or if the cache is unavailable)"""
+        if not self.enabled or not sha256:
+            return None
+        try:
+            async with self.connect() as conn:
+                result = await conn.fetchval("""
+                    UPDATE extraction_cache SET
+                        hit_count = hit_count + 1,
+                        last_used_at = CURRENT_TIMESTAMP
+                    WHERE sha256 = $1 AND parser = $2 AND parser_version = $3
+                    RETURNING result
+                """, sha256, self.parser, self.version)
+        except Exception as e:
+            logger.warning(f"Extraction cache lookup failed for {sha256}: {e}")
+            return None
+        return result
+
+    async def put(self, sha256: Optional[str], result: Dict[str, Any]):
+        """Store a parser result; failures are logged, never raised"""
+        if not self.enabled or not sha256:
+            return
+        try:
+            async with self.connect() as conn:
+                await conn.execute("""
+                    INSERT INTO extraction_cache (sha256, parser, parser_version, result)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (sha256, parser, parser_version) DO UPDATE SET
+                        result = EXCLUDED.result,
+                        last_used_at = CURRENT_TIMESTAMP
+                """, sha256, self.parser, self.version, result)
+        except Exception as e:
+            logger.warning(f"Extraction cache store failed for {sha256}: {e}")
+
+    async def purge_stale(self) -> int:
+        """Delete this parser's entries written by other versions"""
+        async with self.connect() as conn:
+            deleted = await conn.fetchval("""
+                WITH stale AS (
+                    DELETE FROM extraction_cache
+                    WHERE parser = $1 AND parser_version <> $2
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM stale
+            """, self.parser, self.version)
+        if deleted:
+            logger.info(f"Purged {deleted} stale {self.parser} cache entries")
+        return deleted
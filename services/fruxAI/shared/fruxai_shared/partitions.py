@@ -0,0 +1,174 @@
+"""
+Monthly range partitioning of crawl_jobs, metadata and metadata_texts.
+
+All three are partitioned on created_at (metadata_texts.created_at mirrors
+its metadata row so a month's text lives in the matching partition and both
+can be dropped together). The API's baseline migration converts existing
+unpartitioned tables once and migrate() keeps PARTITION_MONTHS_AHEAD future
+partitions in place. The worker's retention keeps them ahead too and retires
+whole months: an expired month is detached (renamed *_expired) so it drops
+out of every query at once, then dropped after its files were released.
+"""
+
+import os
+import logging
+from datetime import date, datetime
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> primary key (must include the partition key)
+PARTITIONED_TABLES = {
+    'crawl_jobs': 'id, created_at',
+    'metadata': 'id, created_at',
+    'metadata_texts': 'metadata_id, created_at',
+}
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+# Also the API's MIGRATION_LOCK_ID (app/config/migrations.py): concurrent
+# CREATE TABLE ... PARTITION OF can fail with a catalog unique violation, so
+# API replicas and the worker create partitions one at a time, and never
+# while a migration runs
+PARTITION_LOCK_ID = 8_142_001
+
+EXPIRED_SUFFIX = "_expired"
+
+
+def month_start(value) -> date:
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    total = month.year * 12 + month.month - 1 + count
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+async def is_partitioned(conn, table: str) -> bool:
+    return bool(await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass($1)", table
+    ))
+
+
+async def ensure_partitions(conn, table: str, first: date, last: date):
+    """Create the monthly partitions of table covering first..last (inclusive months)"""
+    month = month_start(first)
+    while month <= month_start(last):
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(table, month)}
+            PARTITION OF {table}
+            FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')
+        """)
+        month = add_months(month, 1)
+
+
+async def ensure_upcoming_partitions(conn, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """Make sure the current month and the next months_ahead months have partitions"""
+    today = date.today()
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_LOCK_ID)
+        for table in PARTITIONED_TABLES:
+            await ensure_partitions(conn, table, today, add_months(month_start(today), months_ahead))
+
+
+async def list_partitions(conn, table: str) -> List[Tuple[str, date]]:
+    """Attached monthly partitions of table as (name, month), oldest first"""
+    rows = await conn.fetch("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass($1)
+        ORDER BY c.relname
+    """, table)
+    prefix = f"{table}_p"
+    partitions = []
+    for row in rows:
+        suffix = row['relname'][len(prefix):]
+        if row['relname'].startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((row['relname'], date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return partitions
+
+
+async def detach_partition(conn, table: str, name: str, drop: bool = False) -> str:
+    """Detach a partition; drop it, or keep it as <name>_expired for later cleanup"""
+    await conn.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+    if drop:
+        await conn.execute(f"DROP TABLE {name}")
+        return name
+    await conn.execute(f"ALTER TABLE {name} RENAME TO {name}{EXPIRED_SUFFIX}")
+    return f"{name}{EXPIRED_SUFFIX}"
+
+
+async def list_expired(conn, table: str) -> List[str]:
+    """Detached partitions of table still waiting to be dropped"""
+    rows = await conn.fetch("""
+        SELECT tablename FROM pg_tables
+        WHERE schemaname = current_schema() AND tablename LIKE $1
+        ORDER BY tablename
+    """, f"{table}\\_p______{EXPIRED_SUFFIX}")
+    return [row['tablename'] for row in rows]
+
+
+async def convert_to_partitioned(conn, table: str):
+    """
+    One-time conversion of a plain table into a partitioned one: the table is
+    renamed aside, recreated PARTITION BY RANGE (created_at) with the same
+    columns and defaults, refilled and dropped. Indexes are recreated afterwards
+    by the baseline migration.
+    """
+    if not await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table):
+        return
+    if await is_partitioned(conn, table):
+        return
+
+    legacy = f"{table}_unpartitioned"
+    logger.info(f"Converting {table} to a monthly partitioned table")
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        if table == 'metadata_texts':
+            # Text rows follow their metadata row's partition
+            await conn.execute("""
+                UPDATE metadata_texts t SET created_at = m.created_at
+                FROM metadata m
+                WHERE m.id = t.metadata_id AND t.created_at IS DISTINCT FROM m.created_at
+            """)
+        await conn.execute(f"UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+
+        # Foreign keys cannot target a partitioned table without the partition key
+        await conn.execute("""
+            ALTER TABLE metadata DROP CONSTRAINT IF EXISTS metadata_crawl_job_id_fkey
+        """)
+        await conn.execute("""
+            ALTER TABLE metadata_texts DROP CONSTRAINT IF EXISTS metadata_texts_metadata_id_fkey
+        """)
+
+        await conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        await conn.execute(f"""
+            CREATE TABLE {table} (
+                LIKE {legacy} INCLUDING DEFAULTS,
+                PRIMARY KEY ({PARTITIONED_TABLES[table]})
+            ) PARTITION BY RANGE (created_at)
+        """)
+
+        bounds = await conn.fetchrow(f"SELECT MIN(created_at) AS first, MAX(created_at) AS last FROM {legacy}")
+        upcoming = add_months(month_start(date.today()), PARTITION_MONTHS_AHEAD)
+        await ensure_partitions(
+            conn, table,
+            month_start(bounds['first'] or date.today()),
+            max(month_start(bounds['last'] or date.today()), upcoming)
+        )
+        await conn.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+
+        # Keep the id sequence alive when the old table goes away
+        if PARTITIONED_TABLES[table].startswith('id,'):
+            sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", legacy)
+            if sequence:
+                await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+        await conn.execute(f"DROP TABLE {legacy}")
+    logger.info(f"{table} converted to a partitioned table")
@@ -0,0 +1,361 @@
+"""
+Storage backends for crawl and tender documents.
+
+Keys are relative, "/"-separated paths such as ``pdfs/CA/incoming/x.pdf``.
+LocalBackend maps them under STORAGE_PATH, S3Backend maps them under
+STORAGE_S3_PREFIX in an S3-compatible bucket (AWS S3, MinIO, ...).
+Used by both the API and the worker.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+import aiofiles
+
+try:
+    import boto3
+except ImportError:  # optional, only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+# (key, size in bytes, modification time)
+ObjectInfo = Tuple[str, int, datetime]
+
+# Multipart part size for S3 uploads (S3 minimum is 5 MiB)
+S3_PART_SIZE = int(os.getenv("STORAGE_S3_PART_SIZE", str(8 * 1024 * 1024)))
+
+# Objects returned per batch when listing
+LIST_BATCH_SIZE = 1000
+
+
+class StorageBackend(ABC):
+    """Minimal object-store interface used by the API and the worker"""
+
+    name = "abstract"
+
+    @abstractmethod
+    async def write(self, key: str, data: bytes) -> int:
+        """Atomically store data under key, returns the number of bytes written"""
+
+    @abstractmethod
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Atomically store a stream of chunks under key"""
+
+    @abstractmethod
+    async def read(self, key: str) -> Optional[bytes]:
+        """Read an object, None if it does not exist"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[dict]:
+        """{'size': int, 'modified': datetime} or None"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Delete an object, returns False if it did not exist"""
+
+    @abstractmethod
+    async def move(self, src: str, dst: str):
+        """Rename an object"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> AsyncIterator[List[ObjectInfo]]:
+        """Yield batches of objects below prefix"""
+
+    @abstractmethod
+    def local_path(self, key: str):
+        """Async context manager yielding a filesystem path with the object's bytes"""
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+
+class LocalBackend(StorageBackend):
+    """Local filesystem (a mounted volume)"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def _temp_path(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    async def write(self, key: str, data: bytes) -> int:
+        path = self.path_for(key)
+        tmp_path = self._temp_path(path)
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        return len(data)
+
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        path = self.path_for(key)
+        tmp_path = self._temp_path(path)
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+        return size
+
+    async def read(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        async with aiofiles.open(path, 'rb') as f:
+            return await f.read()
+
+    async def stat(self, key: str) -> Optional[dict]:
+        try:
+            stat = self.path_for(key).stat()
+        except FileNotFoundError:
+            return None
+        return {'size': stat.st_size, 'modified': datetime.fromtimestamp(stat.st_mtime)}
+
+    async def delete(self, key: str) -> bool:
+        try:
+            self.path_for(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def move(self, src: str, dst: str):
+        dst_path = self.path_for(dst)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.path_for(src), dst_path)
+
+    def _scan(self, prefix: str) -> Iterator[ObjectInfo]:
+        stack = [str(self.path_for(prefix))]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and not entry.name.endswith('.tmp'):
+                            stat = entry.stat(follow_symlinks=False)
+                            key = Path(entry.path).relative_to(self.root).as_posix()
+                            yield key, stat.st_size, datetime.fromtimestamp(stat.st_mtime)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    async def list(self, prefix: str) -> AsyncIterator[List[ObjectInfo]]:
+        objects = self._scan(prefix.rstrip('/'))
+
+        def next_batch() -> List[ObjectInfo]:
+            batch = []
+            for info in objects:
+                batch.append(info)
+                if len(batch) >= LIST_BATCH_SIZE:
+                    break
+            return batch
+
+        while True:
+            # Directory walks are blocking I/O, keep them off the event loop
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                break
+            yield batch
+
+    @asynccontextmanager
+    async def local_path(self, key: str):
+        path = self.path_for(key)
+        if not path.exists():
+            raise FileNotFoundError(key)
+        yield str(path)
+
+
+class S3Backend(StorageBackend):
+    """S3-compatible object store; boto3 calls run in a worker thread"""
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _strip(self, object_key: str) -> str:
+        return object_key[len(self.prefix):]
+
+    async def write(self, key: str, data: bytes) -> int:
+        # A single PUT is atomic: readers see the old object or the new one
+        await asyncio.to_thread(
+            self.client.put_object, Bucket=self.bucket, Key=self.object_key(key), Body=data
+        )
+        return len(data)
+
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        object_key = self.object_key(key)
+        buffer = bytearray()
+        parts = []
+        upload_id = None
+        size = 0
+
+        async def flush():
+            nonlocal upload_id
+            if upload_id is None:
+                response = await asyncio.to_thread(
+                    self.client.create_multipart_upload, Bucket=self.bucket, Key=object_key
+                )
+                upload_id = response['UploadId']
+            part_number = len(parts) + 1
+            response = await asyncio.to_thread(
+                self.client.upload_part, Bucket=self.bucket, Key=object_key,
+                UploadId=upload_id, PartNumber=part_number, Body=bytes(buffer)
+            )
+            parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+            buffer.clear()
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) >= S3_PART_SIZE:
+                    await flush()
+
+            if upload_id is None:
+                # Small object, no multipart needed
+                await self.write(key, bytes(buffer))
+                return size
+
+            if buffer:
+                await flush()
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload, Bucket=self.bucket, Key=object_key,
+                UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+            return size
+        except BaseException:
+            if upload_id is not None:
+                await asyncio.to_thread(
+                    self.client.abort_multipart_upload, Bucket=self.bucket, Key=object_key,
+                    UploadId=upload_id
+                )
+            raise
+
+    async def read(self, key: str) -> Optional[bytes]:
+        def get():
+            try:
+                response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+            except self.client.exceptions.NoSuchKey:
+                return None
+            return response['Body'].read()
+
+        return await asyncio.to_thread(get)
+
+    async def stat(self, key: str) -> Optional[dict]:
+        def head():
+            try:
+                response = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            except self.client.exceptions.ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                    return None
+                raise
+            return {
+                'size': response['ContentLength'],
+                'modified': response['LastModified'].replace(tzinfo=None),
+            }
+
+        return await asyncio.to_thread(head)
+
+    async def delete(self, key: str) -> bool:
+        if not await self.exists(key):
+            return False
+        await asyncio.to_thread(
+            self.client.delete_object, Bucket=self.bucket, Key=self.object_key(key)
+        )
+        return True
+
+    async def move(self, src: str, dst: str):
+        await asyncio.to_thread(
+            self.client.copy_object, Bucket=self.bucket, Key=self.object_key(dst),
+            CopySource={'Bucket': self.bucket, 'Key': self.object_key(src)}
+        )
+        await asyncio.to_thread(
+            self.client.delete_object, Bucket=self.bucket, Key=self.object_key(src)
+        )
+
+    async def list(self, prefix: str) -> AsyncIterator[List[ObjectInfo]]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        pages = iter(paginator.paginate(
+            Bucket=self.bucket, Prefix=self.object_key(prefix),
+            PaginationConfig={'PageSize': LIST_BATCH_SIZE}
+        ))
+
+        while True:
+            page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                break
+            batch = [
+                (self._strip(obj['Key']), obj['Size'], obj['LastModified'].replace(tzinfo=None))
+                for obj in page.get('Contents', [])
+            ]
+            if batch:
+                yield batch
+
+    @asynccontextmanager
+    async def local_path(self, key: str):
+        # Parsers such as pdfplumber need a real file; download to a temp copy
+        suffix = Path(key).suffix
+        fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            await asyncio.to_thread(
+                self.client.download_file, self.bucket, self.object_key(key), tmp_path
+            )
+            yield tmp_path
+        finally:
+            os.unlink(tmp_path)
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend selected by STORAGE_BACKEND (local or s3)"""
+    global _backend
+    if _backend is None:
+        kind = os.getenv("STORAGE_BACKEND", "local")
+        if kind == "s3":
+            _backend = S3Backend(
+                bucket=os.getenv("STORAGE_S3_BUCKET", "fruxai"),
+                prefix=os.getenv("STORAGE_S3_PREFIX", ""),
+                endpoint_url=os.getenv("STORAGE_S3_ENDPOINT_URL") or None,
+                region=os.getenv("STORAGE_S3_REGION") or None,
+            )
+        else:
+            _backend = LocalBackend(os.getenv("STORAGE_PATH", "/app/storage"))
+        logger.info(f"Using {_backend.name} storage backend")
+    return _backend
@@ -0,0 +1,92 @@
+"""
+Fixtures for the Postgres-backed tests.
+
+The tests run against a real server (the docker-compose fruxai-db by
+default) in a separate database, FRUXAI_TEST_DB_NAME (fruxai_test), which
+is created and migrated once per session and emptied before every test.
+Everything is skipped when the server is unreachable.
+"""
+
+import os
+import asyncio
+
+import asyncpg
+import pytest
+
+TEST_DB_NAME = os.getenv("FRUXAI_TEST_DB_NAME", "fruxai_test")
+
+# The api and worker pools read these when their modules are imported
+os.environ["SUPABASE_DB_NAME"] = TEST_DB_NAME
+os.environ.setdefault("SUPABASE_DB_PASSWORD", "fruxai_password")
+os.environ.setdefault("DB_POOL_MIN_SIZE", "1")
+
+from app.config import database as api_database  # noqa: E402
+from app.config.migrations import migrate  # noqa: E402
+from utils import database as worker_database  # noqa: E402
+
+# Emptied before each test (CASCADE takes tables referencing these along)
+TEST_TABLES = (
+    "storage_refs", "storage_blobs", "storage_files", "metadata", "metadata_texts",
+    "crawl_jobs", "crawl_job_ids", "pdf_ingestions", "pdf_ingestion_batches",
+    "bids", "firms", "tenders", "tender_bid_stats", "firm_monthly_stats", "change_log", "webhook_outbox",
+)
+
+
+def server_dsn(database: str) -> str:
+    config = api_database.db_config
+    return f"postgresql://{config.user}:{config.password}@{config.host}:{config.port}/{database}"
+
+
+async def prepare_database():
+    admin = await asyncpg.connect(server_dsn("postgres"))
+    try:
+        exists = await admin.fetchval("SELECT 1 FROM pg_database WHERE datname = $1", TEST_DB_NAME)
+        if not exists:
+            await admin.execute(f'CREATE DATABASE "{TEST_DB_NAME}"')
+    finally:
+        await admin.close()
+
+    conn = await asyncpg.connect(server_dsn(TEST_DB_NAME))
+    try:
+        await migrate(conn)
+    finally:
+        await conn.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    try:
+        asyncio.run(prepare_database())
+    except (OSError, asyncpg.PostgresError) as e:
+        pytest.skip(f"Postgres not available for tests: {e}")
+
+
+@pytest.fixture(autouse=True)
+async def db(test_database):
+    """Direct connection to the emptied test database (for setup and assertions)"""
+    conn = await asyncpg.connect(server_dsn(TEST_DB_NAME))
+    await api_database.init_connection(conn)
+    await conn.execute(f"TRUNCATE {', '.join(TEST_TABLES)} RESTART IDENTITY CASCADE")
+    await conn.execute("UPDATE change_log_horizon SET xid = '0', seq = 0")
+    try:
+        yield conn
+    finally:
+        await conn.close()
+        # Each test has its own event loop; pools must not outlive it
+        await api_database.close_db()
+        await worker_database.close_db()
+
+
+@pytest.fixture
+async def connect():
+    """Opens extra connections (e.g. a writer kept in an open transaction)"""
+    opened = []
+
+    async def open_connection():
+        conn = await asyncpg.connect(server_dsn(TEST_DB_NAME))
+        opened.append(conn)
+        return conn
+
+    yield open_connection
+    for conn in opened:
+        await conn.close()
@@ -0,0 +1,34 @@
+"""State codes of the analytics summaries (api/app/services/analytics.py)"""
+
+from app.routes.analytics import get_firm_rankings, get_state_summary
+from app.services.analytics import refresh_tender_analytics
+
+
+async def insert_tender(conn, state, file_name, bids):
+    async with conn.transaction():
+        tender_id = await conn.fetchval("""
+            INSERT INTO tenders (state, file_name, winner_firm_id) VALUES ($1, $2, $3) RETURNING id
+        """, state, file_name, bids[0][0])
+        for rank, (firm_id, amount) in enumerate(bids, start=1):
+            await conn.execute("""
+                INSERT INTO bids (state, tender_id, firm_id, bid_amount, rank) VALUES ($1, $2, $3, $4, $5)
+            """, state, tender_id, firm_id, amount, rank)
+        await refresh_tender_analytics(conn, tender_id)
+    return tender_id
+
+
+async def test_lower_case_tender_is_summarised_under_the_upper_case_state(db):
+    await insert_tender(db, "CA", "a.pdf", [("acme", 100), ("beta", 110)])
+    await insert_tender(db, "ca", "b.pdf", [("acme", 200), ("beta", 220)])
+
+    summary = await get_state_summary(months=12, date_from=None, date_to=None, conn=db)
+    assert [(row['state'], row['tenders']) for row in summary['states']] == [("CA", 2)]
+
+    rankings = await get_firm_rankings(
+        "ca", months=12, date_from=None, date_to=None,
+        order_by='win_rate', min_bids=1, limit=50, conn=db
+    )
+    assert rankings['state'] == "CA"
+    assert [(firm['firm_id'], firm['bids'], firm['wins']) for firm in rankings['firms']] == [
+        ("acme", 2, 2), ("beta", 2, 0)
+    ]
@@ -0,0 +1,175 @@
+"""Reference counting of content-addressed blobs (worker/utils/blob_index.py, storage.py)"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from utils.blob_index import BlobIndex
+from utils.storage import LAYOUT_CONTENT_ADDRESSED, StorageManager
+
+CRAWL_DAY = datetime(2026, 1, 15, 9, 30)
+HTML = "text/html"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return StorageManager(str(tmp_path), layout=LAYOUT_CONTENT_ADDRESSED, use_manifest=False)
+
+
+async def blob_row(db, path):
+    return await db.fetchrow("SELECT * FROM storage_blobs WHERE path = $1", path)
+
+
+async def ref_path(db, url, crawl_date=CRAWL_DAY):
+    return await db.fetchval("""
+        SELECT b.path FROM storage_refs r JOIN storage_blobs b ON b.sha256 = r.sha256
+        WHERE r.url = $1 AND r.crawl_date = $2
+    """, url, crawl_date.date())
+
+
+def stored(storage, path):
+    return storage.backend.path_for(path).exists()
+
+
+async def test_identical_content_is_stored_once(db, storage):
+    first = await storage.save_content(b"<p>same</p>", "https://a.example/1", HTML, CRAWL_DAY)
+    second = await storage.save_content(b"<p>same</p>", "https://b.example/2", HTML, CRAWL_DAY)
+
+    assert first == second
+    assert (await blob_row(db, first))['ref_count'] == 2
+
+    assert await storage.delete_content(first, "https://a.example/1", CRAWL_DAY) is False
+    assert stored(storage, first)
+    assert (await blob_row(db, first))['ref_count'] == 1
+
+    assert await storage.delete_content(first, "https://b.example/2", CRAWL_DAY) is True
+    assert not stored(storage, first)
+    assert await blob_row(db, first) is None
+
+
+async def test_saving_the_same_reference_twice_counts_once(db, storage):
+    path = await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+    await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+
+    assert (await blob_row(db, path))['ref_count'] == 1
+
+
+async def test_same_day_recrawl_purges_the_replaced_blob(db, storage):
+    old = await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+    new = await storage.save_content(b"<p>v2</p>", "https://a.example/", HTML, CRAWL_DAY)
+
+    assert old != new
+    assert not stored(storage, old)
+    assert await blob_row(db, old) is None
+    assert stored(storage, new)
+    assert await ref_path(db, "https://a.example/") == new
+
+
+async def test_releasing_a_replaced_blob_keeps_the_current_one(db, storage):
+    # The pruned row's blob is still shared by another URL, the pruned URL's
+    # reference already moved to a newer blob the same day
+    old = await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+    await storage.save_content(b"<p>v1</p>", "https://b.example/", HTML, CRAWL_DAY)
+    new = await storage.save_content(b"<p>v2</p>", "https://a.example/", HTML, CRAWL_DAY)
+
+    assert await storage.delete_content(old, "https://a.example/", CRAWL_DAY) is False
+
+    assert (await blob_row(db, old))['ref_count'] == 1
+    assert (await blob_row(db, new))['ref_count'] == 1
+    assert stored(storage, old) and stored(storage, new)
+    assert await ref_path(db, "https://a.example/") == new
+
+
+async def test_purge_skips_a_blob_referenced_again(db, storage):
+    path = await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+    index = BlobIndex()
+    blob = await blob_row(db, path)
+
+    # Released but not purged yet (e.g. the releasing worker crashed)
+    assert await index.release(blob['sha256'], "https://a.example/", CRAWL_DAY.date()) == path
+    await storage.save_content(b"<p>v1</p>", "https://b.example/", HTML, CRAWL_DAY)
+
+    deleted = []
+
+    async def delete(blob_path):
+        deleted.append(blob_path)
+
+    assert await index.purge(blob['sha256'], delete) is False
+    assert deleted == []
+    assert (await blob_row(db, path))['ref_count'] == 1
+
+
+async def test_unreferenced_blobs_are_purged_later(db, storage):
+    path = await storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY)
+    blob = await blob_row(db, path)
+    await BlobIndex().release(blob['sha256'], "https://a.example/", CRAWL_DAY.date())
+
+    assert await storage.purge_unreferenced_blobs() == 1
+    assert not stored(storage, path)
+    assert await blob_row(db, path) is None
+
+
+async def test_concurrent_saves_share_one_blob(db, storage):
+    urls = [f"https://a.example/{i}" for i in range(20)]
+    paths = await asyncio.gather(*(
+        storage.save_content(b"<p>shared</p>", url, HTML, CRAWL_DAY) for url in urls
+    ))
+
+    assert len(set(paths)) == 1
+    assert stored(storage, paths[0])
+    assert (await blob_row(db, paths[0]))['ref_count'] == len(urls)
+
+
+async def test_save_racing_the_last_release_keeps_the_file(db, storage):
+    for i in range(20):
+        day = datetime(2026, 1, 1 + i)
+        path = await storage.save_content(b"<p>raced</p>", "https://a.example/", HTML, day)
+
+        await asyncio.gather(
+            storage.delete_content(path, "https://a.example/", day),
+            storage.save_content(b"<p>raced</p>", "https://b.example/", HTML, day),
+        )
+
+        assert stored(storage, path)
+        assert (await blob_row(db, path))['ref_count'] == 1
+        assert await storage.delete_content(path, "https://b.example/", day) is True
+
+
+async def test_compression_change_reuses_the_stored_blob(db, tmp_path):
+    pytest.importorskip("zstandard")
+    compressed = StorageManager(str(tmp_path), layout=LAYOUT_CONTENT_ADDRESSED,
+                                html_compression="zstd", use_manifest=False)
+    plain = StorageManager(str(tmp_path), layout=LAYOUT_CONTENT_ADDRESSED, use_manifest=False)
+
+    first = await compressed.save_content(b"<p>same</p>", "https://a.example/", HTML, CRAWL_DAY)
+    second = await plain.save_content(b"<p>same</p>", "https://b.example/", HTML, CRAWL_DAY)
+
+    assert first == second and first.endswith(".html.zst")
+    assert not stored(plain, first[:-len(".zst")])
+    assert (await blob_row(db, first))['ref_count'] == 2
+    assert await plain.delete_content(first, "https://a.example/", CRAWL_DAY) is False
+    assert await plain.delete_content(first, "https://b.example/", CRAWL_DAY) is True
+    assert not stored(plain, first)
+
+
+async def test_concurrent_first_saves_of_a_url_share_one_reference(db, storage):
+    paths = await asyncio.gather(*(
+        storage.save_content(b"<p>v1</p>", "https://a.example/", HTML, CRAWL_DAY) for _ in range(10)
+    ))
+
+    assert len(set(paths)) == 1
+    assert (await blob_row(db, paths[0]))['ref_count'] == 1
+    assert await ref_path(db, "https://a.example/") == paths[0]
+
+
+async def test_concurrent_first_saves_with_different_content_keep_one_blob(db, storage):
+    paths = await asyncio.gather(*(
+        storage.save_content(f"<p>v{i}</p>".encode(), "https://a.example/", HTML, CRAWL_DAY)
+        for i in range(10)
+    ))
+
+    current = await ref_path(db, "https://a.example/")
+    assert current in paths
+    assert await db.fetchval("SELECT COUNT(*) FROM storage_blobs") == 1
+    assert (await blob_row(db, current))['ref_count'] == 1
@@ -0,0 +1,111 @@
+"""Token progression of the change feed (api/app/routes/changes.py)"""
+
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.changes import get_change_head, get_changes, parse_token
+
+
+async def changes_since(token, limit=1000):
+    response = await get_changes(since=token, tables=None, limit=limit, include_rows=True, format="json")
+    return json.loads(response.body)
+
+
+async def insert_tender(conn, file_name):
+    return await conn.fetchval(
+        "INSERT INTO tenders (state, file_name) VALUES ('CA', $1) RETURNING id", file_name
+    )
+
+
+def tender_ids(page, op=None):
+    return [c['id'] for c in page['changes'] if c['table'] == 'tenders' and op in (None, c['op'])]
+
+
+async def test_token_moves_past_committed_changes(db):
+    head = (await get_change_head())['token']
+    tender_id = await insert_tender(db, "a.pdf")
+
+    page = await changes_since(head)
+    assert tender_ids(page, 'insert') == [tender_id]
+    assert page['changes'][0]['row']['file_name'] == "a.pdf"
+    assert parse_token(page['next_token']) > parse_token(head)
+
+    again = await changes_since(page['next_token'])
+    assert again['changes'] == []
+    assert parse_token(again['next_token']) >= parse_token(page['next_token'])
+
+
+async def test_open_transaction_holds_the_token_back(db, connect):
+    head = (await get_change_head())['token']
+
+    writer = await connect()
+    transaction = writer.transaction()
+    await transaction.start()
+    slow_id = await insert_tender(writer, "slow.pdf")
+    fast_id = await insert_tender(db, "fast.pdf")
+
+    # fast.pdf committed after slow.pdf's transaction began; handing it out
+    # now would let the token skip slow.pdf once that commits
+    page = await changes_since(head)
+    assert tender_ids(page) == []
+
+    await transaction.commit()
+
+    page = await changes_since(page['next_token'])
+    assert tender_ids(page, 'insert') == [slow_id, fast_id]
+
+
+async def test_full_page_resumes_after_its_last_change(db):
+    head = (await get_change_head())['token']
+    ids = [await insert_tender(db, f"{i}.pdf") for i in range(5)]
+
+    seen = []
+    token = head
+    while True:
+        page = await changes_since(token, limit=2)
+        seen.extend(tender_ids(page))
+        assert parse_token(page['next_token']) >= parse_token(token)
+        token = page['next_token']
+        if not page['has_more']:
+            break
+
+    assert seen == ids
+
+
+async def test_updates_and_deletes_are_reported(db):
+    tender_id = await insert_tender(db, "a.pdf")
+    head = (await get_change_head())['token']
+
+    await db.execute("UPDATE tenders SET title = 'Contract 1' WHERE id = $1", tender_id)
+    await db.execute("UPDATE tenders SET updated_at = CURRENT_TIMESTAMP WHERE id = $1", tender_id)
+    await db.execute("DELETE FROM tenders WHERE id = $1", tender_id)
+
+    page = await changes_since(head)
+    assert [c['op'] for c in page['changes']] == ['update', 'delete']
+    assert all(c['row'] is None for c in page['changes'])
+
+
+async def test_ndjson_stream_ends_with_the_next_token(db):
+    head = (await get_change_head())['token']
+    tender_id = await insert_tender(db, "a.pdf")
+
+    response = await get_changes(since=head, tables="tenders", limit=1000, include_rows=False, format="ndjson")
+    lines = [json.loads(line) async for line in response.body_iterator]
+
+    assert [line['id'] for line in lines[:-1]] == [tender_id]
+    assert lines[-1]['has_more'] is False
+    assert parse_token(lines[-1]['next_token']) > parse_token(head)
+
+
+async def test_pruned_token_must_resync(db):
+    await insert_tender(db, "a.pdf")
+    await db.execute("""
+        UPDATE change_log_horizon SET xid = h.xid, seq = h.seq
+        FROM (SELECT xid, seq FROM change_log ORDER BY xid DESC, seq DESC LIMIT 1) h
+    """)
+
+    with pytest.raises(HTTPException) as error:
+        await changes_since(None)
+    assert error.value.status_code == 410
@@ -0,0 +1,70 @@
+"""Leases of the crawl job queue (api/app/routes/crawl_jobs.py)"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.crawl_job import CrawlJobCreate, CrawlJobUpdate
+from app.routes.crawl_jobs import create_crawl_job, lease_crawl_jobs, update_crawl_job
+
+
+async def create_job(url="https://a.example/"):
+    return await create_crawl_job(CrawlJobCreate(job_id="ignored", url=url))
+
+
+async def expire(db, job_id):
+    await db.execute(
+        "UPDATE crawl_jobs SET locked_until = CURRENT_TIMESTAMP - INTERVAL '1 second' WHERE job_id = $1",
+        job_id
+    )
+
+
+async def test_lease_records_its_owner(db):
+    job = await create_job()
+
+    [leased] = await lease_crawl_jobs(limit=1, worker_id="worker-1")
+    assert leased['job_id'] == job['job_id']
+    assert leased['status'] == 'running'
+    assert leased['locked_by'] == "worker-1"
+    assert leased['attempts'] == 1
+
+    assert await lease_crawl_jobs(limit=1, worker_id="worker-2") == []
+
+
+async def test_expired_lease_is_requeued(db):
+    job = await create_job()
+    await lease_crawl_jobs(limit=1, worker_id="worker-1")
+    await expire(db, job['job_id'])
+
+    [leased] = await lease_crawl_jobs(limit=1, worker_id="worker-2")
+    assert leased['job_id'] == job['job_id']
+    assert leased['locked_by'] == "worker-2"
+    assert leased['attempts'] == 2
+
+
+async def test_exhausted_lease_fails_the_job(db):
+    job = await create_job()
+    await db.execute("UPDATE crawl_jobs SET max_attempts = 1 WHERE job_id = $1", job['job_id'])
+    await lease_crawl_jobs(limit=1, worker_id="worker-1")
+    await expire(db, job['job_id'])
+
+    assert await lease_crawl_jobs(limit=1, worker_id="worker-2") == []
+
+    row = await db.fetchrow("SELECT * FROM crawl_jobs WHERE job_id = $1", job['job_id'])
+    assert row['status'] == 'failed'
+    assert row['completed_at'] is not None
+    assert row['locked_by'] is None
+
+
+async def test_only_the_lease_holder_can_finish_the_job(db):
+    job = await create_job()
+    await lease_crawl_jobs(limit=1, worker_id="worker-1")
+    await expire(db, job['job_id'])
+    await lease_crawl_jobs(limit=1, worker_id="worker-2")
+
+    with pytest.raises(HTTPException) as error:
+        await update_crawl_job(job['job_id'], CrawlJobUpdate(status="failed", worker_id="worker-1"))
+    assert error.value.status_code == 409
+
+    finished = await update_crawl_job(job['job_id'], CrawlJobUpdate(status="completed", worker_id="worker-2"))
+    assert finished['status'] == 'completed'
+    assert finished['locked_by'] is None
@@ -0,0 +1,159 @@
+"""Uploads and leases of the durable PDF ingestion queue (api/app/services/ingestion.py)"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from app.services.ingestion import FileNameConflictError, IngestionWorker, enqueue_ingestion, ingest_stream
+from app.services.pdf_processor import PdfProcessor, incoming_key
+from fruxai_shared.storage_backends import LocalBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalBackend(str(tmp_path))
+
+
+@pytest.fixture
+def make_worker(backend):
+    def make(worker_id):
+        worker = IngestionWorker(PdfProcessor(storage=backend), concurrency=1)
+        worker.worker_id = worker_id
+        return worker
+    return make
+
+
+async def enqueue(name):
+    sha256 = hashlib.sha256(name.encode()).hexdigest()
+    return await enqueue_ingestion("CA", name, f"pdfs/CA/incoming/{sha256}.pdf", sha256)
+
+
+async def chunks(data):
+    yield data
+
+
+async def test_claim_leases_a_job_once(make_worker):
+    queued = await enqueue("a.pdf")
+    worker = make_worker("worker-1")
+
+    job = await worker.claim()
+    assert job['ingestion_id'] == queued['ingestion_id']
+    assert job['status'] == 'processing'
+    assert job['attempts'] == 1
+    assert job['locked_by'] == "worker-1"
+
+    assert await make_worker("worker-2").claim() is None
+
+
+async def test_expired_lease_is_reclaimed(db, make_worker):
+    queued = await enqueue("a.pdf")
+    await make_worker("worker-1").claim()
+
+    # worker-1 died without completing or failing the job
+    await db.execute(
+        "UPDATE pdf_ingestions SET locked_until = CURRENT_TIMESTAMP - INTERVAL '1 second' WHERE id = $1",
+        queued['id']
+    )
+
+    job = await make_worker("worker-2").claim()
+    assert job['ingestion_id'] == queued['ingestion_id']
+    assert job['attempts'] == 2
+    assert job['locked_by'] == "worker-2"
+
+
+async def test_concurrent_claims_never_share_a_job(make_worker):
+    queued = [await enqueue(f"{i}.pdf") for i in range(10)]
+    workers = [make_worker(f"worker-{i}") for i in range(20)]
+
+    jobs = await asyncio.gather(*(worker.claim() for worker in workers))
+    claimed = [job['ingestion_id'] for job in jobs if job]
+
+    assert sorted(claimed) == sorted(row['ingestion_id'] for row in queued)
+
+
+async def test_failed_job_waits_for_its_retry(db, make_worker):
+    await enqueue("a.pdf")
+    worker = make_worker("worker-1")
+    job = await worker.claim()
+
+    await worker.fail(job, "boom")
+
+    row = await db.fetchrow("SELECT * FROM pdf_ingestions WHERE id = $1", job['id'])
+    assert row['status'] == 'pending'
+    assert row['locked_by'] is None
+    assert await worker.claim() is None
+
+
+async def test_final_failure_marks_the_job_failed(db, make_worker):
+    await enqueue("a.pdf")
+    worker = make_worker("worker-1")
+    job = await worker.claim()
+    await db.execute("UPDATE pdf_ingestions SET max_attempts = 1 WHERE id = $1", job['id'])
+
+    await worker.fail({**job, 'max_attempts': 1}, "boom")
+
+    row = await db.fetchrow("SELECT * FROM pdf_ingestions WHERE id = $1", job['id'])
+    assert row['status'] == 'failed'
+    assert row['completed_at'] is not None
+
+
+async def test_exhausted_expired_lease_is_failed_not_reclaimed(db, make_worker):
+    queued = await enqueue("a.pdf")
+    await db.execute("""
+        UPDATE pdf_ingestions SET
+            status = 'processing', attempts = max_attempts, locked_by = 'worker-1',
+            locked_until = CURRENT_TIMESTAMP - INTERVAL '1 second'
+        WHERE id = $1
+    """, queued['id'])
+
+    assert await make_worker("worker-2").claim() is None
+
+    row = await db.fetchrow("SELECT * FROM pdf_ingestions WHERE id = $1", queued['id'])
+    assert row['status'] == 'failed'
+    assert row['locked_by'] is None
+
+
+async def test_expired_worker_cannot_overwrite_the_reclaimed_job(db, make_worker):
+    queued = await enqueue("a.pdf")
+    stale = make_worker("worker-1")
+    stale_job = await stale.claim()
+    await db.execute(
+        "UPDATE pdf_ingestions SET locked_until = CURRENT_TIMESTAMP - INTERVAL '1 second' WHERE id = $1",
+        queued['id']
+    )
+    await make_worker("worker-2").claim()
+
+    await stale.fail(stale_job, "late failure")
+
+    row = await db.fetchrow("SELECT * FROM pdf_ingestions WHERE id = $1", queued['id'])
+    assert row['status'] == 'processing'
+    assert row['locked_by'] == "worker-2"
+    assert row['error_message'] is None
+
+
+async def test_different_pdf_under_a_taken_name_is_rejected(backend):
+    first = await ingest_stream(backend, "CA", "bid.pdf", chunks(b"%PDF-1 first"))
+
+    with pytest.raises(FileNameConflictError):
+        await ingest_stream(backend, "CA", "bid.pdf", chunks(b"%PDF-1 second"))
+
+    second_key = incoming_key("CA", hashlib.sha256(b"%PDF-1 second").hexdigest())
+    assert await backend.read(first['storage_key']) == b"%PDF-1 first"
+    assert not await backend.exists(second_key)
+
+
+async def test_name_is_free_again_after_a_failed_ingestion(db, backend):
+    first = await ingest_stream(backend, "CA", "bid.pdf", chunks(b"%PDF-1 first"))
+    await db.execute("UPDATE pdf_ingestions SET status = 'failed' WHERE id = $1", first['id'])
+
+    second = await ingest_stream(backend, "CA", "bid.pdf", chunks(b"%PDF-1 second"))
+    assert not second['duplicate']
+
+
+async def test_reupload_of_the_same_content_is_a_duplicate(backend):
+    first = await ingest_stream(backend, "CA", "bid.pdf", chunks(b"%PDF-1 same"))
+    second = await ingest_stream(backend, "CA", "renamed.pdf", chunks(b"%PDF-1 same"))
+
+    assert second['duplicate']
+    assert second['ingestion_id'] == first['ingestion_id']
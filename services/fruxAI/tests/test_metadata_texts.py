@@ -0,0 +1,27 @@
+"""Extracted text side table of metadata (api/app/routes/metadata.py)"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.metadata import get_metadata_text, save_extracted_text
+
+
+async def insert_metadata(conn, url="https://a.example/"):
+    return await conn.fetchrow("INSERT INTO metadata (url) VALUES ($1) RETURNING id, created_at", url)
+
+
+async def test_text_is_read_from_the_parents_partition(db):
+    row = await insert_metadata(db)
+    await save_extracted_text(db, row['id'], row['created_at'], "extracted")
+
+    response = await get_metadata_text(row['id'])
+    assert response.body == b"extracted"
+
+
+@pytest.mark.parametrize("with_parent", [True, False])
+async def test_missing_text_is_not_found(db, with_parent):
+    metadata_id = (await insert_metadata(db))['id'] if with_parent else 12345
+
+    with pytest.raises(HTTPException) as error:
+        await get_metadata_text(metadata_id)
+    assert error.value.status_code == 404
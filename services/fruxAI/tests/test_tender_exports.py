@@ -0,0 +1,24 @@
+"""Storage keys of the Markdown table exports (api/app/routes/tenders.py)"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.routes.tenders import download_markdown_table, list_markdown_tables
+
+
+@pytest.mark.parametrize("pdf_stem, table_name", [
+    ("..", "table_1"),
+    ("bid", "../../secrets"),
+    ("bid", "..\\secrets"),
+    ("a/b", "table_1"),
+])
+async def test_path_segments_cannot_leave_the_export_prefix(pdf_stem, table_name):
+    with pytest.raises(HTTPException) as error:
+        await download_markdown_table("CA", pdf_stem, table_name)
+    assert error.value.status_code == 400
+
+
+async def test_table_listing_rejects_a_parent_directory():
+    with pytest.raises(HTTPException) as error:
+        await list_markdown_tables("CA", "..")
+    assert error.value.status_code == 400
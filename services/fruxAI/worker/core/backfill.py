@@ -0,0 +1,205 @@
+"""
+Incremental re-extraction of stored crawl documents.
+
+    python -m core.backfill --name html-parser-v2 --content-type text/html --workers 2 --rate 20
+
+Walks metadata rows in id order, re-reads each row's stored file through
+StorageManager, re-runs HTMLParser/PDFParser in a process pool and writes
+the results back with one bulk UPDATE per batch. The last processed id and
+counters are checkpointed in backfill_runs in the same transaction as the
+batch, so an interrupted run resumes where it stopped when started again
+with the same --name.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from utils.database import get_connection, close_db
+from utils.storage import StorageManager
+from fruxai_shared.backfill_runs import start_run, finish_run
+from parsers.html_parser import HTMLParser
+from parsers.pdf_parser import PDFParser
+
+logger = logging.getLogger(__name__)
+
+# Niceness of pool processes so backfills yield CPU to crawling
+BACKFILL_NICE = int(os.getenv("BACKFILL_NICE", "10"))
+
+# metadata columns rewritten from parser output
+METADATA_FIELDS = (
+    'title', 'description', 'keywords', 'company_name', 'company_website',
+    'company_email', 'company_phone', 'company_address'
+)
+
+_parsers = None
+
+def _init_process():
+    try:
+        os.nice(BACKFILL_NICE)
+    except OSError:
+        pass
+
+def extract_document(content_type: str, content: bytes, url: str) -> Dict[str, Any]:
+    """Run the current parser for a stored document (executes in a pool process)"""
+    global _parsers
+    if _parsers is None:
+        _parsers = (HTMLParser(), PDFParser())
+    html_parser, pdf_parser = _parsers
+
+    if content_type.startswith('application/pdf'):
+        return pdf_parser.parse(content)
+    return html_parser.parse(content, url)
+
+class MetadataBackfill:
+    """Re-extracts metadata rows from their stored files in resumable batches"""
+
+    def __init__(self, name: str, storage_manager: StorageManager,
+                 content_types: Optional[List[str]] = None, batch_size: int = 50,
+                 workers: int = 2, rate: float = 0):
+        self.name = name
+        self.storage = storage_manager
+        self.content_types = content_types or ['text/html', 'application/pdf']
+        self.batch_size = batch_size
+        self.workers = workers
+        self.rate = rate  # documents per second, 0 = unthrottled
+        self.pdf_cache = PDFParser().cache
+
+    async def run(self, reset: bool = False) -> Dict[str, Any]:
+        run = await start_run(get_connection, self.name, 'metadata', {
+            'content_types': self.content_types,
+            'batch_size': self.batch_size,
+            'pdf_parser_version': PDFParser.PARSER_VERSION,
+        }, reset)
+        last_id = run['last_id']
+        if last_id:
+            logger.info(f"Resuming backfill {self.name} after metadata id {last_id}")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process) as pool:
+            while True:
+                started = time.monotonic()
+                rows = await self._next_batch(last_id)
+                if not rows:
+                    break
+
+                results = await asyncio.gather(*(self._extract(pool, row) for row in rows))
+                updates = [(row, result) for row, result in zip(rows, results) if result is not None]
+                last_id = rows[-1]['id']
+
+                await self._apply(updates, last_id, len(rows))
+                logger.info(f"Backfill {self.name}: {len(updates)}/{len(rows)} rows updated up to id {last_id}")
+
+                if self.rate:
+                    await asyncio.sleep(max(0.0, len(rows) / self.rate - (time.monotonic() - started)))
+
+        return await finish_run(get_connection, self.name)
+
+    async def _next_batch(self, last_id: int):
+        async with get_connection() as conn:
+            return await conn.fetch("""
+                SELECT id, url, content_type, local_file_path, created_at
+                FROM metadata
+                WHERE id > $1
+                  AND local_file_path IS NOT NULL
+                  AND content_type LIKE ANY($2::text[])
+                ORDER BY id
+                LIMIT $3
+            """, last_id, [f"{content_type}%" for content_type in self.content_types], self.batch_size)
+
+    async def _extract(self, pool: ProcessPoolExecutor, row) -> Optional[Dict[str, Any]]:
+        content = await self.storage.read_content(row['local_file_path'])
+        if content is None:
+            logger.warning(f"Stored file missing for metadata {row['id']}: {row['local_file_path']}")
+            return None
+
+        is_pdf = row['content_type'].startswith('application/pdf')
+        sha256 = hashlib.sha256(content).hexdigest() if is_pdf else None
+        if is_pdf:
+            cached = await self.pdf_cache.get(sha256)
+            if cached:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(pool, extract_document, row['content_type'], content, row['url'])
+        except Exception as e:
+            logger.error(f"Extraction failed for metadata {row['id']}: {e}")
+            return None
+
+        if 'error' in result:
+            return None
+        if is_pdf:
+            await self.pdf_cache.put(sha256, result)
+        return result
+
+    async def _apply(self, updates: List[tuple], last_id: int, batch_count: int):
+        """Bulk-update metadata and metadata_texts, then advance the checkpoint (one transaction)"""
+        ids = [row['id'] for row, _ in updates]
+        created = [row['created_at'] for row, _ in updates]
+        columns = [[result.get(field) for _, result in updates] for field in METADATA_FIELDS]
+        texts = [result.get('extracted_text') or '' for _, result in updates]
+
+        async with get_connection() as conn:
+            async with conn.transaction():
+                if updates:
+                    await conn.execute(f"""
+                        UPDATE metadata m SET
+                            {', '.join(f'{field} = u.{field}' for field in METADATA_FIELDS)},
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM unnest($1::int[], $2::timestamp[], {', '.join(f'${i + 3}::text[]' for i in range(len(METADATA_FIELDS)))})
+                            AS u(id, created_at, {', '.join(METADATA_FIELDS)})
+                        WHERE m.id = u.id AND m.created_at = u.created_at
+                    """, ids, created, *columns)
+
+                    await conn.execute("""
+                        INSERT INTO metadata_texts (metadata_id, created_at, content, text_length)
+                        SELECT id, created_at, content, length(content)
+                        FROM unnest($1::int[], $2::timestamp[], $3::text[]) AS t(id, created_at, content)
+                        ON CONFLICT (metadata_id, created_at) DO UPDATE SET
+                            content = EXCLUDED.content,
+                            text_length = EXCLUDED.text_length,
+                            updated_at = CURRENT_TIMESTAMP
+                    """, ids, created, texts)
+
+                await conn.execute("""
+                    UPDATE backfill_runs SET
+                        last_id = $2,
+                        processed = processed + $3,
+                        updated = updated + $4,
+                        failed = failed + $3 - $4,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE name = $1
+                """, self.name, last_id, batch_count, len(updates))
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-extract stored crawl documents into metadata")
+    parser.add_argument("--name", required=True, help="Checkpoint name; rerun with the same name to resume")
+    parser.add_argument("--content-type", action="append", dest="content_types",
+                        help="Content type prefix to include (repeatable, default: HTML and PDF)")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2, help="Extraction processes")
+    parser.add_argument("--rate", type=float, default=0, help="Max documents per second (0 = unthrottled)")
+    parser.add_argument("--reset", action="store_true", help="Discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    backfill = MetadataBackfill(
+        args.name,
+        StorageManager(os.getenv("STORAGE_PATH", "/app/storage")),
+        content_types=args.content_types,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        rate=args.rate,
+    )
+    try:
+        summary = await backfill.run(reset=args.reset)
+        logger.info(f"Backfill finished: {summary}")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@ import asyncio
 import aiohttp
 import json
 import logging
+import socket
 from typing import Dict, Any, Optional
 import os
 from dotenv import load_dotenv
@@ -15,6 +16,8 @@ class QueueManager:
         self.session: Optional[aiohttp.ClientSession] = None
         self.running = False
         self.poll_interval = 5  # seconds
+        # Lease owner; updates from a worker whose lease expired are rejected (409)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
 
     async def start(self):
         """Start the queue manager"""
@@ -30,15 +33,18 @@ class QueueManager:
         logger.info("Queue manager stopped")
 
     async def get_next_job(self) -> Optional[Dict[str, Any]]:
-        """Get next pending job from the API"""
+        """Lease the highest-priority pending job (the API marks it running)"""
         try:
-            async with self.session.get(f"{self.api_base_url}/crawl-jobs?status=pending&limit=1") as response:
+            async with self.session.post(
+                f"{self.api_base_url}/crawl-jobs/lease",
+                params={"limit": 1, "worker_id": self.worker_id}
+            ) as response:
                 if response.status == 200:
                     jobs = await response.json()
                     if jobs:
                         return jobs[0]
                 else:
-                    logger.warning(f"Failed to fetch jobs: HTTP {response.status}")
+                    logger.warning(f"Failed to lease jobs: HTTP {response.status}")
         except Exception as e:
             logger.error(f"Error fetching next job: {e}")
 
@@ -49,7 +55,8 @@ class QueueManager:
         try:
             update_data = {
                 "status": "completed",
-                "completed_at": None  # Will be set to current timestamp by API
+                "completed_at": None,  # Will be set to current timestamp by API
+                "worker_id": self.worker_id
             }
 
             async with self.session.put(
@@ -57,7 +64,9 @@ class QueueManager:
                 json=update_data,
                 headers={"Content-Type": "application/json"}
             ) as response:
-                if response.status != 200:
+                if response.status == 409:
+                    logger.warning(f"Lease on job {job_id} expired and it was requeued; not marking it completed")
+                elif response.status != 200:
                     logger.error(f"Failed to mark job {job_id} as completed: HTTP {response.status}")
                 else:
                     logger.info(f"Job {job_id} marked as completed")
@@ -70,7 +79,8 @@ class QueueManager:
             update_data = {
                 "status": "failed",
                 "error_message": error_message,
-                "completed_at": None
+                "completed_at": None,
+                "worker_id": self.worker_id
             }
 
             async with self.session.put(
@@ -78,7 +88,9 @@ class QueueManager:
                 json=update_data,
                 headers={"Content-Type": "application/json"}
             ) as response:
-                if response.status != 200:
+                if response.status == 409:
+                    logger.warning(f"Lease on job {job_id} expired and it was requeued; not marking it failed")
+                elif response.status != 200:
                     logger.error(f"Failed to mark job {job_id} as failed: HTTP {response.status}")
                 else:
                     logger.info(f"Job {job_id} marked as failed: {error_message}")
@@ -109,7 +121,7 @@ class QueueManager:
     async def update_job_status(self, job_id: str, status: str, **kwargs):
         """Update job status with additional fields"""
         try:
-            update_data = {"status": status}
+            update_data = {"status": status, "worker_id": self.worker_id}
             update_data.update(kwargs)
 
             async with self.session.put(
@@ -130,10 +142,6 @@ class QueueManager:
             try:
                 job = await self.get_next_job()
                 if job:
-                    # Update job status to running
-                    await self.update_job_status(job['job_id'], 'running')
-
-                    # Return job for processing
                     return job
                 else:
                     await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,423 @@
+import os
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from utils.database import get_connection
+from fruxai_shared.extraction_cache import ExtractionCache
+from fruxai_shared.partitions import (
+    add_months, month_start, is_partitioned, ensure_upcoming_partitions,
+    list_partitions, detach_partition, list_expired
+)
+from parsers.pdf_parser import PDFParser
+from utils.storage import StorageManager, ARCHIVES, ARCHIVE_MEMBER_SEPARATOR, BLOBS, HTMLS
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RetentionPolicy:
+    """Retention rules for one content type (matched as a prefix of metadata.content_type)"""
+    content_type: str
+    keep_versions: int  # latest N metadata rows per URL are always kept
+    max_age_days: Optional[int] = None  # older non-latest versions are removed
+    archive_after_days: Optional[int] = None  # pack kept snapshots older than this
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    """Optional day threshold from the environment; 0 disables it"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value) if int(value) > 0 else None
+
+DEFAULT_POLICIES = [
+    RetentionPolicy(
+        content_type='text/html',
+        keep_versions=int(os.getenv("RETENTION_HTML_KEEP_VERSIONS", "3")),
+        max_age_days=_env_int("RETENTION_HTML_MAX_AGE_DAYS", 90),
+        archive_after_days=_env_int("RETENTION_HTML_ARCHIVE_AFTER_DAYS", 14),
+    ),
+    RetentionPolicy(
+        content_type='application/pdf',
+        keep_versions=int(os.getenv("RETENTION_PDF_KEEP_VERSIONS", "5")),
+        max_age_days=_env_int("RETENTION_PDF_MAX_AGE_DAYS", None),
+    ),
+]
+
+def _file_reference(row) -> tuple:
+    """
+    What a metadata row holds on its file: the path itself, or for a
+    content-addressed blob the (url, crawl day) reference to it, since the
+    same blob is shared by every day and URL that fetched identical bytes.
+    """
+    path = row['local_file_path']
+    if path and path.startswith(f"{BLOBS}/"):
+        return (path, row['url'], row['created_at'].date())
+    return (path,)
+
+class RetentionService:
+    """
+    Incremental retention for crawl storage and metadata history.
+
+    Every run works in bounded batches: prune old versions per URL (files and
+    metadata rows together), pack old HTML snapshots into tar.gz archives and
+    repoint metadata.local_file_path at the archive member, then drop finished
+    crawl_jobs rows that no longer have metadata.
+
+    On partitioned tables whole months are retired instead of deleted row by
+    row: upcoming partitions are created ahead, metadata months older than
+    RETENTION_METADATA_MAX_AGE_MONTHS are detached and dropped once their files
+    are released, and crawl_jobs months past the job age limit are dropped
+    when none of their jobs is unfinished or still referenced. Change feed
+    entries older than RETENTION_CHANGE_LOG_MAX_AGE_DAYS are pruned.
+    """
+
+    def __init__(self, storage_manager: StorageManager, policies: Optional[List[RetentionPolicy]] = None):
+        self.storage = storage_manager
+        self.policies = policies or DEFAULT_POLICIES
+        self.batch_size = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+        self.max_batches = int(os.getenv("RETENTION_MAX_BATCHES_PER_RUN", "10"))
+        self.interval = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+        self.job_max_age_days = _env_int("RETENTION_CRAWL_JOB_MAX_AGE_DAYS", 180)
+        self.metadata_max_age_months = _env_int("RETENTION_METADATA_MAX_AGE_MONTHS", None)
+        self.change_log_max_age_days = _env_int("RETENTION_CHANGE_LOG_MAX_AGE_DAYS", 30)
+        # Next prune_versions window starts after this url, per content type
+        self.prune_cursors: Dict[str, str] = {}
+        self.running = False
+
+        if self.storage.blob_index and any(policy.archive_after_days for policy in self.policies):
+            logger.info(
+                "Snapshot archiving only packs legacy htmls/ files; content-addressed blobs are "
+                "already deduplicated (and zstd-compressed with STORAGE_HTML_COMPRESSION=zstd)"
+            )
+
+    async def run_forever(self):
+        """Run retention periodically until stopped"""
+        self.running = True
+        while self.running:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+
+    async def run_once(self) -> Dict[str, int]:
+        """One bounded retention pass"""
+        totals = {'versions_pruned': 0, 'files_archived': 0, 'crawl_jobs_deleted': 0, 'cache_entries_purged': 0}
+        totals['partitions_dropped'] = await self.maintain_partitions()
+
+        for policy in self.policies:
+            for _ in range(self.max_batches):
+                pruned, finished = await self.prune_versions(policy)
+                totals['versions_pruned'] += pruned
+                if finished:
+                    break
+
+            if policy.archive_after_days:
+                for _ in range(self.max_batches):
+                    archived = await self.archive_snapshots(policy)
+                    totals['files_archived'] += archived
+                    if archived < self.batch_size:
+                        break
+
+        if self.job_max_age_days:
+            for _ in range(self.max_batches):
+                deleted = await self.prune_crawl_jobs()
+                totals['crawl_jobs_deleted'] += deleted
+                if deleted < self.batch_size:
+                    break
+
+        if self.change_log_max_age_days:
+            totals['changes_pruned'] = 0
+            for _ in range(self.max_batches):
+                pruned = await self.prune_change_log()
+                totals['changes_pruned'] += pruned
+                if pruned < self.batch_size:
+                    break
+
+        if self.storage.blob_index:
+            totals['blobs_purged'] = await self.storage.purge_unreferenced_blobs(self.batch_size)
+
+        # Cache entries of superseded parser versions can never be hit again
+        totals['cache_entries_purged'] = await ExtractionCache(
+            PDFParser.PARSER_NAME, PDFParser.PARSER_VERSION, get_connection
+        ).purge_stale()
+
+        logger.info(f"Retention run finished: {totals}")
+        return totals
+
+    async def prune_versions(self, policy: RetentionPolicy) -> Tuple[int, bool]:
+        """
+        Delete metadata rows (and their files) beyond the policy's version/age
+        limits for the next window of batch_size URLs. Windows advance by url
+        across calls, so no call ranks the whole table; returns (rows pruned,
+        whether the sweep reached the last url and starts over next time).
+        """
+        age_cutoff = (datetime.now() - timedelta(days=policy.max_age_days)) if policy.max_age_days else None
+        cursor = self.prune_cursors.get(policy.content_type, '')
+
+        async with get_connection() as conn:
+            urls = [row['url'] for row in await conn.fetch("""
+                SELECT DISTINCT url FROM metadata
+                WHERE url > $2 AND content_type LIKE $1 || '%'
+                ORDER BY url
+                LIMIT $3
+            """, policy.content_type, cursor, self.batch_size)]
+            if not urls:
+                self.prune_cursors[policy.content_type] = ''
+                return 0, True
+
+            rows = await conn.fetch("""
+                WITH ranked AS (
+                    SELECT id, url, local_file_path, created_at,
+                           ROW_NUMBER() OVER (PARTITION BY url ORDER BY created_at DESC, id DESC) AS version
+                    FROM metadata
+                    WHERE url = ANY($1::text[]) AND content_type LIKE $2 || '%'
+                )
+                SELECT id, url, local_file_path, created_at
+                FROM ranked
+                WHERE version > $3
+                   OR (version > 1 AND $4::timestamp IS NOT NULL AND created_at < $4::timestamp)
+                ORDER BY url, id
+                LIMIT $5
+            """, urls, policy.content_type, policy.keep_versions, age_cutoff, self.batch_size)
+
+            if len(rows) < self.batch_size:
+                self.prune_cursors[policy.content_type] = urls[-1]
+            else:
+                # The last url may have more versions to prune; resume at it
+                done = [row['url'] for row in rows if row['url'] < rows[-1]['url']]
+                if done:
+                    self.prune_cursors[policy.content_type] = done[-1]
+
+            if not rows:
+                return 0, False
+
+            ids = [row['id'] for row in rows]
+
+            # Files still referenced by surviving rows (same-day recrawls share a path)
+            shared = await conn.fetch("""
+                SELECT DISTINCT local_file_path, url, created_at FROM metadata
+                WHERE local_file_path = ANY($1::text[]) AND NOT (id = ANY($2::int[]))
+            """, [row['local_file_path'] for row in rows if row['local_file_path']], ids)
+            in_use = {_file_reference(row) for row in shared}
+
+            async with conn.transaction():
+                await conn.execute("""
+                    DELETE FROM metadata_texts
+                    WHERE (metadata_id, created_at) IN (
+                        SELECT * FROM unnest($1::int[], $2::timestamp[])
+                    )
+                """, ids, [row['created_at'] for row in rows])
+                # (id, created_at) pairs let each delete go to its partition
+                await conn.execute("""
+                    DELETE FROM metadata
+                    WHERE (id, created_at) IN (
+                        SELECT * FROM unnest($1::int[], $2::timestamp[])
+                    )
+                """, ids, [row['created_at'] for row in rows])
+
+        # Rows are gone first so a crash never leaves metadata pointing at a deleted file
+        await self.release_files(rows, in_use)
+
+        logger.info(f"Pruned {len(rows)} {policy.content_type} versions")
+        return len(rows), False
+
+    async def archive_snapshots(self, policy: RetentionPolicy) -> int:
+        """
+        Pack old loose snapshot files into one archive and repoint metadata at it.
+        Only legacy-layout htmls/ files are packed: a blob is shared through
+        storage_blobs ref counts, so it stays a single deduplicated file.
+        """
+        cutoff = datetime.now() - timedelta(days=policy.archive_after_days)
+
+        async with get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT DISTINCT local_file_path
+                FROM metadata
+                WHERE content_type LIKE $1 || '%'
+                  AND created_at < $2
+                  AND local_file_path LIKE $3
+                  AND position($4 in local_file_path) = 0
+                LIMIT $5
+            """, policy.content_type, cutoff, f"{HTMLS}/%", ARCHIVE_MEMBER_SEPARATOR, self.batch_size)
+
+        paths = [row['local_file_path'] for row in rows]
+        if not paths:
+            return 0
+
+        archive_key = f"{ARCHIVES}/{HTMLS}/{datetime.now():%Y/%m}/{uuid.uuid4().hex}.tar.gz"
+        references = await self.storage.pack_archive(paths, archive_key)
+
+        async with get_connection() as conn:
+            await conn.executemany("""
+                UPDATE metadata SET local_file_path = $2, updated_at = CURRENT_TIMESTAMP
+                WHERE local_file_path = $1
+            """, list(references.items()))
+
+        for path in references:
+            await self.storage.delete_content(path)
+
+        # Paths whose file was already missing: drop the dangling reference
+        missing = [path for path in paths if path not in references]
+        await self.storage.detach_references(missing)
+
+        return len(paths)
+
+    async def prune_crawl_jobs(self) -> int:
+        """Delete finished crawl_jobs rows past the age limit that have no metadata left"""
+        cutoff = datetime.now() - timedelta(days=self.job_max_age_days)
+        async with get_connection() as conn:
+            deleted = await conn.fetchval("""
+                WITH doomed AS (
+                    DELETE FROM crawl_jobs
+                    WHERE id IN (
+                        SELECT cj.id FROM crawl_jobs cj
+                        WHERE cj.status IN ('completed', 'failed', 'cancelled')
+                          AND cj.created_at < $1
+                          AND NOT EXISTS (SELECT 1 FROM metadata m WHERE m.crawl_job_id = cj.id)
+                        LIMIT $2
+                    )
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM doomed
+            """, cutoff, self.batch_size)
+        return deleted
+
+    async def prune_change_log(self) -> int:
+        """
+        Delete the oldest change feed entries past the age limit, in feed
+        order, and advance change_log_horizon so /changes answers 410 to
+        tokens that fall behind it.
+        """
+        cutoff = datetime.now() - timedelta(days=self.change_log_max_age_days)
+        async with get_connection() as conn:
+            if not await conn.fetchval("SELECT to_regclass('change_log') IS NOT NULL"):
+                return 0
+            deleted = await conn.fetchval("""
+                WITH doomed AS (
+                    DELETE FROM change_log
+                    WHERE seq IN (
+                        SELECT seq FROM change_log
+                        WHERE changed_at < $1
+                        ORDER BY xid, seq
+                        LIMIT $2
+                    )
+                    RETURNING xid, seq
+                ),
+                horizon AS (
+                    UPDATE change_log_horizon h SET xid = last.xid, seq = last.seq
+                    FROM (SELECT xid, seq FROM doomed ORDER BY xid DESC, seq DESC LIMIT 1) last
+                    WHERE (last.xid, last.seq) > (h.xid, h.seq)
+                )
+                SELECT COUNT(*) FROM doomed
+            """, cutoff, self.batch_size)
+        return deleted
+
+    async def maintain_partitions(self) -> int:
+        """Create upcoming monthly partitions and retire expired months"""
+        async with get_connection() as conn:
+            if not await is_partitioned(conn, 'metadata'):
+                return 0
+            await ensure_upcoming_partitions(conn)
+
+        dropped = 0
+        if self.metadata_max_age_months:
+            dropped += await self.expire_metadata_partitions()
+        if self.job_max_age_days:
+            dropped += await self.drop_crawl_job_partitions()
+        return dropped
+
+    async def expire_metadata_partitions(self) -> int:
+        """Detach metadata months past the age limit, release their files, then drop them"""
+        cutoff = add_months(month_start(date.today()), -self.metadata_max_age_months)
+
+        async with get_connection() as conn:
+            async with conn.transaction():
+                # Texts have no files; their months are dropped right away
+                for name, month in await list_partitions(conn, 'metadata_texts'):
+                    if month < cutoff:
+                        await detach_partition(conn, 'metadata_texts', name, drop=True)
+                for name, month in await list_partitions(conn, 'metadata'):
+                    if month < cutoff:
+                        await detach_partition(conn, 'metadata', name)
+            expired = await list_expired(conn, 'metadata')
+
+        dropped = 0
+        for name in expired:
+            if await self.release_expired(name):
+                async with get_connection() as conn:
+                    await conn.execute(f"DROP TABLE {name}")
+                logger.info(f"Dropped expired metadata partition {name}")
+                dropped += 1
+        return dropped
+
+    async def release_expired(self, table: str) -> bool:
+        """Release the stored files of a detached metadata month; True once it is empty"""
+        for _ in range(self.max_batches):
+            async with get_connection() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT id, url, local_file_path, created_at FROM {table}
+                    ORDER BY id
+                    LIMIT $1
+                """, self.batch_size)
+                if not rows:
+                    return True
+
+                # Files still referenced by live rows (archives can span months)
+                shared = await conn.fetch("""
+                    SELECT DISTINCT local_file_path, url, created_at FROM metadata
+                    WHERE local_file_path = ANY($1::text[])
+                """, [row['local_file_path'] for row in rows if row['local_file_path']])
+                in_use = {_file_reference(row) for row in shared}
+
+                await conn.execute(f"DELETE FROM {table} WHERE id = ANY($1::int[])", [row['id'] for row in rows])
+
+            await self.release_files(rows, in_use)
+        return False
+
+    async def release_files(self, rows, in_use: set):
+        """Delete (or release, for blobs) the files of deleted metadata rows unless still in use"""
+        released = set()
+        for row in rows:
+            path = row['local_file_path']
+            reference = _file_reference(row)
+            if not path or reference in in_use or reference in released:
+                continue
+            released.add(reference)
+            try:
+                await self.storage.delete_content(path, row['url'], row['created_at'])
+            except Exception as e:
+                logger.warning(f"Failed to delete {path}: {e}")
+
+    async def drop_crawl_job_partitions(self) -> int:
+        """Drop crawl_jobs months past the age limit when no job in them is unfinished or referenced"""
+        cutoff = (datetime.now() - timedelta(days=self.job_max_age_days)).date()
+        dropped = 0
+        async with get_connection() as conn:
+            for name, month in await list_partitions(conn, 'crawl_jobs'):
+                if add_months(month, 1) > cutoff:
+                    break
+                busy = await conn.fetchval(f"""
+                    SELECT EXISTS (
+                        SELECT 1 FROM {name} cj
+                        WHERE cj.status NOT IN ('completed', 'failed', 'cancelled')
+                           OR EXISTS (SELECT 1 FROM metadata m WHERE m.crawl_job_id = cj.id)
+                    )
+                """)
+                if busy:
+                    continue
+                async with conn.transaction():
+                    # DROP fires no delete triggers: free the month's job_ids here
+                    await conn.execute(f"""
+                        DELETE FROM crawl_job_ids i USING {name} cj
+                        WHERE i.job_id = cj.job_id AND i.created_at = cj.created_at
+                    """)
+                    await detach_partition(conn, 'crawl_jobs', name, drop=True)
+                logger.info(f"Dropped crawl_jobs partition {name}")
+                dropped += 1
+        return dropped
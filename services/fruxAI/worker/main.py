@@ -10,6 +10,8 @@ import os
 from dotenv import load_dotenv
 from core.crawler import Crawler
 from core.queue_manager import QueueManager
+from core.retention import RetentionService
+from utils.database import close_db
 from utils.metrics import MetricsCollector
 
 load_dotenv()
@@ -19,6 +21,7 @@ logger = logging.getLogger(__name__)
 async def main():
     """Main worker function"""
     logger.info("Starting fruxAI Crawler Worker...")
+    retention_task = None
 
     try:
         # Initialize components
@@ -32,6 +35,11 @@ async def main():
         # Start queue processing
         await queue_manager.start()
 
+        # Storage/metadata retention runs alongside crawling
+        if os.getenv("RETENTION_ENABLED", "true").lower() in ("1", "true", "yes"):
+            retention = RetentionService(crawler.storage_manager)
+            retention_task = asyncio.create_task(retention.run_forever())
+
         # Main processing loop
         while True:
             try:
@@ -65,8 +73,11 @@ async def main():
         raise
     finally:
         # Cleanup
+        if retention_task:
+            retention_task.cancel()
         await metrics.stop()
         await queue_manager.stop()
+        await close_db()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,4 +1,5 @@
 import re
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 from bs4 import BeautifulSoup
@@ -14,6 +15,11 @@ class HTMLParser:
 
     async def extract_metadata(self, content: bytes, url: str) -> Dict[str, Any]:
         """Extract metadata from HTML content"""
+        # BeautifulSoup parsing is CPU-bound, keep it off the event loop
+        return await asyncio.to_thread(self.parse, content, url)
+
+    def parse(self, content: bytes, url: str) -> Dict[str, Any]:
+        """Synchronous extraction; also used by the backfill process pool"""
         try:
             text_content = content.decode('utf-8', errors='ignore')
             soup = BeautifulSoup(text_content, 'html.parser')
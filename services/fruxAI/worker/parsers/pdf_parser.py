@@ -1,19 +1,43 @@
 import pdfplumber
+import asyncio
+import hashlib
 import logging
 from typing import Dict, Any, Optional
 import re
 from io import BytesIO
+from fruxai_shared.extraction_cache import ExtractionCache
+from utils.database import get_connection
 
 logger = logging.getLogger(__name__)
 
 class PDFParser:
+    # Bump PARSER_VERSION whenever the extracted fields change; cached results
+    # of older versions are ignored
+    PARSER_NAME = "worker_pdf_metadata"
+    PARSER_VERSION = "1"
+
     def __init__(self):
+        self.cache = ExtractionCache(self.PARSER_NAME, self.PARSER_VERSION, get_connection)
         self.email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
         self.phone_pattern = re.compile(r'(\+?1?[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})')
         self.url_pattern = re.compile(r'https?://(?:[-\w.])+(?:\:[0-9]+)?(?:/(?:[\w/_.])*(?:\?(?:[\w&=%.])*)?(?:\#(?:\w)*)?)?')
 
     async def extract_metadata(self, content: bytes) -> Dict[str, Any]:
-        """Extract metadata from PDF content"""
+        """Extract metadata from PDF content, reusing cached results for identical bytes"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        cached = await self.cache.get(sha256)
+        if cached:
+            logger.info(f"Extraction cache hit for PDF {sha256}")
+            return cached
+
+        # pdfplumber is blocking, keep it off the event loop
+        metadata = await asyncio.to_thread(self.parse, content)
+        if 'error' not in metadata:
+            await self.cache.put(sha256, metadata)
+        return metadata
+
+    def parse(self, content: bytes) -> Dict[str, Any]:
+        """Synchronous extraction (no cache); also used by the backfill process pool"""
         try:
             with pdfplumber.open(BytesIO(content)) as pdf:
                 metadata = {
@@ -0,0 +1,163 @@
+import logging
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+class BlobIndex:
+    """
+    Reference-counted index of content-addressed blobs.
+
+    storage_blobs holds one row per unique SHA-256, storage_refs maps a
+    (url, crawl_date) pair to the blob it resolved to on that day.
+
+    A blob whose ref_count drops to 0 keeps its row until purge() deletes
+    the file and the row together while holding the row lock, so a
+    concurrent add_reference() either revives it before the purge or
+    recreates it (and rewrites the file) after.
+    """
+
+    async def add_reference(self, sha256: str, path: str, url: str, crawl_date: date,
+                            content_type: str, size_bytes: int, stored_bytes: int,
+                            compression: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Point (url, crawl_date) at a blob, registering it if needed.
+        Returns the blob's path and compression, which are the stored ones
+        when the blob already exists (e.g. written under another compression
+        setting), and the path of the blob previously referenced for that
+        day if it became unreferenced and should be purged.
+        """
+        async with get_connection() as conn:
+            async with conn.transaction():
+                previous = await conn.fetchval("""
+                    SELECT sha256 FROM storage_refs
+                    WHERE url = $1 AND crawl_date = $2
+                    FOR UPDATE
+                """, url, crawl_date)
+
+                if previous == sha256:
+                    return await self._blob(conn, sha256), None
+
+                # Taking the reference locks the blob row, so it waits for
+                # (or blocks) a purge of the same blob. Blobs are keyed by
+                # SHA-256 alone: an existing row keeps its path and format
+                blob = await conn.fetchrow("""
+                    INSERT INTO storage_blobs (
+                        sha256, path, content_type, size_bytes, stored_bytes, compression, ref_count
+                    )
+                    VALUES ($1, $2, $3, $4, $5, $6, 1)
+                    ON CONFLICT (sha256) DO UPDATE SET ref_count = storage_blobs.ref_count + 1
+                    RETURNING path, compression
+                """, sha256, path, content_type, size_bytes, stored_bytes, compression)
+
+                if previous is None:
+                    inserted = await conn.fetchval("""
+                        INSERT INTO storage_refs (url, crawl_date, sha256)
+                        VALUES ($1, $2, $3)
+                        ON CONFLICT (url, crawl_date) DO NOTHING
+                        RETURNING TRUE
+                    """, url, crawl_date, sha256)
+                    if inserted:
+                        return dict(blob), None
+
+                    # A concurrent first save of the same (url, crawl_date) committed in between
+                    previous = await conn.fetchval("""
+                        SELECT sha256 FROM storage_refs
+                        WHERE url = $1 AND crawl_date = $2
+                        FOR UPDATE
+                    """, url, crawl_date)
+                    if previous == sha256:
+                        await conn.execute(
+                            "UPDATE storage_blobs SET ref_count = ref_count - 1 WHERE sha256 = $1",
+                            sha256
+                        )
+                        return dict(blob), None
+
+                await conn.execute("""
+                    UPDATE storage_refs SET sha256 = $3, updated_at = CURRENT_TIMESTAMP
+                    WHERE url = $1 AND crawl_date = $2
+                """, url, crawl_date, sha256)
+                return dict(blob), await self._decrement(conn, previous)
+
+    async def release(self, sha256: str, url: str, crawl_date: date) -> Optional[str]:
+        """
+        Drop the (url, crawl_date) reference if it still points at this blob.
+        Returns the blob path if the blob is unreferenced and should be purged.
+        """
+        async with get_connection() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    "SELECT path, ref_count FROM storage_blobs WHERE sha256 = $1 FOR UPDATE",
+                    sha256
+                )
+                if row is None:
+                    return None
+
+                # A same-day recrawl may have repointed the reference at another blob
+                released = await conn.fetchval("""
+                    DELETE FROM storage_refs
+                    WHERE url = $1 AND crawl_date = $2 AND sha256 = $3
+                    RETURNING TRUE
+                """, url, crawl_date, sha256)
+
+                if released:
+                    return await self._decrement(conn, sha256)
+                return row['path'] if row['ref_count'] <= 0 else None
+
+    async def _blob(self, conn, sha256: str) -> Dict[str, Any]:
+        row = await conn.fetchrow(
+            "SELECT path, compression FROM storage_blobs WHERE sha256 = $1",
+            sha256
+        )
+        return dict(row)
+
+    async def _decrement(self, conn, sha256: str) -> Optional[str]:
+        row = await conn.fetchrow("""
+            UPDATE storage_blobs SET ref_count = ref_count - 1
+            WHERE sha256 = $1
+            RETURNING path, ref_count
+        """, sha256)
+        return row['path'] if row and row['ref_count'] <= 0 else None
+
+    async def purge(self, sha256: str, delete: Callable[[str], Awaitable[None]]) -> bool:
+        """
+        Delete an unreferenced blob's file (through delete) and its row.
+        The row stays locked until the file is gone; returns False if the
+        blob was referenced again in the meantime.
+        """
+        async with get_connection() as conn:
+            async with conn.transaction():
+                path = await conn.fetchval("""
+                    SELECT path FROM storage_blobs
+                    WHERE sha256 = $1 AND ref_count <= 0
+                    FOR UPDATE
+                """, sha256)
+                if path is None:
+                    return False
+
+                await delete(path)
+                await conn.execute("DELETE FROM storage_blobs WHERE sha256 = $1", sha256)
+                return True
+
+    async def unreferenced(self, limit: int) -> List[str]:
+        """SHA-256s of blobs left at ref_count 0 (e.g. by a crash before purge)"""
+        async with get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT sha256 FROM storage_blobs
+                WHERE ref_count <= 0
+                LIMIT $1
+            """, limit)
+            return [row['sha256'] for row in rows]
+
+    async def lookup(self, url: str, crawl_date: date) -> Optional[dict]:
+        """Resolve (url, crawl_date) to its blob row"""
+        async with get_connection() as conn:
+            row = await conn.fetchrow("""
+                SELECT b.sha256, b.path, b.content_type, b.size_bytes,
+                       b.stored_bytes, b.compression, b.ref_count
+                FROM storage_refs r
+                JOIN storage_blobs b ON b.sha256 = r.sha256
+                WHERE r.url = $1 AND r.crawl_date = $2
+            """, url, crawl_date)
+            return dict(row) if row else None
@@ -0,0 +1,66 @@
+import asyncpg
+import os
+import json
+import logging
+from typing import Optional
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+class DatabaseConfig:
+    def __init__(self):
+        self.host = os.getenv("SUPABASE_DB_HOST", "localhost")
+        self.port = int(os.getenv("SUPABASE_DB_PORT", "5432"))
+        self.database = os.getenv("SUPABASE_DB_NAME", "fruxai")
+        self.user = os.getenv("SUPABASE_DB_USER", "postgres")
+        self.password = os.getenv("SUPABASE_DB_PASSWORD", "")
+
+    @property
+    def connection_string(self) -> str:
+        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+
+# Global database config
+db_config = DatabaseConfig()
+
+# Connection pool (tables are created by the API's init_db)
+_pool: Optional[asyncpg.Pool] = None
+
+async def init_connection(conn):
+    """JSON/JSONB values are passed and returned as Python objects (same codecs as the API pool)"""
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(
+            type_name, encoder=lambda value: json.dumps(value, default=str),
+            decoder=json.loads, schema='pg_catalog'
+        )
+
+async def get_pool() -> asyncpg.Pool:
+    """Get or create database connection pool"""
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            db_config.connection_string,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+            command_timeout=float(os.getenv("DB_COMMAND_TIMEOUT", "60")),
+            statement_cache_size=0 if os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes") else 100,
+            init=init_connection,
+        )
+        logger.info("Worker database connection pool created")
+    return _pool
+
+@asynccontextmanager
+async def get_connection():
+    """Get database connection from pool"""
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        yield connection
+
+async def close_db():
+    """Close database connection pool"""
+    global _pool
+    if _pool:
+        await _pool.close()
+        _pool = None
+        logger.info("Worker database connection pool closed")
@@ -1,32 +1,67 @@
+import io
 import os
+import json
+import tarfile
 import hashlib
-import aiofiles
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
+from utils.blob_index import BlobIndex
+from utils.database import get_connection
+from utils.storage_manifest import StorageManifest
+from fruxai_shared.storage_backends import StorageBackend, LocalBackend, get_storage_backend
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for STORAGE_HTML_COMPRESSION=zstd
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+# Storage layouts: "legacy" (domain/YYYY/MM/DD/md5(url)) or "content_addressed"
+LAYOUT_LEGACY = "legacy"
+LAYOUT_CONTENT_ADDRESSED = "content_addressed"
+
+# Top-level key prefixes
+PDFS = "pdfs"
+HTMLS = "htmls"
+METADATA = "metadata"
+BLOBS = "blobs"
+ARCHIVES = "archives"
+
+# References into packed archives look like "archives/....tar.gz#member"
+ARCHIVE_MEMBER_SEPARATOR = "#"
+
 class StorageManager:
-    def __init__(self, base_path: str = "/app/storage"):
-        self.base_path = Path(base_path)
-        self.pdfs_path = self.base_path / "pdfs"
-        self.htmls_path = self.base_path / "htmls"
-        self.metadata_path = self.base_path / "metadata"
+    def __init__(self, base_path: str = "/app/storage", layout: Optional[str] = None,
+                 html_compression: Optional[str] = None, use_manifest: Optional[bool] = None,
+                 backend: Optional[StorageBackend] = None):
+        if backend is None:
+            if os.getenv("STORAGE_BACKEND", "local") == "local":
+                backend = LocalBackend(base_path)
+            else:
+                backend = get_storage_backend()
+        self.backend = backend
+
+        self.layout = layout or os.getenv("STORAGE_LAYOUT", LAYOUT_LEGACY)
+        self.html_compression = html_compression or os.getenv("STORAGE_HTML_COMPRESSION") or None
+        if self.html_compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, HTML blobs will be stored uncompressed")
+            self.html_compression = None
 
-        # Create directories if they don't exist
-        self.pdfs_path.mkdir(parents=True, exist_ok=True)
-        self.htmls_path.mkdir(parents=True, exist_ok=True)
-        self.metadata_path.mkdir(parents=True, exist_ok=True)
+        self.blob_index = BlobIndex() if self.layout == LAYOUT_CONTENT_ADDRESSED else None
+
+        if use_manifest is None:
+            use_manifest = os.getenv("STORAGE_MANIFEST", "true").lower() in ("1", "true", "yes")
+        self.manifest = StorageManifest(self.backend) if use_manifest else None
 
     def _get_file_hash(self, url: str) -> str:
         """Generate a hash for the URL to use as filename"""
         return hashlib.md5(url.encode()).hexdigest()
 
-    def _get_content_directory(self, url: str, crawl_date: Optional[datetime] = None) -> Path:
-        """Get the directory path for storing content based on URL domain and date"""
+    def _get_content_directory(self, url: str, crawl_date: Optional[datetime] = None) -> str:
+        """Get the key prefix for storing content based on URL domain and date"""
         if crawl_date is None:
             crawl_date = datetime.now()
 
@@ -34,41 +69,118 @@ class StorageManager:
         domain = parsed.netloc.replace('.', '_')
         date_str = crawl_date.strftime("%Y/%m/%d")
 
-        return Path(f"{domain}/{date_str}")
+        return f"{domain}/{date_str}"
+
+    def _get_blob_key(self, sha256: str, extension: str) -> str:
+        """Sharded blob key: blobs/ab/cd/<sha256><ext>"""
+        return f"{BLOBS}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+    def _get_blob_sha256(self, relative_path: str) -> str:
+        """Inverse of _get_blob_key"""
+        return os.path.basename(relative_path)[:64]
+
+    async def _track(self, key: str, size_bytes: int):
+        """Record a written object in the manifest; drift is repaired by reconcile()"""
+        if not self.manifest:
+            return
+        try:
+            await self.manifest.record(key, size_bytes, datetime.now())
+        except Exception as e:
+            logger.warning(f"Failed to update storage manifest for {key}: {e}")
+
+    async def _untrack(self, relative_paths: List[str]):
+        """Remove deleted files from the manifest"""
+        if not self.manifest:
+            return
+        try:
+            await self.manifest.remove(relative_paths)
+        except Exception as e:
+            logger.warning(f"Failed to update storage manifest: {e}")
+
+    def _encode(self, content: bytes, compression: Optional[str]) -> bytes:
+        """Blob bytes as stored with the given compression"""
+        if compression == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to write compressed blobs")
+            return zstandard.ZstdCompressor(level=10).compress(content)
+        return content
+
+    async def save_blob(self, content: bytes, url: str, content_type: str, crawl_date: Optional[datetime] = None) -> str:
+        """Save content by SHA-256; identical bytes are stored once and reference counted"""
+        if crawl_date is None:
+            crawl_date = datetime.now()
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        if content_type.startswith('application/pdf'):
+            extension = '.pdf'
+        elif content_type.startswith('text/html'):
+            extension = '.html'
+        else:
+            extension = self._guess_extension(content_type)
+
+        compression = None
+        if self.html_compression == "zstd" and content_type.startswith('text/html'):
+            compression = "zstd"
+            extension += ".zst"
+        stored = self._encode(content, compression)
+
+        # Reference first: once it is committed no purge can remove the file,
+        # so a file deleted by an earlier purge is noticed and written again
+        blob, orphan_path = await self.blob_index.add_reference(
+            sha256, self._get_blob_key(sha256, extension), url, crawl_date.date(), content_type,
+            len(content), len(stored), compression
+        )
+
+        # A blob stored before the compression setting changed keeps its path and format
+        relative_path = blob['path']
+        written = False
+        if await self.backend.stat(relative_path) is None:
+            if blob['compression'] != compression:
+                stored = self._encode(content, blob['compression'])
+            stored_bytes = await self.backend.write(relative_path, stored)
+            await self._track(relative_path, stored_bytes)
+            written = True
+
+        if orphan_path:
+            # Same-day recrawl with new content: earlier rows follow the day's snapshot
+            await self.repoint_references(orphan_path, relative_path)
+            await self.purge_blob(orphan_path)
+
+        logger.info(f"Blob {'saved' if written else 'deduplicated'}: {url} -> {relative_path}")
+        return relative_path
 
     async def save_content(self, content: bytes, url: str, content_type: str, crawl_date: Optional[datetime] = None) -> str:
         """Save content to appropriate storage location"""
+        if self.blob_index:
+            try:
+                return await self.save_blob(content, url, content_type, crawl_date)
+            except Exception as e:
+                logger.error(f"Failed to save blob for {url}: {e}")
+                raise
+
         try:
             # Determine storage path based on content type
             if content_type.startswith('application/pdf'):
-                base_dir = self.pdfs_path
+                base_dir = PDFS
                 extension = '.pdf'
             elif content_type.startswith('text/html'):
-                base_dir = self.htmls_path
+                base_dir = HTMLS
                 extension = '.html'
             else:
                 # For other content types, save to metadata directory
-                base_dir = self.metadata_path
+                base_dir = METADATA
                 extension = self._guess_extension(content_type)
 
-            # Create content directory
-            content_dir = base_dir / self._get_content_directory(url, crawl_date)
-            content_dir.mkdir(parents=True, exist_ok=True)
-
-            # Generate filename
+            # Generate key
             file_hash = self._get_file_hash(url)
-            filename = f"{file_hash}{extension}"
-            file_path = content_dir / filename
+            relative_path = f"{base_dir}/{self._get_content_directory(url, crawl_date)}/{file_hash}{extension}"
 
             # Save content
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
-
-            # Return relative path from storage root
-            relative_path = file_path.relative_to(self.base_path)
+            size_bytes = await self.backend.write(relative_path, content)
+            await self._track(relative_path, size_bytes)
 
             logger.info(f"Content saved: {url} -> {relative_path}")
-            return str(relative_path)
+            return relative_path
 
         except Exception as e:
             logger.error(f"Failed to save content for {url}: {e}")
@@ -77,20 +189,15 @@ class StorageManager:
     async def save_metadata_file(self, metadata: dict, url: str, crawl_date: Optional[datetime] = None) -> str:
         """Save metadata as JSON file"""
         try:
-            content_dir = self.metadata_path / self._get_content_directory(url, crawl_date)
-            content_dir.mkdir(parents=True, exist_ok=True)
-
             file_hash = self._get_file_hash(url)
-            filename = f"{file_hash}_metadata.json"
-            file_path = content_dir / filename
+            relative_path = f"{METADATA}/{self._get_content_directory(url, crawl_date)}/{file_hash}_metadata.json"
 
-            import json
-            async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(metadata, indent=2, ensure_ascii=False, default=str))
+            data = json.dumps(metadata, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+            size_bytes = await self.backend.write(relative_path, data)
+            await self._track(relative_path, size_bytes)
 
-            relative_path = file_path.relative_to(self.base_path)
             logger.info(f"Metadata saved: {url} -> {relative_path}")
-            return str(relative_path)
+            return relative_path
 
         except Exception as e:
             logger.error(f"Failed to save metadata for {url}: {e}")
@@ -99,47 +206,175 @@ class StorageManager:
     async def read_content(self, relative_path: str) -> Optional[bytes]:
         """Read content from storage"""
         try:
-            file_path = self.base_path / relative_path
-            if not file_path.exists():
+            if ARCHIVE_MEMBER_SEPARATOR in relative_path:
+                return await self._read_archive_member(relative_path)
+
+            content = await self.backend.read(relative_path)
+            if content is None:
                 return None
 
-            async with aiofiles.open(file_path, 'rb') as f:
-                return await f.read()
+            if relative_path.endswith('.zst'):
+                if zstandard is None:
+                    raise RuntimeError("zstandard is required to read compressed blobs")
+                content = zstandard.ZstdDecompressor().decompress(content)
+
+            return content
         except Exception as e:
             logger.error(f"Failed to read content from {relative_path}: {e}")
             return None
 
+    async def _read_archive_member(self, reference: str) -> Optional[bytes]:
+        archive_key, member = reference.split(ARCHIVE_MEMBER_SEPARATOR, 1)
+        data = await self.backend.read(archive_key)
+        if data is None:
+            return None
+
+        with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as archive:
+            try:
+                extracted = archive.extractfile(member)
+            except KeyError:
+                return None
+            return extracted.read() if extracted else None
+
+    async def pack_archive(self, relative_paths: List[str], archive_key: str) -> Dict[str, str]:
+        """
+        Pack stored files into one gzip'd tar under archive_key.
+        Returns {old path: archive reference}; originals are left in place.
+        """
+        buffer = io.BytesIO()
+        references = {}
+        with tarfile.open(fileobj=buffer, mode='w:gz', compresslevel=9) as archive:
+            for relative_path in relative_paths:
+                content = await self.read_content(relative_path)
+                if content is None:
+                    continue
+                info = tarfile.TarInfo(name=relative_path)
+                info.size = len(content)
+                info.mtime = int(datetime.now().timestamp())
+                archive.addfile(info, io.BytesIO(content))
+                references[relative_path] = f"{archive_key}{ARCHIVE_MEMBER_SEPARATOR}{relative_path}"
+
+        if references:
+            size_bytes = await self.backend.write(archive_key, buffer.getvalue())
+            await self._track(archive_key, size_bytes)
+            logger.info(f"Packed {len(references)} files into {archive_key}")
+
+        return references
+
+    async def delete_content(self, relative_path: str, url: Optional[str] = None,
+                             crawl_date: Optional[datetime] = None) -> bool:
+        """Delete stored content; blobs drop this file's (url, crawl_date) reference instead"""
+        if relative_path.startswith(f"{BLOBS}/"):
+            if url is None or crawl_date is None:
+                return False
+            return await self.release_content(relative_path, url, crawl_date)
+
+        if ARCHIVE_MEMBER_SEPARATOR in relative_path:
+            # Archive members are dropped when the whole archive is compacted
+            return False
+
+        deleted = await self.backend.delete(relative_path)
+        await self._untrack([relative_path])
+        return deleted
+
+    async def release_content(self, relative_path: str, url: str, crawl_date: datetime) -> bool:
+        """
+        Drop the (url, crawl_date) reference to this blob; deletes the blob once
+        unreferenced. The reference is left alone if it now points at a newer blob.
+        """
+        blob_index = self.blob_index or BlobIndex()
+
+        orphan_path = await blob_index.release(
+            self._get_blob_sha256(relative_path), url, crawl_date.date()
+        )
+        if orphan_path:
+            return await self.purge_blob(orphan_path)
+
+        return False
+
+    async def purge_blob(self, relative_path: str) -> bool:
+        """Delete an unreferenced blob; skipped if it was referenced again meanwhile"""
+        return await self._purge_blob(self._get_blob_sha256(relative_path))
+
+    async def _purge_blob(self, sha256: str) -> bool:
+        blob_index = self.blob_index or BlobIndex()
+
+        async def delete(path: str):
+            await self.backend.delete(path)
+            await self._untrack([path])
+            logger.info(f"Deleted unreferenced blob {path}")
+
+        return await blob_index.purge(sha256, delete)
+
+    async def purge_unreferenced_blobs(self, batch_size: int = 1000) -> int:
+        """Purge blobs left at ref_count 0 by an interrupted release"""
+        blob_index = self.blob_index or BlobIndex()
+        purged = 0
+        for sha256 in await blob_index.unreferenced(batch_size):
+            if await self._purge_blob(sha256):
+                purged += 1
+        return purged
+
     async def get_file_info(self, relative_path: str) -> Optional[dict]:
         """Get file information"""
         try:
-            file_path = self.base_path / relative_path
-            if not file_path.exists():
+            stat = await self.backend.stat(relative_path)
+            if stat is None:
                 return None
 
-            stat = file_path.stat()
             return {
                 'path': str(relative_path),
-                'size': stat.st_size,
-                'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                'size': stat['size'],
+                'modified': stat['modified'].isoformat(),
                 'exists': True
             }
         except Exception as e:
             logger.error(f"Failed to get file info for {relative_path}: {e}")
             return None
 
-    async def cleanup_old_files(self, days_to_keep: int = 30):
-        """Clean up files older than specified days"""
+    async def repoint_references(self, old_path: str, new_path: str):
+        """Point metadata rows at the file that replaced theirs"""
+        async with get_connection() as conn:
+            await conn.execute("""
+                UPDATE metadata SET local_file_path = $2, updated_at = CURRENT_TIMESTAMP
+                WHERE local_file_path = $1
+            """, old_path, new_path)
+
+    async def detach_references(self, relative_paths: List[str]):
+        """Clear metadata.local_file_path for deleted files"""
+        if not relative_paths:
+            return
+        async with get_connection() as conn:
+            await conn.execute("""
+                UPDATE metadata SET local_file_path = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE local_file_path = ANY($1::text[])
+            """, relative_paths)
+
+    async def cleanup_old_files(self, days_to_keep: int = 30, batch_size: int = 1000):
+        """Clean up files older than specified days (blobs are reference counted and skipped)"""
         try:
-            cutoff_date = datetime.now().timestamp() - (days_to_keep * 24 * 60 * 60)
+            cutoff = datetime.now() - timedelta(days=days_to_keep)
             deleted_count = 0
 
-            for root_dir in [self.pdfs_path, self.htmls_path, self.metadata_path]:
-                if root_dir.exists():
-                    for file_path in root_dir.rglob('*'):
-                        if file_path.is_file() and file_path.stat().st_mtime < cutoff_date:
-                            file_path.unlink()
+            if self.manifest:
+                categories = [PDFS, HTMLS, METADATA]
+                while True:
+                    paths = await self.manifest.older_than(categories, cutoff, batch_size)
+                    if not paths:
+                        break
+
+                    for relative_path in paths:
+                        if await self.backend.delete(relative_path):
                             deleted_count += 1
+                    await self.manifest.remove(paths)
+                    await self.detach_references(paths)
+            else:
+                for prefix in [PDFS, HTMLS, METADATA]:
+                    async for batch in self.backend.list(prefix):
+                        deleted = [key for key, _, modified in batch
+                                   if modified < cutoff and await self.backend.delete(key)]
+                        deleted_count += len(deleted)
+                        await self.detach_references(deleted)
 
             logger.info(f"Cleaned up {deleted_count} old files")
             return deleted_count
@@ -163,39 +398,37 @@ class StorageManager:
         }
         return content_type_map.get(content_type, '.bin')
 
-    def get_storage_stats(self) -> dict:
-        """Get storage statistics"""
+    async def get_storage_stats(self) -> dict:
+        """Get storage statistics (from the manifest, or a single listing pass without one)"""
         try:
-            total_size = 0
-            file_counts = {'pdfs': 0, 'htmls': 0, 'metadata': 0}
-
-            # Count PDFs
-            for file_path in self.pdfs_path.rglob('*'):
-                if file_path.is_file():
-                    file_counts['pdfs'] += 1
-                    total_size += file_path.stat().st_size
-
-            # Count HTMLs
-            for file_path in self.htmls_path.rglob('*'):
-                if file_path.is_file():
-                    file_counts['htmls'] += 1
-                    total_size += file_path.stat().st_size
-
-            # Count metadata files
-            for file_path in self.metadata_path.rglob('*'):
-                if file_path.is_file():
-                    file_counts['metadata'] += 1
-                    total_size += file_path.stat().st_size
+            categories = [PDFS, HTMLS, METADATA]
+            if self.blob_index:
+                categories.append(BLOBS)
 
-            return {
+            if self.manifest:
+                counters = await self.manifest.get_stats()
+            else:
+                counters = {}
+                for name in categories:
+                    files, size = 0, 0
+                    async for batch in self.backend.list(name):
+                        files += len(batch)
+                        size += sum(file_size for _, file_size, _ in batch)
+                    counters[name] = {'files': files, 'bytes': size}
+
+            file_counts = {name: counters.get(name, {}).get('files', 0) for name in categories}
+            sizes = {name: counters.get(name, {}).get('bytes', 0) for name in categories}
+            total_size = sum(sizes.values())
+
+            stats = {
                 'total_files': sum(file_counts.values()),
                 'total_size_bytes': total_size,
                 'total_size_mb': total_size / (1024 * 1024),
                 'file_counts': file_counts,
-                'pdfs_size_mb': sum(f.stat().st_size for f in self.pdfs_path.rglob('*') if f.is_file()) / (1024 * 1024),
-                'htmls_size_mb': sum(f.stat().st_size for f in self.htmls_path.rglob('*') if f.is_file()) / (1024 * 1024),
-                'metadata_size_mb': sum(f.stat().st_size for f in self.metadata_path.rglob('*') if f.is_file()) / (1024 * 1024),
             }
+            for name, size in sizes.items():
+                stats[f'{name}_size_mb'] = size / (1024 * 1024)
+            return stats
         except Exception as e:
             logger.error(f"Failed to get storage stats: {e}")
             return {'error': str(e)}
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+from utils.database import get_connection
+from fruxai_shared.storage_backends import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Top-level storage directories tracked by the manifest
+CATEGORIES = ('pdfs', 'htmls', 'metadata', 'blobs', 'archives')
+
+class StorageManifest:
+    """
+    Persistent index of stored files (storage_files) with per-category
+    counters (storage_stats) maintained by a trigger, so stats and
+    retention queries never have to walk the storage tree.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    @staticmethod
+    def category_for(relative_path: str) -> str:
+        return relative_path.split('/', 1)[0]
+
+    async def record(self, relative_path: str, size_bytes: int, modified_at: datetime):
+        """Insert or refresh a manifest entry after a save"""
+        async with get_connection() as conn:
+            await conn.execute("""
+                INSERT INTO storage_files (path, category, size_bytes, modified_at)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (path) DO UPDATE SET
+                    size_bytes = EXCLUDED.size_bytes,
+                    modified_at = EXCLUDED.modified_at
+            """, relative_path, self.category_for(relative_path), size_bytes, modified_at)
+
+    async def remove(self, relative_paths: List[str]):
+        """Drop manifest entries after files are deleted"""
+        if not relative_paths:
+            return
+        async with get_connection() as conn:
+            await conn.execute("DELETE FROM storage_files WHERE path = ANY($1::text[])", relative_paths)
+
+    async def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-category file counts and sizes"""
+        async with get_connection() as conn:
+            rows = await conn.fetch("SELECT category, file_count, total_bytes FROM storage_stats")
+            return {row['category']: {'files': row['file_count'], 'bytes': row['total_bytes']} for row in rows}
+
+    async def older_than(self, categories: List[str], cutoff: datetime, limit: int) -> List[str]:
+        """Paths in the given categories last modified before cutoff (oldest first)"""
+        async with get_connection() as conn:
+            rows = await conn.fetch("""
+                SELECT path FROM storage_files
+                WHERE category = ANY($1::text[]) AND modified_at < $2
+                ORDER BY modified_at
+                LIMIT $3
+            """, categories, cutoff, limit)
+            return [row['path'] for row in rows]
+
+    async def reconcile(self) -> Dict[str, int]:
+        """
+        Repair drift between the manifest and the backend: every object seen
+        is upserted with the current scan id, rows not seen are deleted
+        (files written while the scan runs are left alone).
+        """
+        scan_started = datetime.now()
+        scan_id = int(time.time() * 1000)
+        seen = 0
+
+        for category in CATEGORIES:
+            async for batch in self.backend.list(category):
+                async with get_connection() as conn:
+                    await conn.executemany("""
+                        INSERT INTO storage_files (path, category, size_bytes, modified_at, scan_id)
+                        VALUES ($1, $2, $3, $4, $5)
+                        ON CONFLICT (path) DO UPDATE SET
+                            size_bytes = EXCLUDED.size_bytes,
+                            modified_at = EXCLUDED.modified_at,
+                            scan_id = EXCLUDED.scan_id
+                    """, [(key, category, size, modified, scan_id) for key, size, modified in batch])
+                seen += len(batch)
+
+        async with get_connection() as conn:
+            removed = await conn.fetchval("""
+                WITH stale AS (
+                    DELETE FROM storage_files
+                    WHERE (scan_id IS NULL OR scan_id < $1)
+                      AND modified_at < $2
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM stale
+            """, scan_id, scan_started)
+
+            # Rebuild the counters from the repaired manifest
+            async with conn.transaction():
+                await conn.execute("LOCK TABLE storage_stats IN EXCLUSIVE MODE")
+                await conn.execute("DELETE FROM storage_stats")
+                await conn.execute("""
+                    INSERT INTO storage_stats (category, file_count, total_bytes)
+                    SELECT category, COUNT(*), COALESCE(SUM(size_bytes), 0)
+                    FROM storage_files
+                    GROUP BY category
+                """)
+
+        logger.info(f"Storage manifest reconciled: {seen} files seen, {removed} stale entries removed")
+        return {'files_seen': seen, 'stale_removed': removed}
+
+async def main():
+    """One-shot reconciliation: python -m utils.storage_manifest"""
+    from utils.database import close_db
+    from fruxai_shared.storage_backends import get_storage_backend
+
+    logging.basicConfig(level=logging.INFO)
+    manifest = StorageManifest(get_storage_backend())
+    try:
+        await manifest.reconcile()
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    asyncio.run(main())